@@ -0,0 +1,51 @@
+"""Raw frame archive: RawArchive.append per notification and a time-range read of a day file.
+
+`archive_append` is what the caller (the BLE callback) spends per
+notification while the writer thread runs alongside it; the drain in
+close() runs untimed afterwards. `archive_append_total` includes it.
+"""
+from __future__ import annotations
+import pathlib
+import struct
+import tempfile
+
+from steelcity_impact_bridge.archive import ArchiveReader, RawArchive, velocities
+
+PERIOD_NS = 10_000_000  # 100 Hz
+FRAME = bytes([0x55, 0x61]) + struct.pack("<13h", 3, 1, 0, 0, 0, 0, 2500, 0, 0, 0, 0, 0, 0)
+
+
+def _write(n: int, pending=None) -> pathlib.Path:
+    tmp = tempfile.mkdtemp(prefix="bench_archive_")
+    arc = RawArchive(tmp, offset_ns=0, queue_size=n)
+    w = arc.append
+    for k in range(n):
+        w("P1", (k * PERIOD_NS,), FRAME)
+    if pending is not None:
+        pending.append(arc)
+        return pathlib.Path(tmp)
+    arc.close()
+    return next(pathlib.Path(tmp).glob("P1_*.bt50raw"))
+
+
+def cases(quick: bool = False) -> dict:
+    n = 20000 if quick else 200000
+    path = _write(n)
+
+    def read():
+        with ArchiveReader(str(path)) as rd:
+            # the middle half of the file, velocities as floats
+            recs = rd.between(n // 4 * PERIOD_NS, 3 * n // 4 * PERIOD_NS)
+            velocities(recs).astype("f4")
+
+    pending = []
+
+    def close_pending():
+        while pending:
+            pending.pop().close()
+
+    return {
+        "archive_append": (lambda: _write(n, pending), n, {"teardown": close_pending}),
+        "archive_append_total": (lambda: _write(n), n),
+        "archive_read_range": (read, n // 2),
+    }
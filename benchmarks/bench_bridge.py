@@ -0,0 +1,43 @@
+"""Bridge._on_bt50_packet end to end at 100 Hz per sensor for 1, 8 and 32 sensors."""
+from __future__ import annotations
+import struct
+import tempfile
+
+from steelcity_impact_bridge.bridge import Bridge
+from steelcity_impact_bridge.config import AppCfg, AmgCfg, DetectorCfg, LoggingCfg
+
+PERIOD_NS = 10_000_000  # 100 Hz
+
+
+def _frames(n: int) -> list:
+    out = []
+    for k in range(n):
+        vx = 60 if k % 200 == 150 else (k * 7) % 3
+        out.append(bytes([0x55, 0x61]) + struct.pack("<13h", vx, 1, 0, 0, 0, 0, 2500, 0, 0, 0, 0, 0, 0))
+    return out
+
+
+def cases(quick: bool = False) -> dict:
+    seconds = 2 if quick else 10
+    frames = _frames(seconds * 100)
+    out = {}
+    for sensors in (1, 8, 32):
+        def fn(sensors=sensors):
+            tmp = tempfile.mkdtemp(prefix="bench_bridge_")
+            cfg = AppCfg(AmgCfg(), [], DetectorCfg(), LoggingCfg(dir=tmp))
+            br = Bridge(cfg)
+            ids = [f"S{i:02d}" for i in range(sensors)]
+            for sid in ids:
+                br.detectors[sid] = br._new_detector()
+            br.t0_ns = 0
+            on_packet = br._on_bt50_packet
+            for k, payload in enumerate(frames):
+                ts = k * PERIOD_NS
+                for i, sid in enumerate(ids):
+                    on_packet(sid, ts + i * 1000, payload)
+            stop = getattr(br.logger, "stop", None)
+            if stop:
+                stop()
+        # ops = notifications; at 100 Hz x sensors, ns/op * ops_per_s gives the CPU share
+        out[f"bridge_on_bt50_packet_x{sensors}"] = (fn, len(frames) * sensors, {"ops_per_s": 100 * sensors})
+    return out
@@ -0,0 +1,100 @@
+"""NdjsonLogger.write per record, in regular and verbose mode (dual-file, as deployed), sync and async.
+
+The mixed stream is 90% bt50_buffer_status, which regular mode drops before
+stamping or encoding (no file takes it), so both modes are also timed per
+kind of record:
+
+  _status    bt50_buffer_status only (regular: dropped outright)
+  _debug     other debug records (regular: encoded for the debug file only)
+  _event     events (both files)
+
+For the async writer, `_async_loop` is what the calling (event loop)
+thread spends in write() while the writer thread runs alongside it; the
+drain in stop() runs untimed afterwards. `_async_total` includes the
+drain, i.e. the whole CPU cost of the records.
+"""
+from __future__ import annotations
+import tempfile
+
+from steelcity_impact_bridge.logs import NdjsonLogger
+
+
+def _event(i: int) -> dict:
+    return {"type": "event", "msg": "HIT", "plate": "P1", "t_rel_ms": i * 10.0,
+            "data": {"sensor_id": "P1", "peak": 42.0, "rms": 12.5, "dur_ms": 40.0}}
+
+
+def _status(i: int) -> dict:
+    return {"type": "debug", "msg": "bt50_buffer_status",
+            "data": {"sensor_id": "P1", "buffer_size": i % 20, "current_amp": 0.5 + i % 7,
+                     "current_vx": 0.1, "current_vy": 0.2, "current_vz": 0.3}}
+
+
+def _debug(i: int) -> dict:
+    return {"type": "debug", "msg": "bt50_impact_analysis",
+            "data": {"sensor_id": "P1", "sample_count": 10, "impact_count": i % 3, "avg_amp": 0.61,
+                     "max_amp": 1.2 + i % 5, "detector_hit": None, "idle_rms": 0.0123}}
+
+
+def _records(n: int, kind: str = "mix") -> list:
+    if kind == "status":
+        return [_status(i) for i in range(n)]
+    if kind == "debug":
+        return [_debug(i) for i in range(n)]
+    if kind == "event":
+        return [_event(i) for i in range(n)]
+    # Mix seen on a live range: mostly per-sample debug status, some events
+    return [_event(i) if i % 10 == 0 else _status(i) for i in range(n)]
+
+
+class _NullFile:
+    def write(self, b):
+        return len(b)
+
+    def close(self):
+        pass
+
+
+def cases(quick: bool = False) -> dict:
+    n = 2000 if quick else 20000
+    streams = {kind: _records(n, kind) for kind in ("mix", "status", "debug", "event")}
+    tmp = tempfile.mkdtemp(prefix="bench_logger_")
+
+    pending = []
+
+    def run(mode, async_writer=False, io=True, drain=True, kind="mix"):
+        recs = streams[kind]
+
+        def fn():
+            log = NdjsonLogger(tmp, f"bench_{mode}", dual_file=True, async_writer=async_writer)
+            log.mode = mode
+            if not io:
+                log._fh = log._debug_fh = _NullFile()
+            w = log.write
+            for r in recs:
+                w(dict(r))
+            if drain:
+                log.stop()
+            else:
+                pending.append(log)
+        return fn
+
+    def stop_pending():
+        while pending:
+            pending.pop().stop()
+
+    out = {
+        "logger_write_regular": (run("regular"), n),
+        "logger_write_verbose": (run("verbose"), n),
+        # CPU only (filter, stamp, encode), whatever the storage is doing
+        "logger_write_verbose_noio": (run("verbose", io=False), n),
+        # Time on the calling thread only (the writer thread competes for the GIL)
+        "logger_write_verbose_async_loop": (run("verbose", async_writer=True, drain=False), n,
+                                            {"teardown": stop_pending}),
+        # Including the drain in stop(): all the CPU the records cost
+        "logger_write_verbose_async_total": (run("verbose", async_writer=True), n),
+    }
+    for mode in ("regular", "verbose"):
+        for kind in ("status", "debug", "event"):
+            out[f"logger_write_{mode}_{kind}"] = (run(mode, kind=kind), n)
+    return out
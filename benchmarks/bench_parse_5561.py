@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Micro-benchmark for the BT50 frame decoders.
+
+Usage: python benchmarks/bench_parse_5561.py [-n FRAMES] [-r REPEAT]
+Prints best-of-R microseconds per frame for each decoder. Also provides
+cases() for benchmarks/run.py.
+"""
+from __future__ import annotations
+import argparse
+import random
+import struct
+import timeit
+
+from steelcity_impact_bridge.ble.wtvb_parse import (
+    parse_5561, parse_5561_record, parse_5561_batch,
+)
+
+
+def make_frames(n: int, seed: int = 1) -> list:
+    rnd = random.Random(seed)
+    return [bytes([0x55, 0x61]) + struct.pack('<13h', *(rnd.randint(-3000, 3000) for _ in range(13)))
+            for _ in range(n)]
+
+
+def cases(quick: bool = False, n: int = 0) -> dict:
+    """name -> (fn, ops): fn() performs `ops` decodes."""
+    n = n or (2000 if quick else 20000)
+    frames = make_frames(n)
+    buf = b"".join(frames)
+    return {
+        "parse_5561": (lambda: [parse_5561(f) for f in frames], n),
+        "parse_5561_record": (lambda: [parse_5561_record(f) for f in frames], n),
+        "parse_5561_batch": (lambda: parse_5561_batch(buf), n),
+    }
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=20000, help="frames per run")
+    ap.add_argument("-r", type=int, default=5, help="repeats (best is reported)")
+    a = ap.parse_args()
+
+    for name, (fn, _) in cases(n=a.n).items():
+        best = min(timeit.repeat(fn, number=1, repeat=a.r))
+        print(f"{name:<18} {best / a.n * 1e6:8.3f} us/frame")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
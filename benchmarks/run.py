@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Run the hot-path benchmarks and write/compare JSON results.
+
+    python benchmarks/run.py [--quick] [-k SUBSTR] [--json out.json] [--compare baseline.json]
+
+Each benchmarks/bench_*.py module provides cases(quick) -> {name: (fn, ops[, extra])};
+fn() performs `ops` operations and is timed best-of-R (extra["teardown"], if given,
+runs untimed after each call). Results are reported
+in ns per operation. With --compare, cases slower than the baseline by more
+than --threshold (default 10%) are listed and the exit code is 1.
+Run from the repo root on the target machine (Pi) to compare like with like.
+"""
+from __future__ import annotations
+import argparse, gc, importlib, json, pathlib, platform, statistics, sys, time, timeit
+
+HERE = pathlib.Path(__file__).resolve().parent
+
+
+def discover(pattern: str = "") -> dict:
+    sys.path.insert(0, str(HERE))
+    out = {}
+    for path in sorted(HERE.glob("bench_*.py")):
+        mod = importlib.import_module(path.stem)
+        if hasattr(mod, "cases"):
+            out[path.stem] = mod
+    return out
+
+
+def run_case(fn, ops: int, repeat: int, teardown=None) -> dict:
+    fn()  # warm-up (imports, caches, first file open)
+    if teardown is not None:
+        teardown()
+    gc.collect()
+    if teardown is None:
+        times = timeit.repeat(fn, number=1, repeat=repeat)
+    else:
+        times = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t)
+            teardown()
+    return {
+        "ops": ops,
+        "ns_per_op": round(min(times) / ops * 1e9, 2),
+        "median_ns_per_op": round(statistics.median(times) / ops * 1e9, 2),
+    }
+
+
+def meta() -> dict:
+    import numpy
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "numpy": numpy.__version__,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """(name, base_ns, new_ns, ratio) for cases slower than baseline by > threshold."""
+    out = []
+    base = baseline.get("results", {})
+    for name, r in results.items():
+        b = base.get(name)
+        if not b or not b.get("ns_per_op"):
+            continue
+        ratio = r["ns_per_op"] / b["ns_per_op"]
+        r["baseline_ns_per_op"] = b["ns_per_op"]
+        r["ratio"] = round(ratio, 3)
+        if ratio > 1.0 + threshold:
+            out.append((name, b["ns_per_op"], r["ns_per_op"], ratio))
+    return out
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--quick", action="store_true", help="smaller inputs, for a smoke run")
+    ap.add_argument("-k", default="", help="only cases whose name contains this")
+    ap.add_argument("-r", "--repeat", type=int, default=5)
+    ap.add_argument("--json", help="write results here")
+    ap.add_argument("--compare", help="baseline JSON from a previous run")
+    ap.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown (0.10 = 10%%)")
+    a = ap.parse_args(argv)
+
+    results = {}
+    for mod in discover().values():
+        for name, case in mod.cases(quick=a.quick).items():
+            if a.k and a.k not in name:
+                continue
+            fn, ops = case[0], case[1]
+            extra = case[2] if len(case) > 2 else {}
+            r = run_case(fn, ops, a.repeat, extra.get("teardown"))
+            if "ops_per_s" in extra:
+                # Share of one core needed to keep up with the real-time rate
+                r["cpu_pct"] = round(r["ns_per_op"] * extra["ops_per_s"] / 1e7, 2)
+            results[name] = r
+            line = f"{name:<34} {r['ns_per_op']:>12.1f} ns/op"
+            if "cpu_pct" in r:
+                line += f"   {r['cpu_pct']:6.2f}% of a core"
+            print(line, flush=True)
+
+    rc = 0
+    if a.compare:
+        with open(a.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        slow = compare(results, baseline, a.threshold)
+        for name, b, n, ratio in slow:
+            print(f"REGRESSION {name}: {b:.1f} -> {n:.1f} ns/op (x{ratio:.2f})")
+        if slow:
+            rc = 1
+        else:
+            print(f"no regressions beyond {a.threshold:.0%} against {a.compare}")
+    if a.json:
+        with open(a.json, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta(), "quick": a.quick, "results": results}, f, indent=1)
+    return rc
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -5,8 +5,14 @@ from steelcity_impact_bridge.bridge import run
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--config", required=True)
+    ap.add_argument("--profile-seconds", type=float, default=30.0,
+                    help="how long a SIGUSR1-triggered profile runs (0 disables the hook)")
+    ap.add_argument("--profile-cprofile", action="store_true", default=None,
+                    help="also record cProfile call stats (slows the bridge while it runs; "
+                         "default: PROFILE_CPROFILE env var)")
     args = ap.parse_args()
-    asyncio.run(run(args.config))
+    asyncio.run(run(args.config, profile_seconds=args.profile_seconds,
+                    profile_cprofile=args.profile_cprofile))
 
 if __name__ == "__main__":
     main()
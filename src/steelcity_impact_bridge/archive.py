@@ -0,0 +1,347 @@
+"""Append-only binary archive of raw BT50 frames, one file per sensor per day.
+
+File layout (little-endian):
+
+    header   64 bytes: magic, version, header/record/frame sizes, index
+             interval, creation time (Unix ns), sensor id (UTF-8, up to
+             SENSOR_ID_MAX bytes after a length byte)
+    records  36 bytes each: int64 ts_ns (sample acquisition time, Unix ns)
+             followed by the 28 wire bytes of the 0x55,0x61 frame
+
+Next to each `<sensor>_<YYYYMMDD>.bt50raw` a `.idx` file holds one
+(ts_ns, record number) pair every `index_every` records, so a time range
+is found by searching a few KiB instead of the whole day. Records are
+appended in arrival order; sample times from SampleClock are
+non-decreasing per sensor, which the range lookup relies on.
+
+A crash can leave a torn last record; writers and readers both ignore it.
+RawArchive does the file writes on its own thread, so a notification only
+costs the caller a deque append.
+"""
+from __future__ import annotations
+import collections, mmap, os, pathlib, struct, threading, time
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+MAGIC = b"SCBT50RW"
+VERSION = 2
+FRAME_LEN = 28
+HEADER_SIZE = 64
+SENSOR_ID_MAX = 35
+SUFFIX = ".bt50raw"
+
+RECORD_DTYPE = np.dtype([("ts_ns", "<i8"), ("frame", "u1", (FRAME_LEN,))])
+INDEX_DTYPE = np.dtype([("ts_ns", "<i8"), ("record", "<i8")])
+
+# magic, version, header size, record size, frame size, index interval, created ns,
+# sensor id length and bytes
+_HEADER = struct.Struct(f"<8sHHHHIqB{SENSOR_ID_MAX}s")
+# Version 1: sensor id cut to 16 bytes, before the creation time
+_HEADER_V1 = struct.Struct("<8sHHHHI16sq")
+_TS = struct.Struct("<q")
+
+
+def _sensor_bytes(sensor_id: str) -> bytes:
+    raw = sensor_id.encode()
+    if len(raw) > SENSOR_ID_MAX:
+        raise ValueError(f"sensor id {sensor_id!r} is over {SENSOR_ID_MAX} bytes in UTF-8")
+    return raw
+
+
+def _pack_header(sensor_id: str, index_every: int, created_ns: int) -> bytes:
+    raw = _sensor_bytes(sensor_id)
+    return _HEADER.pack(MAGIC, VERSION, HEADER_SIZE, RECORD_DTYPE.itemsize, FRAME_LEN,
+                        index_every, created_ns, len(raw), raw)
+
+
+def read_header(buf) -> dict:
+    if len(buf) < HEADER_SIZE:
+        raise ValueError("truncated archive header")
+    magic, version, hsize, rsize, fsize = _HEADER.unpack_from(buf)[:5]
+    if magic != MAGIC:
+        raise ValueError("not a BT50 raw archive")
+    if version not in (1, VERSION) or hsize != HEADER_SIZE or rsize != RECORD_DTYPE.itemsize or fsize != FRAME_LEN:
+        raise ValueError(f"unsupported archive layout (version {version})")
+    if version == 1:
+        every, sensor, created = _HEADER_V1.unpack_from(buf)[5:]
+        # The cut may have split a character
+        sensor_id = sensor.rstrip(b"\0").decode(errors="replace")
+    else:
+        every, created, size, sensor = _HEADER.unpack_from(buf)[5:]
+        if size > SENSOR_ID_MAX:
+            raise ValueError("corrupt archive header (sensor id length)")
+        sensor_id = sensor[:size].decode()
+    return {"sensor_id": sensor_id, "index_every": every, "created_ns": created}
+
+
+def _load_index(path: pathlib.Path, count: int) -> np.ndarray:
+    """Index entries of `path` that point below record `count` (a crash can leave extras)."""
+    if not path.exists():
+        return np.zeros(0, dtype=INDEX_DTYPE)
+    raw = path.read_bytes()
+    index = np.frombuffer(raw[:len(raw) - len(raw) % INDEX_DTYPE.itemsize], dtype=INDEX_DTYPE)
+    return index[index["record"] < count]
+
+
+class _ArchiveFile:
+    """One open sensor-day file and its index."""
+
+    def __init__(self, path: pathlib.Path, sensor_id: str, index_every: int):
+        self.path = path
+        if path.exists() and path.stat().st_size >= HEADER_SIZE:
+            with open(path, "rb") as f:
+                hdr = read_header(f.read(HEADER_SIZE))
+            self.index_every = hdr["index_every"] or index_every
+            size = path.stat().st_size
+            self.count = (size - HEADER_SIZE) // RECORD_DTYPE.itemsize
+            end = HEADER_SIZE + self.count * RECORD_DTYPE.itemsize
+            if end != size:
+                os.truncate(path, end)  # drop a torn record before appending after it
+            self.fh = open(path, "ab")
+            idx_path = path.with_suffix(".idx")
+            index = _load_index(idx_path, self.count)
+            if idx_path.exists() and idx_path.stat().st_size != index.nbytes:
+                index.tofile(idx_path)
+        else:
+            self.index_every = index_every
+            self.count = 0
+            self.fh = open(path, "wb")
+            self.fh.write(_pack_header(sensor_id, index_every, time.time_ns()))
+        self.idx = open(path.with_suffix(".idx"), "ab")
+        self._next_index = -(-self.count // self.index_every) * self.index_every
+
+    def append(self, ts_ns: Sequence[int], frames: bytes, offset_ns: int) -> None:
+        count, n, pack = self.count, len(ts_ns), _TS.pack
+        if n == 1:  # one frame per notification at 100 Hz
+            self.fh.write(pack(ts_ns[0] + offset_ns) + frames)
+        else:
+            self.fh.write(b"".join([pack(t + offset_ns) + frames[i:i + FRAME_LEN]
+                                    for i, t in zip(range(0, len(frames), FRAME_LEN), ts_ns)]))
+        if count + n > self._next_index:
+            every = self.index_every
+            for r in range(self._next_index, count + n, every):
+                self.idx.write(pack(ts_ns[r - count] + offset_ns) + pack(r))
+                self._next_index = r + every
+        self.count = count + n
+
+    def flush(self) -> None:
+        self.fh.flush()
+        self.idx.flush()
+
+    def close(self) -> None:
+        self.fh.close()
+        self.idx.close()
+
+
+class RawArchive:
+    """Writer for the per-sensor, per-day raw frame archives under `dir`.
+
+    append() only puts the frames on a deque; a writer thread wakes every
+    `flush_interval_s`, appends everything waiting to the day's files in
+    one write per sensor and flushes them. When `queue_size` notifications
+    are waiting, new ones are dropped and counted. Files change at local
+    midnight. Sample times come in on the host's monotonic clock and are
+    stored as Unix ns using an offset fixed when the archive is created,
+    so archives from different runs line up.
+    """
+
+    def __init__(self, dir: str, index_every: int = 4096, offset_ns: Optional[int] = None,
+                 queue_size: int = 10000, flush_interval_s: float = 1.0):
+        self.dir = pathlib.Path(dir)
+        self.index_every = int(index_every)
+        self.offset_ns = time.time_ns() - time.monotonic_ns() if offset_ns is None else int(offset_ns)
+        self.queue_size = max(1, int(queue_size))
+        self.flush_interval_s = float(flush_interval_s)
+        self._pending: collections.deque = collections.deque()  # (sensor_id, ts_ns, frames)
+        self._wake = threading.Event()
+        self._cond = threading.Condition()
+        self._requested = self._done = 0  # flush() requests made / served
+        self._stopping = False
+        self._files: Dict[str, _ArchiveFile] = {}  # owned by the writer thread
+        self._day = ""
+        self._deadline = 0.0
+        self.records = 0
+        self.dropped = 0
+        self.errors = 0
+        self._thread: Optional[threading.Thread] = None  # started by the first append()
+
+    def _open(self, sensor_id: str) -> _ArchiveFile:
+        _sensor_bytes(sensor_id)  # too long for the header: ValueError, before any file is made
+        now = time.time()
+        if now >= self._deadline:
+            self._close_files()
+            lt = time.localtime(now)
+            self._day = time.strftime("%Y%m%d", lt)
+            self._deadline = time.mktime((lt.tm_year, lt.tm_mon, lt.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+        af = self._files.get(sensor_id)
+        if af is None:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            af = self._files[sensor_id] = _ArchiveFile(
+                archive_path(self.dir, sensor_id, self._day), sensor_id, self.index_every)
+        return af
+
+    def append(self, sensor_id: str, ts_ns: Sequence[int], frames: bytes) -> None:
+        """Queue len(ts_ns) frames; `frames` holds their wire bytes back to back."""
+        if len(frames) != len(ts_ns) * FRAME_LEN:
+            raise ValueError("frames must hold 28 bytes per timestamp")
+        if len(self._pending) >= self.queue_size:
+            self.dropped += len(ts_ns)
+            return
+        self._pending.append((sensor_id, ts_ns, frames))
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="raw-archive", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval_s)
+            self._wake.clear()
+            requested, stopping = self._requested, self._stopping
+            self._write_pending()
+            with self._cond:
+                self._done = requested
+                self._cond.notify_all()
+            if stopping:
+                self._close_files()
+                break
+
+    def _write_pending(self) -> None:
+        # One write per sensor for everything waiting (deque pops are thread-safe)
+        pending, batches = self._pending, {}
+        for _ in range(len(pending)):
+            sensor_id, ts_ns, frames = pending.popleft()
+            batch = batches.get(sensor_id)
+            if batch is None:
+                batch = batches[sensor_id] = ([], [])
+            batch[0].extend(ts_ns)
+            batch[1].append(frames)
+        for sensor_id, (ts_ns, frames) in batches.items():
+            try:
+                self._open(sensor_id).append(ts_ns, b"".join(frames), self.offset_ns)
+                self.records += len(ts_ns)
+            except (OSError, ValueError):
+                self.errors += 1
+        for af in self._files.values():
+            try:
+                af.flush()
+            except OSError:
+                self.errors += 1
+
+    def _close_files(self) -> None:
+        for af in self._files.values():
+            try:
+                af.close()
+            except OSError:
+                pass
+        self._files.clear()
+        self._deadline = 0.0
+
+    def flush(self) -> None:
+        """Block until every frame appended so far is in the files."""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._requested += 1
+            req = self._requested
+            self._wake.set()
+            self._cond.wait_for(lambda: self._done >= req)
+
+    def close(self) -> None:
+        """Write out everything queued, close the files and stop the writer thread.
+
+        A later append() starts a new one.
+        """
+        if self._thread is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+        self._stopping = False
+
+    def active_paths(self) -> list:
+        """The files the writer thread has open."""
+        paths = []
+        for af in list(self._files.values()):
+            paths += [str(af.path), str(af.path.with_suffix(".idx"))]
+        return paths
+
+    def stats(self) -> dict:
+        # offset_ns maps stored Unix times back to the bridge's monotonic clock
+        return {"records": self.records, "bytes": self.records * RECORD_DTYPE.itemsize,
+                "dropped": self.dropped, "queued": len(self._pending), "errors": self.errors,
+                "offset_ns": self.offset_ns}
+
+
+class ArchiveReader:
+    """Memory-mapped read access to one archive file.
+
+    `records` is a RECORD_DTYPE array backed by the mapping, and between()
+    returns slices of it: nothing is read or copied until the data is
+    touched. Records appended after opening are not seen. Views keep the
+    mapping alive, so close() only unmaps once none of them are left.
+    """
+
+    def __init__(self, path: str):
+        self.path = pathlib.Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        hdr = read_header(self._mm)
+        self.sensor_id = hdr["sensor_id"]
+        self.index_every = hdr["index_every"]
+        self.created_ns = hdr["created_ns"]
+        n = (len(self._mm) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+        self.records = np.ndarray((n,), dtype=RECORD_DTYPE, buffer=self._mm, offset=HEADER_SIZE)
+        self.index = _load_index(self.path.with_suffix(".idx"), n)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def ts_ns(self) -> np.ndarray:
+        return self.records["ts_ns"]
+
+    def between(self, t0_ns: int, t1_ns: int) -> np.ndarray:
+        """Records with t0_ns <= ts_ns < t1_ns, as a view of the mapping."""
+        ts = self.records["ts_ns"]
+        lo, hi = 0, len(ts)
+        if len(self.index):
+            its, irec = self.index["ts_ns"], self.index["record"]
+            # Narrow to the index blocks around the range, then search inside them
+            a = int(np.searchsorted(its, t0_ns, "left")) - 1
+            b = int(np.searchsorted(its, t1_ns, "left"))
+            lo = int(irec[a]) if a >= 0 else 0
+            hi = int(irec[b]) if b < len(irec) else hi
+        block = ts[lo:hi]
+        start = lo + int(np.searchsorted(block, t0_ns, "left"))
+        stop = lo + int(np.searchsorted(block, t1_ns, "left"))
+        return self.records[start:stop]
+
+    def close(self) -> None:
+        self.records = self.records[:0]
+        try:
+            self._mm.close()
+        except BufferError:
+            pass  # a caller still holds a view; the mapping goes when it does
+
+
+def velocities(records: np.ndarray) -> np.ndarray:
+    """(n, 3) int16 view of VX, VY, VZ (mm/s) inside the records' frames; no copy."""
+    return records["frame"][:, 2:8].view("<i2")
+
+
+def archive_path(dir: str, sensor_id: str, day: str) -> pathlib.Path:
+    """Archive file of `sensor_id` for local date `day` (YYYYMMDD)."""
+    return pathlib.Path(dir) / f"{sensor_id}_{day}{SUFFIX}"
+
+
+def archive_sensor_id(path) -> str:
+    """Sensor id of an archive file, from its `<sensor>_<YYYYMMDD>.bt50raw` name."""
+    return pathlib.Path(path).name[:-len(SUFFIX)].rsplit("_", 1)[0]
@@ -1,14 +1,125 @@
 from __future__ import annotations
 import struct
-from typing import Optional, Dict
+from typing import NamedTuple, Optional, Dict, List
+
+import numpy as np
 
 # WTVB01-BT50 notify frames (0xFFE4) use a 28-byte payload starting with 0x55,0x61
 _HDR = 0x55
 _FLAG = 0x61
 _FRAME_LEN = 28
+_SYNC = bytes((_HDR, _FLAG))
+
+# Column order of parse_5561_batch() rows; same keys as the parse_5561 dict
+FIELDS = ('VX', 'VY', 'VZ', 'ADX', 'ADY', 'ADZ', 'TEMP',
+          'DX', 'DY', 'DZ', 'HZX', 'HZY', 'HZZ')
+
+# Header bytes skipped, then 13 signed little-endian words (sign extension is free)
+_FRAME = struct.Struct('<2x13h')
+_DEG = 180.0 / 32768    # exact in binary, so x*_DEG == x/32768*180
+
+
+class Bt50Frame(NamedTuple):
+    """One decoded BT50 frame; fields and units as documented on parse_5561.
+
+    Velocity, displacement and frequency stay int (the wire values);
+    angles and temperature are scaled floats.
+    """
+    VX: int
+    VY: int
+    VZ: int
+    ADX: float
+    ADY: float
+    ADZ: float
+    TEMP: float
+    DX: int
+    DY: int
+    DZ: int
+    HZX: int
+    HZY: int
+    HZZ: int
+
+
+def _decode(buf, offset: int = 0) -> Bt50Frame:
+    (vx, vy, vz, adx, ady, adz, temp,
+     dx, dy, dz, hzx, hzy, hzz) = _FRAME.unpack_from(buf, offset)
+    return Bt50Frame(vx, vy, vz, adx * _DEG, ady * _DEG, adz * _DEG, temp / 100.0,
+                     dx, dy, dz, hzx, hzy, hzz)
+
+
+def parse_5561_record(payload: bytes) -> Optional[Bt50Frame]:
+    """Fast path of parse_5561: one precompiled unpack, returns a Bt50Frame."""
+    if len(payload) < _FRAME_LEN or payload[0] != _HDR or payload[1] != _FLAG:
+        return None
+    return _decode(payload)
+
+
+class FrameAssembler:
+    """Recovers every 0x55,0x61 frame from a sensor's notification stream.
+
+    Keep one instance per sensor. feed() returns all complete frames found in
+    a notification (the BT50 may batch several at higher output rates),
+    skipping bytes until the next header when the stream is out of step and
+    carrying a trailing partial frame over to the next call. A notification
+    that itself starts with a header discards any carried partial, since a
+    fresh frame boundary is more likely than a continuation that happens to
+    begin with 0x55,0x61.
+
+    With keep_raw, `raw` holds the wire bytes of the frames the last feed()
+    returned, back to back (28 bytes each), for archiving.
+    """
+
+    __slots__ = ("_carry", "frames", "skipped", "keep_raw", "raw")
+
+    def __init__(self, keep_raw: bool = False):
+        self._carry = b""
+        self.frames = 0    # frames decoded so far
+        self.skipped = 0   # bytes discarded while resynchronising
+        self.keep_raw = keep_raw
+        self.raw = b""
+
+    @property
+    def pending(self) -> int:
+        """Bytes of an incomplete frame held for the next notification."""
+        return len(self._carry)
+
+    def reset(self) -> None:
+        self._carry = b""
+
+    def feed(self, payload) -> List[Bt50Frame]:
+        data = bytes(payload)
+        if self._carry:
+            if data[:2] == _SYNC:
+                self.skipped += len(self._carry)
+            else:
+                data = self._carry + data
+            self._carry = b""
+        mv = memoryview(data)
+        n = len(data)
+        out = []
+        spans = [] if self.keep_raw else None
+        i = 0
+        while i < n:
+            if data[i] != _HDR or (i + 1 < n and data[i + 1] != _FLAG):
+                j = data.find(_SYNC, i + 1)
+                if j < 0:
+                    # a lone 0x55 at the very end may be the start of the next frame
+                    j = n - 1 if data[n - 1] == _HDR and n - 1 > i else n
+                self.skipped += j - i
+                i = j
+                continue
+            if n - i < _FRAME_LEN:
+                self._carry = bytes(mv[i:])
+                break
+            out.append(_decode(mv, i))
+            if spans is not None:
+                spans.append(mv[i:i + _FRAME_LEN])
+            i += _FRAME_LEN
+        self.frames += len(out)
+        if spans is not None:
+            self.raw = b"".join(spans)
+        return out
 
-def _s16(u: int) -> int:
-    return struct.unpack('<h', struct.pack('<H', u & 0xFFFF))[0]
 
 def parse_5561(payload: bytes) -> Optional[Dict[str, float]]:
     """Parse a single BT50 notification frame.
@@ -21,27 +132,36 @@ def parse_5561(payload: bytes) -> Optional[Dict[str, float]]:
       - TEMP: Celsius (float)
       - DX,DY,DZ: displacement micrometers (signed)
       - HZX,HZY,HZZ: frequency Hz (signed)
+
+    Compatibility wrapper around parse_5561_record for callers that want a dict.
     """
-    if len(payload) < _FRAME_LEN:
+    rec = parse_5561_record(payload)
+    if rec is None:
         return None
-    b = payload[:_FRAME_LEN]
-    if b[0] != _HDR or b[1] != _FLAG:
-        return None
-    vals = struct.unpack_from('<' + 'H'*13, b, 2)
-    (VXL,VYL,VZL, ADXL,ADYL,ADZL, TEMPL,
-     DXL,DYL,DZL, HZXL,HZYL,HZZL) = vals
-
-    VX,VY,VZ = _s16(VXL), _s16(VYL), _s16(VZL)                  # mm/s
-    ADX,ADY,ADZ = (_s16(ADXL)/32768*180.0,
-                   _s16(ADYL)/32768*180.0,
-                   _s16(ADZL)/32768*180.0)                     # degrees
-    TEMP = _s16(TEMPL)/100.0                                    # °C
-    DX,DY,DZ = _s16(DXL), _s16(DYL), _s16(DZL)                  # µm
-    HZX,HZY,HZZ = _s16(HZXL), _s16(HZYL), _s16(HZZL)            # Hz (per docs)
-
-    return {
-        'VX': float(VX), 'VY': float(VY), 'VZ': float(VZ),
-        'ADX': float(ADX), 'ADY': float(ADY), 'ADZ': float(ADZ),
-        'TEMP': float(TEMP), 'DX': float(DX), 'DY': float(DY), 'DZ': float(DZ),
-        'HZX': float(HZX), 'HZY': float(HZY), 'HZZ': float(HZZ),
-    }
+    return dict(zip(FIELDS, map(float, rec)))
+
+
+def parse_5561_batch(buf, *, drop_invalid: bool = True) -> np.ndarray:
+    """Decode N back-to-back 28-byte frames into an (N, 13) float64 array.
+
+    Columns follow FIELDS with the same units and scaling as parse_5561.
+    A trailing partial frame is ignored. Frames whose header isn't 0x55,0x61
+    are dropped, or kept as rows of NaN when drop_invalid is False so row i
+    still lines up with frame i.
+    """
+    raw = np.frombuffer(buf, dtype=np.uint8)
+    n = raw.size // _FRAME_LEN
+    if n == 0:
+        return np.empty((0, len(FIELDS)), dtype=np.float64)
+    hdr = raw[:n * _FRAME_LEN].reshape(n, _FRAME_LEN)
+    ok = (hdr[:, 0] == _HDR) & (hdr[:, 1] == _FLAG)
+    words = np.frombuffer(buf, dtype='<i2', count=n * (_FRAME_LEN // 2))
+    words = words.reshape(n, _FRAME_LEN // 2)[:, 1:]
+    if drop_invalid and not ok.all():
+        words = words[ok]
+    out = words.astype(np.float64)
+    out[:, 3:6] *= 180.0 / 32768    # degrees (180/32768 is exact, matches /32768*180)
+    out[:, 6] /= 100.0              # °C
+    if not drop_invalid:
+        out[~ok] = np.nan
+    return out
@@ -1,25 +1,109 @@
 
 from __future__ import annotations
-import asyncio, time
+import asyncio, dataclasses, pathlib, time
+from collections import deque
 from typing import List, Optional
+import numpy as np
 from .config import AppCfg, load_config, DetectorCfg
 from .logs import NdjsonLogger
-from .detector import HitDetector, DetectorParams
+from .detector import HitDetector, DetectorParams, PeakTracker
+from .ringbuf import SampleRing
+from .clock import SampleClock
+from .correlate import ImpactCorrelator, watermark
+from .loopstats import CallbackStats, LoopLagProbe
+from .latency import StageLatency
+from .profiling import install_profile_signal
+from .archive import RawArchive
+from .capture import CaptureWindows, CaptureWriter
+from .retention import LogRetention
+from .sinks import Sink, build_sink
 from .ble.amg import AmgClient
 from .ble.witmotion_bt50 import Bt50Client
-from .ble.wtvb_parse import parse_5561
+from .ble.wtvb_parse import FrameAssembler
+
+# Key layout of the high-rate records, serialised by compiled templates
+# (RecordEncoder.register); anything that does not match is encoded generically.
+LOG_TEMPLATES = {
+    "bt50_buffer_status": {
+        "type": "str", "msg": "str",
+        "data": {
+            "sensor_id": "str", "buffer_size": "int", "time_since_last_ms": "float",
+            "ready_to_process": "bool", "current_amp": "float", "current_vx": "float",
+            "current_vy": "float", "current_vz": "float", "last_processed_ns": "int",
+        },
+    },
+    "bt50_impact_analysis": {
+        "type": "str", "msg": "str",
+        "data": {
+            "sensor_id": "str", "sample_count": "int", "impact_count": "int", "avg_amp": "float",
+            "max_amp": "float", "detector_hit": "any", "peaks_detected": "int",
+            "impact_types": "any", "t0_ns_set": "bool", "detector_state": "str?",
+            "detector_armed": "bool?", "idle_rms": "float",
+        },
+    },
+    "impact_detected": {
+        "type": "str", "sensor_id": "str", "device_id": "str", "target_id": "str",
+        "t_rel_ms": "float?", "event_type": "str", "msg": "str", "string_impact_sequence": "int",
+        "split_time_ms": "float?", "signal_description": "str", "impact_classification": "str",
+        "attribution": "any",
+        "raw_data": {
+            "peak_amplitude": "float", "frame_index": "int", "peak_timestamp": "num",
+            "impact_type": "str", "confidence": "float",
+        },
+    },
+}
 
 class Bridge:
     def __init__(self, cfg: AppCfg):
         self.cfg = cfg
+        # Monotonic ns time source; replay swaps in a virtual clock
+        self.clock = time.monotonic_ns
         # Instantiate logger with dual-file options from config (main log + debug subdir)
         try:
             dual = bool(getattr(cfg.logging, "dual_file", False))
             debug_subdir = getattr(cfg.logging, "debug_subdir", None)
+            async_writer = bool(getattr(cfg.logging, "async_writer", False))
+            queue_size = int(getattr(cfg.logging, "queue_size", 10000))
+            rotate_mb = float(getattr(cfg.logging, "rotate_mb", 0.0) or 0.0)
+            rotate_minutes = float(getattr(cfg.logging, "rotate_minutes", 0.0) or 0.0)
+            compress = bool(getattr(cfg.logging, "compress", False))
+            quota_mb = dict(getattr(cfg.logging, "quota_mb", None) or {})
+            rate_limits = dict(getattr(cfg.logging, "rate_limits", None) or {})
+            suppressed_interval_s = float(getattr(cfg.logging, "suppressed_interval_s", 10.0))
         except Exception:
             dual = False
             debug_subdir = None
-        self.logger = NdjsonLogger(cfg.logging.dir, cfg.logging.file_prefix, dual_file=dual, debug_subdir=debug_subdir)
+            async_writer = False
+            queue_size = 10000
+            rotate_mb = rotate_minutes = 0.0
+            compress = False
+            quota_mb = {}
+            rate_limits = {}
+            suppressed_interval_s = 10.0
+        # Closed segments are compressed and every class of files with a
+        # configured quota kept under it by a worker thread (started in start());
+        # nothing is deleted unless logging.quota_mb asks for it
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        log_dir = pathlib.Path(cfg.logging.dir)
+        prefix = cfg.logging.file_prefix
+        self.retention = LogRetention({
+            "main": (str(log_dir), [f"{prefix}_*.ndjson*"], int(quota_mb.get("main", 0) * 1e6)),
+            "debug": (str(log_dir / (debug_subdir or "debug")), [f"{prefix}_debug_*.ndjson*"],
+                      int(quota_mb.get("debug", 0) * 1e6)),
+            "sensorbuffer": (str(log_dir / "sensorbuffer"), ["capture_*"],
+                             int(quota_mb.get("sensorbuffer", 0) * 1e6)),
+            "raw": (str(log_dir / "raw"), ["*.bt50raw", "*.idx"], int(quota_mb.get("raw", 0) * 1e6)),
+        }, compress=compress, protect=self._active_log_files, on_prune=self._on_retention_prune)
+        # Destinations besides the NDJSON files; a bad entry is a config error
+        self.sinks: List[Sink] = [build_sink(spec) for spec in (getattr(cfg.logging, "sinks", None) or [])]
+        self.logger = NdjsonLogger(cfg.logging.dir, cfg.logging.file_prefix, dual_file=dual, debug_subdir=debug_subdir,
+                                   async_writer=async_writer, queue_size=queue_size,
+                                   max_bytes=int(rotate_mb * 1e6), max_age_s=rotate_minutes * 60.0,
+                                   on_segment_closed=self.retention.closed,
+                                   rate_limits=rate_limits, suppressed_interval_s=suppressed_interval_s,
+                                   sinks=self.sinks)
+        for name, spec in LOG_TEMPLATES.items():
+            self.logger.encoder.register(name, spec)
         # Apply logging mode and whitelist from config if present
         try:
             if hasattr(cfg.logging, 'mode'):
@@ -35,18 +119,75 @@ class Bridge:
         self._pending_session: bool = False
         self.amg: Optional[AmgClient] = None
         self.bt_clients: List[Bt50Client] = []
+        # BLE client classes; the load harness substitutes fakes with the same interface
+        self.amg_client_factory = AmgClient
+        self.bt50_client_factory = Bt50Client
         self.detectors = {}
         self._stream_stats = {}
         self._stop = False
         self._bt_tasks: List[asyncio.Task] = []
         
         # BT50 sample buffering for impact counting
-        self._bt50_samples = {}  # sensor_id -> list of (ts_ns, amp, vx, vy, vz)
-        self._bt50_last_processed = {}  # sensor_id -> last processed timestamp
+        self._bt50_samples = {}  # sensor_id -> SampleRing of (ts_ns, amp, vx, vy, vz)
+        self._bt50_window_start = {}  # sensor_id -> sequence number of the window's first sample
+        self.sample_ring_capacity = 1024  # ~10 s per sensor at 100 Hz
+        # Samples per analysis window (bt50_impact_analysis, buffer-mode detector):
+        # 100 ms at 100 Hz. Peaks do not wait for it.
+        self.bt50_window_samples = 10
+        self._bt50_last_processed = {}  # sensor_id -> sample time of the last window's end
+        self._peak_trackers = {}  # sensor_id -> PeakTracker (single pass, across windows)
+        self._bt50_peaks = {}  # sensor_id -> peaks confirmed since the last window (for its record)
+        self._bt50_framers = {}  # sensor_id -> FrameAssembler (partial frames across notifications)
+        self._bt50_clocks = {}  # sensor_id -> SampleClock (acquisition time from arrival times)
+        self.bt50_sample_period_ns = 10_000_000  # nominal 100 Hz output rate
+        # Every raw frame with its sample time, for re-analysis (logs/raw/*.bt50raw);
+        # written on the archive's own thread
+        self.raw_archive: Optional[RawArchive] = None
+        if getattr(cfg.logging, "raw_archive", False):
+            self.raw_archive = RawArchive(str(pathlib.Path(cfg.logging.dir) / "raw"))
+        # Sample windows around peaks and hits, cut from the rings (sensorbuffer/capture_*)
+        self.captures: Optional[CaptureWindows] = None
+        if getattr(cfg.logging, "captures", True):
+            self.captures = CaptureWindows(
+                CaptureWriter(str(pathlib.Path(cfg.logging.dir) / "sensorbuffer")),
+                pre_ns=int(float(getattr(cfg.logging, "capture_pre_ms", 200.0)) * 1e6),
+                post_ns=int(float(getattr(cfg.logging, "capture_post_ms", 500.0)) * 1e6))
         
-        # String impact sequencing
-        self._string_impact_count = 0  # Total impacts in current string
-        self._last_shot_time = None  # For calculating split times
+        # String impact sequencing: per string (keyed by its T0), the impacts
+        # counted so far and the t_rel_ms of the last one, for split times.
+        # The previous string is kept for peaks that are processed after a T0
+        # but were sampled before it.
+        self._string: Optional[dict] = None
+        self._prev_string: Optional[dict] = None
+
+        # Cross-sensor attribution: peaks wait here until every sensor has been
+        # processed past them, then the strongest of a group is the hit.
+        window_ms = float(getattr(cfg.detector, "attribution_window_ms", 20.0))
+        self.correlator = ImpactCorrelator(int(window_ms * 1e6))
+        self._bt50_marks = {}  # sensor_id -> sample time its peaks are complete up to
+        self.attribution_hold_ns = 250_000_000  # max wait on a sensor that stopped reporting
+
+        # Detection mode: 'buffer' (windowed average) or 'stream' (per-sample)
+        self.detect_mode = getattr(cfg.detector, "mode", "buffer") or "buffer"
+        self._bt50_last_ts = {}  # sensor_id -> ts_ns of previous sample (stream mode)
+        self._ring_start_ns = {}  # sensor_id -> ts_ns of the sample that opened the ring
+        # Notify-to-event latency (ms) of emitted impact events, for the status record
+        self._detect_latency_ms = deque(maxlen=1024)
+
+        # Event-loop health for the status record: how late timers fire and how
+        # long each BLE callback holds the loop. At 100 Hz a sensor notifies
+        # every 10 ms, so anything over 5 ms risks notifications queueing up.
+        self.callback_stats = CallbackStats(budget_ns=5_000_000)
+        self.loop_lag = LoopLagProbe(interval_s=0.025, budget_ns=5_000_000)
+        # Per-sensor latency histograms of the BT50 pipeline stages, on self.clock:
+        #   parse  notification arrival -> frames decoded
+        #   detect frames decoded -> samples through peak tracker/window/detector
+        #   ring   ring onset sample time -> HIT record built (stream mode)
+        #   queue  peak sample time -> peak handed to attribution (look-ahead wait)
+        #   event  handed to attribution -> impact record built (group hold)
+        #   write  HIT/impact record built -> its line in the log files (with
+        #          async_writer, recorded by the writer thread after the batch)
+        self._stage_latency = {}  # sensor_id -> StageLatency
 
     async def start(self):
         # Start AMG listener with reconnect/backoff loop (only if AMG is configured)
@@ -55,18 +196,19 @@ class Bridge:
             max_b = max(backoff, float(self.cfg.amg.reconnect_max_sec))
             jitter = max(0.0, float(self.cfg.amg.reconnect_jitter_sec))
             while not self._stop:
-                self.amg = AmgClient(
+                self.amg = self.amg_client_factory(
                     self.cfg.amg.adapter,
                     self.cfg.amg.mac or self.cfg.amg.name,
                     self.cfg.amg.start_uuid,
                     self.cfg.amg.write_uuid,
                     self.cfg.amg.commands,
                 )
-                self.amg.on_t0(self._on_t0)
+                wrap = self.callback_stats.wrap
+                self.amg.on_t0(wrap("amg_t0", self._on_t0))
                 # Optional raw dump for debugging
-                self.amg.on_raw(lambda ts, raw: self._on_amg_raw(ts, raw))
+                self.amg.on_raw(wrap("amg_raw", lambda ts, raw: self._on_amg_raw(ts, raw)))
                 # Structured signals
-                self.amg.on_signal(lambda ts, name, raw: self._on_amg_signal(ts, name, raw))
+                self.amg.on_signal(wrap("amg_signal", lambda ts, name, raw: self._on_amg_signal(ts, name, raw)))
                 try:
                     # Log intent to connect
                     self.logger.write({
@@ -167,18 +309,50 @@ class Bridge:
             self._bt_tasks.append(task)
 
         # Periodic status
+        self._loop = asyncio.get_running_loop()
+        self.retention.start()
+        self.retention.enforce()  # leftovers from earlier runs
+        self.loop_lag.start()
         asyncio.create_task(self._status_task())
 
     async def _status_task(self):
         while True:
+            data = {"sensors": list(self.detectors.keys())}
+            if self._detect_latency_ms:
+                data["detect_latency_ms"] = self._latency_summary()
+            if self._bt50_clocks:
+                # Arrival jitter the clock model removes from sample timestamps
+                data["bt50_clock"] = {sid: c.stats() for sid, c in self._bt50_clocks.items()}
+            # Since the previous status record: timer lateness (BLE stack and
+            # everything else on the loop) vs time spent in our own callbacks
+            data["loop_lag"] = self.loop_lag.snapshot()
+            data["callbacks"] = self.callback_stats.snapshot()
+            data["logger"] = self.logger.stats()
+            data["log_volume"] = self.retention.volume(self.logger.bytes)
+            if self.raw_archive is not None:
+                data["raw_archive"] = self.raw_archive.stats()
+            if self.captures is not None:
+                data["captures"] = self.captures.writer.stats()
+            if self.sinks:
+                data["sinks"] = {s.name: s.stats() for s in self.sinks}
+            stage_ms = {sid: st.snapshot() for sid, st in self._stage_latency.items()}
+            if any(stage_ms.values()):
+                data["stage_latency_ms"] = stage_ms
             self.logger.write({
                 "type":"status",
-                "t_rel_ms": None if self.t0_ns is None else (time.monotonic_ns()-self.t0_ns)/1e6,
+                "t_rel_ms": None if self.t0_ns is None else (self.clock()-self.t0_ns)/1e6,
                 "msg":"alive",
-                "data":{"sensors": list(self.detectors.keys())}
+                "data": data
             })
             await asyncio.sleep(5)
 
+    def _latency_summary(self) -> dict:
+        """Median/p99 of the recent notify-to-event latencies for the active detect mode."""
+        lat = np.fromiter(self._detect_latency_ms, dtype=np.float64)
+        p50, p99 = np.percentile(lat, [50, 99])
+        return {"mode": self.detect_mode, "n": int(lat.size), "p50": round(float(p50), 2),
+                "p99": round(float(p99), 2), "max": round(float(lat.max()), 2)}
+
     async def _bt50_loop(self, sensor_id: str, adapter: str, mac: str, notify_uuid: str, config_uuid: Optional[str]):
         """Maintain a BT50 connection with reconnects."""
         # Pull per-sensor config for backoff and keepalive/idle
@@ -192,12 +366,13 @@ class Bridge:
         reconnect_jitter = float(getattr(scfg, "reconnect_jitter_sec", 1.0) if scfg else 1.0)
         backoff = max(0.0, reconnect_initial)
         while not self._stop:
-            cli = Bt50Client(adapter, mac, notify_uuid, config_uuid)
+            cli = self.bt50_client_factory(adapter, mac, notify_uuid, config_uuid)
             # apply tunables
             if scfg:
                 cli.idle_reconnect_sec = float(getattr(scfg, "idle_reconnect_sec", cli.idle_reconnect_sec))
                 cli.keepalive_batt_sec = float(getattr(scfg, "keepalive_batt_sec", cli.keepalive_batt_sec))
-            cli.on_packet(lambda ts, data, p=sensor_id: self._on_bt50_packet(p, ts, data))
+            cli.on_packet(self.callback_stats.wrap(
+                f"bt50_{sensor_id}", lambda ts, data, p=sensor_id: self._on_bt50_packet(p, ts, data)))
             # Log intent to connect
             self.logger.write({"type": "info", "msg": "Sensor_connecting", "data": {"sensor_id": sensor_id, "adapter": adapter, "mac": mac}})
             try:
@@ -212,13 +387,13 @@ class Bridge:
             if cli not in self.bt_clients:
                 self.bt_clients.append(cli)
             if sensor_id not in self.detectors:
-                self.detectors[sensor_id] = HitDetector(DetectorParams(**self.cfg.detector.__dict__))
+                self.detectors[sensor_id] = self._new_detector()
             # Log connection details
             self.logger.write({"type": "info", "msg": "Sensor_connected", "data": {"sensor_id": sensor_id, "adapter": adapter, "mac": mac, "notify_uuid": notify_uuid}})
             
             # Initialize t0_ns for BT50-only mode (since AMG is disabled)
             if self.t0_ns is None:
-                self.t0_ns = time.time_ns()
+                self.t0_ns = self.clock()  # same time base as BT50 sample stamps
                 # Emit a sensor-specific initialization event rather than reusing
                 # the Timer_START_BTN message which is reserved for AMG timer-origin starts.
                 device_id = sensor_id[-4:] if len(sensor_id) >= 4 else sensor_id
@@ -262,6 +437,10 @@ class Bridge:
             await asyncio.sleep(min(reconnect_max, backoff) + reconnect_jitter)
             backoff = min(reconnect_max, max(1.0, backoff * 1.7))
 
+    def _new_detector(self) -> HitDetector:
+        params = {f.name: getattr(self.cfg.detector, f.name) for f in dataclasses.fields(DetectorParams)}
+        return HitDetector(DetectorParams(**params))
+
     def _on_t0(self, t0_ns: int, raw: bytes):
         # If we haven't already marked a session start, infer a start button at T0
         if not self._pending_session:
@@ -273,9 +452,8 @@ class Bridge:
             })
         self.t0_ns = t0_ns
         
-        # Reset string impact counter for new string
-        self._string_impact_count = 0
-        self._last_shot_time = None
+        # New string: impacts still held for attribution keep the string they were queued in
+        self._string_for(t0_ns)
         
         self.logger.write({"type":"event","t_rel_ms":0.0,"msg":"T0","data":{"raw": raw.hex()}})
 
@@ -347,23 +525,60 @@ class Bridge:
             self._pending_session = False
 
     def _on_bt50_packet(self, sensor_id: str, ts_ns: int, payload: bytes):
-        # Prefer structured parse per WTVB01-BT50 manual (HDR 0x55, FLAG 0x61)
-        # Fallback to byte-energy heuristic if parse fails.
+        # Recover every WTVB01-BT50 frame (HDR 0x55, FLAG 0x61) in the notification;
+        # fall back to the byte-energy heuristic if the payload holds none.
         if not payload:
             return
-        pkt = parse_5561(payload)
-        if pkt is not None:
-            # Use velocity magnitude (mm/s) as amplitude proxy
-            vx, vy, vz = pkt['VX'], pkt['VY'], pkt['VZ']
-            amp = (vx*vx + vy*vy + vz*vz) ** 0.5
-        else:
+        framer = self._bt50_framers.get(sensor_id)
+        if framer is None:
+            framer = self._bt50_framers[sensor_id] = FrameAssembler(keep_raw=self.raw_archive is not None)
+        frames = framer.feed(payload)
+        t_parsed = self.clock()
+        if not frames:
+            if framer.pending:
+                return  # partial frame, completed by the next notification
             s = sum(b*b for b in payload) / len(payload)
             amp = float(s**0.5)  # pseudo-RMS of payload bytes
-            vx = vy = vz = 0.0  # Fallback values
+            self._on_bt50_sample(sensor_id, ts_ns, amp, 0.0, 0.0, 0.0)
+            return
+        # The notification's arrival time belongs to its last frame; the clock
+        # model turns frame indices into acquisition times without BLE jitter,
+        # advancing the index past samples of notifications that never arrived.
+        clock = self._bt50_clocks.get(sensor_id)
+        if clock is None:
+            clock = self._bt50_clocks[sensor_id] = SampleClock(self.bt50_sample_period_ns)
+        last = clock.update(framer.frames - 1, ts_ns)
+        times = [clock.time_of(k) for k in range(last - len(frames) + 1, last + 1)]
+        if self.raw_archive is not None:
+            self.raw_archive.append(sensor_id, times, framer.raw)
+        for pkt, t in zip(frames, times):
+            # Use velocity magnitude (mm/s) as amplitude proxy
+            vx, vy, vz = float(pkt.VX), float(pkt.VY), float(pkt.VZ)
+            amp = (vx*vx + vy*vy + vz*vz) ** 0.5
+            self._on_bt50_sample(sensor_id, t, amp, vx, vy, vz)
+        stages = self._stages(sensor_id)
+        stages.record("parse", t_parsed - ts_ns)
+        stages.record("detect", self.clock() - t_parsed)
+
+    def _written_after(self, stages: StageLatency, t_built: int):
+        """on_written callback recording the write stage of a record built at t_built."""
+        clock = self.clock
+        return lambda: stages.record("write", clock() - t_built)
+
+    def _stages(self, sensor_id: str) -> StageLatency:
+        stages = self._stage_latency.get(sensor_id)
+        if stages is None:
+            stages = self._stage_latency[sensor_id] = StageLatency(("parse", "detect", "ring", "queue", "event", "write"))
+        return stages
+
+    def _on_bt50_sample(self, sensor_id: str, ts_ns: int, amp: float, vx: float, vy: float, vz: float):
+        if self.detect_mode == "stream":
+            self._stream_detect(sensor_id, ts_ns, amp)
 
         # Initialize sample buffer for this sensor
         if sensor_id not in self._bt50_samples:
-            self._bt50_samples[sensor_id] = []
+            self._bt50_samples[sensor_id] = SampleRing(self.sample_ring_capacity)
+            self._bt50_window_start[sensor_id] = 0
             self._bt50_last_processed[sensor_id] = 0
             # Log buffer initialization
             self.logger.write({
@@ -373,23 +588,24 @@ class Bridge:
             })
         
         # Add sample to buffer
-        self._bt50_samples[sensor_id].append((ts_ns, amp, vx, vy, vz))
+        ring = self._bt50_samples[sensor_id]
+        ring.append(ts_ns, amp, vx, vy, vz)
+        self._detect_impact_peaks(sensor_id, ts_ns, amp)
         
-        # Process buffered samples every ~100ms for real-time impact detection
-        buffer = self._bt50_samples[sensor_id]
-        time_window_ns = 100_000_000  # 100ms in nanoseconds
+        # Analyse the window every bt50_window_samples samples
+        buffered = min(ring.total - self._bt50_window_start[sensor_id], len(ring))
+        ready_to_process = buffered >= self.bt50_window_samples
         
         # Debug buffer status every 20 samples or when we have motion or always for first 5 packets
         time_since_last = (ts_ns - self._bt50_last_processed[sensor_id]) / 1_000_000  # ms
-        ready_to_process = len(buffer) >= 5 and time_since_last > 100
         
-        if len(buffer) <= 5 or len(buffer) % 20 == 0 or amp > 0.1 or ready_to_process:
+        if buffered <= 5 or buffered % 20 == 0 or amp > 0.1 or ready_to_process:
             self.logger.write({
                 "type": "debug",
                 "msg": "bt50_buffer_status", 
                 "data": {
                     "sensor_id": sensor_id,
-                    "buffer_size": len(buffer),
+                    "buffer_size": buffered,
                     "time_since_last_ms": round(time_since_last, 1),
                     "ready_to_process": ready_to_process,
                     "current_amp": round(amp, 3),
@@ -400,31 +616,73 @@ class Bridge:
                 }
             })
         
-        if len(buffer) >= 5 and (ts_ns - self._bt50_last_processed[sensor_id]) > time_window_ns:
+        if ready_to_process:
             self._process_bt50_buffer(sensor_id, ts_ns)
             self._bt50_last_processed[sensor_id] = ts_ns
     
+    def _stream_detect(self, sensor_id: str, ts_ns: int, amp: float):
+        """Feed one sample to the sensor's detector and emit HIT when its ring closes."""
+        det = self.detectors.get(sensor_id)
+        if det is None:
+            return
+        last_ns = self._bt50_last_ts.get(sensor_id)
+        self._bt50_last_ts[sensor_id] = ts_ns
+        dt_ms = 0.0 if last_ns is None else max(0.0, (ts_ns - last_ns) / 1e6)
+        was_ringing = det.state == "ring"
+        hit = det.update(amp, dt_ms)
+        if not was_ringing and det.state == "ring":
+            self._ring_start_ns[sensor_id] = ts_ns
+        if not hit:
+            return
+        onset_ns = self._ring_start_ns.pop(sensor_id, ts_ns)
+        if self.captures is not None:
+            self.captures.trigger(sensor_id, onset_ns, "hit")
+        t_hit = self.clock()
+        latency_ms = (t_hit - onset_ns) / 1e6
+        self._detect_latency_ms.append(latency_ms)
+        stages = self._stages(sensor_id)
+        stages.record("ring", t_hit - onset_ns)
+        self.logger.write({
+            "type": "event",
+            "msg": "HIT",
+            "plate": sensor_id,
+            "t_rel_ms": None if self.t0_ns is None else (onset_ns - self.t0_ns) / 1e6,
+            "data": {
+                "sensor_id": sensor_id,
+                "peak": round(hit["peak"], 3),
+                "rms": round(hit["rms"], 3),
+                "dur_ms": round(hit["dur_ms"], 1),
+                "latency_ms": round(latency_ms, 2),
+            },
+        }, on_written=self._written_after(stages, t_hit))
+
     def _process_bt50_buffer(self, sensor_id: str, ts_ns: int):
         """Process buffered BT50 samples to detect discrete impact events with double tap classification"""
-        buffer = self._bt50_samples[sensor_id]
-        if not buffer:
+        ring = self._bt50_samples[sensor_id]
+        buffer = ring.view(self._bt50_window_start[sensor_id])  # zero-copy window
+        if not len(buffer):
             return
             
-        # Extract amplitudes and detect peaks
-        peaks = self._detect_impact_peaks(buffer)
+        # Peaks confirmed by the tracker since the previous window (already
+        # captured and queued for attribution as each was confirmed)
+        peaks = self._bt50_peaks.get(sensor_id) or []
+        self._bt50_peaks[sensor_id] = []
         impact_count = len(peaks)
-        max_amp = max([sample[1] for sample in buffer]) if buffer else 0.0
-        total_amp = sum([sample[1] for sample in buffer])
+        amps = buffer['amp']
+        max_amp = float(amps.max())
         
         # Classify peak patterns (single, double tap, etc.)
         impact_classifications = self._classify_impact_patterns(peaks)
         
         # Calculate aggregated amplitude for detector (similar to bt50_stream avg_amp)
-        avg_amp = total_amp / len(buffer) if buffer else 0.0
+        avg_amp = float(amps.mean(dtype=np.float64))
         
-        # Process through detector with aggregated amplitude
+        # Process through detector with aggregated amplitude (stream mode has
+        # already fed every sample individually)
         det = self.detectors[sensor_id]
-        hit = det.update(avg_amp, dt_ms=2000.0)  # 2-second window
+        hit = None
+        if self.detect_mode != "stream":
+            hit = det.update(avg_amp, dt_ms=2000.0)  # 2-second window
         
         # ALWAYS log buffer analysis and write detailed data for inspection
         self.logger.write({
@@ -446,28 +704,78 @@ class Bridge:
             }
         })
         
-        # ALWAYS write detailed buffer data to text file for analysis
-        self._write_detailed_buffer(sensor_id, buffer, avg_amp, impact_count, hit)
-        
-        # Generate individual impact events for each detected peak (like AMG_RAW format)
-        if impact_count > 0 and self.t0_ns is not None:
-            # Get device identifier from BT50 MAC (last 4 characters)
-            device_id = sensor_id[-4:] if len(sensor_id) >= 4 else sensor_id
-            
-            for i, (peak, classification) in enumerate(zip(peaks, impact_classifications)):
-                t_rel_ms = (ts_ns - self.t0_ns)/1e6
-                
+        # Capture the samples around hits; quiet windows cost no I/O
+        if self.captures is not None:
+            if hit:
+                self.captures.trigger(sensor_id, int(buffer['ts_ns'][0]), "hit")
+            self._poll_capture(sensor_id, ring)
+
+        # Windows do not overlap: the peak tracker carries its look-ahead across them
+        self._bt50_window_start[sensor_id] = ring.total
+
+    def _string_for(self, ts_ns: int) -> dict:
+        """Sequencing state of the string a peak sampled at ts_ns belongs to.
+
+        Taken when the peak is queued, so an impact held for attribution past
+        a T0 or string end is still numbered and timed within its own string.
+        """
+        cur = self._string
+        if cur is None or cur["t0_ns"] != self.t0_ns:
+            self._prev_string = cur
+            cur = self._string = {"t0_ns": self.t0_ns, "impacts": 0, "last_shot_ms": None}
+        prev = self._prev_string
+        if ts_ns < cur["t0_ns"] and prev is not None and ts_ns >= prev["t0_ns"]:
+            return prev
+        return cur
+
+    def _emit_impacts(self, watermark_ns: Optional[int]):
+        """Emit impact events for every correlator group closed by `watermark_ns`.
+
+        The primary of a group is the string's impact (sequence, split time);
+        sympathetic detections on neighbouring plates are logged separately.
+        """
+        for group in self.correlator.flush(watermark_ns):
+            for det in group:
+                i, peak, classification, t_queued, string = det.data
+                sensor_id = det.sensor_id
+                # Get device identifier from BT50 MAC (last 4 characters)
+                device_id = sensor_id[-4:] if len(sensor_id) >= 4 else sensor_id
+                t_rel_ms = (peak['timestamp'] - string["t0_ns"]) / 1e6
+                raw_data = {
+                    "peak_amplitude": round(peak['amplitude'], 3),
+                    "frame_index": peak['frame_idx'],
+                    "peak_timestamp": round(peak['timestamp'], 1),
+                    "impact_type": classification,
+                    "confidence": 0.95  # Default confidence
+                }
+                attribution = {"role": det.role, "group_size": det.group_size}
+                if det.role == "sympathetic":
+                    attribution["primary_sensor"] = det.primary_sensor
+                    self.logger.write({
+                        "type": "event",
+                        "sensor_id": sensor_id,
+                        "device_id": device_id,
+                        "target_id": f"target_{device_id}",
+                        "t_rel_ms": t_rel_ms,
+                        "event_type": "impact_sympathetic",
+                        "msg": f"Sympathetic impact on {device_id}",
+                        "attribution": attribution,
+                        "raw_data": raw_data,
+                    })
+                    continue
+                attribution["sympathetic"] = [d.sensor_id for d in group if d is not det]
+
                 # Increment string impact counter
-                self._string_impact_count += 1
-                
+                string["impacts"] += 1
+
                 # Calculate split time from last shot/impact
                 split_time_ms = None
-                if self._last_shot_time is not None:
-                    split_time_ms = t_rel_ms - self._last_shot_time
-                
+                if string["last_shot_ms"] is not None:
+                    split_time_ms = t_rel_ms - string["last_shot_ms"]
+
                 # Derive target ID from sensor device_id (12E3 -> target_1, etc.)
                 target_id = f"target_{device_id}"
-                
+
                 # Create individual impact event similar to AMG_RAW format
                 impact_event = {
                     "type": "event",
@@ -477,57 +785,60 @@ class Bridge:
                     "t_rel_ms": t_rel_ms,
                     "event_type": "impact_detected",  # Changed from BT50_RAW
                     "msg": f"Impact #{i + 1} detected",  # Similar to "Shot #1 detected"
-                    "string_impact_sequence": self._string_impact_count,
+                    "string_impact_sequence": string["impacts"],
                     "split_time_ms": split_time_ms,
                     "signal_description": f"Impact #{i + 1} detected",
                     "impact_classification": classification,  # SINGLE, DOUBLE_TAP, etc.
-                    "raw_data": {
-                        "peak_amplitude": round(peak['amplitude'], 3),
-                        "frame_index": peak['frame_idx'],
-                        "peak_timestamp": round(peak['timestamp'], 1),
-                        "impact_type": classification,
-                        "confidence": 0.95  # Default confidence
-                    }
+                    "attribution": attribution,
+                    "raw_data": raw_data,
                 }
-                self.logger.write(impact_event)
-                
+                t_built = self.clock()
+                stages = self._stages(sensor_id)
+                stages.record("event", t_built - t_queued)
+                self.logger.write(impact_event, on_written=self._written_after(stages, t_built))
+                if self.detect_mode != "stream":
+                    self._detect_latency_ms.append((t_built - peak['timestamp']) / 1e6)
+
                 # Update last shot time for next split calculation
-                self._last_shot_time = t_rel_ms
-        
-        # Clear processed samples (keep recent ones for overlap)
-        keep_recent = 10  # Keep last 10 samples for continuity
-        self._bt50_samples[sensor_id] = buffer[-keep_recent:] if len(buffer) > keep_recent else []
-
-    def _detect_impact_peaks(self, buffer):
-        """Detect discrete impact peaks in BT50 buffer using amplitude thresholds"""
-        peaks = []
-        if not buffer:
-            return peaks
-            
-        # Extract timestamps and amplitudes
-        frame_data = [(i, sample[0], sample[1]) for i, sample in enumerate(buffer)]
-        
-        # Find amplitude peaks above baseline threshold
-        peak_threshold = 0.5  # Minimum amplitude to consider a peak
-        for i, (frame_idx, timestamp, amplitude) in enumerate(frame_data):
-            if amplitude > peak_threshold:
-                # Check if this is a local maximum
-                is_peak = True
-                
-                # Check neighbors within 3 frames (avoid double-counting resonance)
-                for j in range(max(0, i-3), min(len(frame_data), i+4)):
-                    if j != i and frame_data[j][2] > amplitude:
-                        is_peak = False
-                        break
-                
-                if is_peak:
-                    peaks.append({
-                        'frame_idx': frame_idx,
-                        'timestamp': timestamp, 
-                        'amplitude': amplitude
-                    })
-        
-        return peaks
+                string["last_shot_ms"] = t_rel_ms
+
+    def _detect_impact_peaks(self, sensor_id: str, ts_ns: int, amp: float):
+        """Feed one sample to the sensor's peak tracker; queue the peak it confirms, if any.
+
+        A peak is an amplitude above 0.5 that is the maximum within +/-3 frames
+        (avoids double-counting resonance). It is confirmed 3 frames later and
+        reported once, even when it straddles a processing window.
+        """
+        tracker = self._peak_trackers.get(sensor_id)
+        if tracker is None:
+            tracker = self._peak_trackers[sensor_id] = PeakTracker(threshold=0.5, radius=3)
+        peak = tracker.update(ts_ns, amp)
+        if peak is not None:
+            self._queue_peak(sensor_id, peak)
+        if tracker.judged_ns is not None:
+            # Every peak of this sensor up to there is queued
+            self._bt50_marks[sensor_id] = tracker.judged_ns
+        if len(self.correlator):
+            self._emit_impacts(watermark(self._bt50_marks, self.attribution_hold_ns))
+
+    def _queue_peak(self, sensor_id: str, peak: dict):
+        """Capture around a confirmed peak and queue it for cross-sensor attribution.
+
+        Impact events go out once every sensor has been processed past the
+        peak's group window. The classification looks back over the peaks
+        of the current window only; a peak is not revised by later ones.
+        """
+        peaks = self._bt50_peaks.setdefault(sensor_id, [])
+        peaks.append(peak)
+        if self.captures is not None:
+            self.captures.trigger(sensor_id, peak['timestamp'], "peak")
+        if self.t0_ns is None:
+            return
+        t_queued = self.clock()
+        classification = self._classify_impact_patterns(peaks)[-1]
+        self._stages(sensor_id).record("queue", t_queued - peak['timestamp'])
+        self.correlator.add(peak['timestamp'], sensor_id, peak['amplitude'],
+                            (len(peaks) - 1, peak, classification, t_queued, self._string_for(peak['timestamp'])))
 
     def _classify_impact_patterns(self, peaks):
         """Classify impact patterns as single, double tap, triple tap, etc."""
@@ -570,79 +881,40 @@ class Bridge:
                 
         return classifications
 
-        # Periodic telemetry to confirm streaming and help calibrate
-        st = self._stream_stats.get(sensor_id)
-        if st is None:
-            st = {"n": 0, "sum": 0.0, "last_ns": ts_ns}
-            self._stream_stats[sensor_id] = st
-        st["n"] += 1
-        st["sum"] += amp
-        if st["n"] >= 200 or (ts_ns - st["last_ns"]) > 2_000_000_000:
-            avg = st["sum"] / max(1, st["n"])
-            data = {"sensor_id": sensor_id, "samples": st["n"], "avg_amp": round(avg, 3)}
-            # Include a snapshot of parsed fields occasionally if parse succeeded recently
-            if pkt is not None:
-                # keep it compact: only a few fields
-                data.update({"avg_vx": pkt['VX'], "avg_vy": pkt['VY'], "avg_vz": pkt['VZ'], "temp_c": pkt['TEMP']})
-            self.logger.write({"type":"info","msg":"bt50_stream","data": data})
-            st["n"] = 0
-            st["sum"] = 0.0
-            st["last_ns"] = ts_ns
-
-    def _write_detailed_buffer(self, sensor_id: str, buffer, avg_amp: float, impact_count: int, hit):
-        """Write detailed buffer data to text file for analysis"""
-        import datetime as dt
-        import pathlib
-        
-        # Create sensorbuffer subdirectory if it doesn't exist
-        buffer_dir = pathlib.Path(self.cfg.logging.dir) / "sensorbuffer"
-        buffer_dir.mkdir(parents=True, exist_ok=True)
-        
-        timestamp = dt.datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = buffer_dir / f"buffer_detail_{sensor_id}_{timestamp}_amp{avg_amp:.3f}_impacts{impact_count}.txt"
-        
-        try:
-            with open(filename, 'w') as f:
-                f.write(f"# BT50 Buffer Detail Analysis\n")
-                f.write(f"# Sensor: {sensor_id}\n")
-                f.write(f"# Timestamp: {timestamp}\n")
-                f.write(f"# Buffer Size: {len(buffer)} samples\n")
-                f.write(f"# Average Amplitude: {avg_amp:.3f}\n")
-                f.write(f"# Impact Count: {impact_count}\n")
-                f.write(f"# Detector Hit: {hit}\n")
-                f.write(f"#\n")
-                f.write(f"# Format: sample_idx, ts_ns, amplitude, vx_mm_s, vy_mm_s, vz_mm_s\n")
-                f.write(f"#\n")
-                
-                for i, (ts_ns, amp, vx, vy, vz) in enumerate(buffer):
-                    f.write(f"{i:3d}, {ts_ns:15d}, {amp:8.3f}, {vx:8.3f}, {vy:8.3f}, {vz:8.3f}\n")
-                
-                f.write(f"\n# Summary Statistics:\n")
-                f.write(f"# Max Amplitude: {max(sample[1] for sample in buffer):.3f}\n")
-                f.write(f"# Non-zero Velocities: {sum(1 for _, _, vx, vy, vz in buffer if abs(vx) > 0.001 or abs(vy) > 0.001 or abs(vz) > 0.001)}\n")
-                f.write(f"# Time Span: {(buffer[-1][0] - buffer[0][0]) / 1_000_000:.1f} ms\n")
-                
-            # Log as info only for buffers with meaningful activity, otherwise debug
-            log_type = "info" if (impact_count > 0 or avg_amp > 0.01) else "debug"
-            self.logger.write({
-                "type": log_type,
-                "msg": "buffer_detail_written", 
-                "data": {"sensor_id": sensor_id, "filename": str(filename), "samples": len(buffer), "avg_amp": avg_amp, "impacts": impact_count}
-            })
-        except Exception as e:
-            self.logger.write({
-                "type": "error",
-                "msg": "buffer_detail_write_failed",
-                "data": {"sensor_id": sensor_id, "error": str(e)}
-            })
+    def _active_log_files(self) -> list:
+        paths = self.logger.active_paths()
+        if self.captures is not None:
+            paths += self.captures.writer.active_paths()
+        if self.raw_archive is not None:
+            paths += self.raw_archive.active_paths()
+        return paths
+
+    def _on_retention_prune(self, cls: str, paths: List[str], size: int):
+        # Called on the retention thread just before the files go; the record
+        # is written from the event loop like every other one
+        rec = {"type": "info", "msg": "retention_prune", "data": {"class": cls, "files": paths, "bytes": size}}
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self.logger.write, rec)
+        else:
+            self.logger.write(rec)
+
+    def _poll_capture(self, sensor_id: str, ring: SampleRing, force: bool = False):
+        entry = self.captures.poll(sensor_id, ring, force)
+        if entry is not None:
+            self.logger.write({"type": "info", "msg": "capture_written", "data": entry})
 
     async def stop(self):
         self._stop = True
+        self.loop_lag.stop()
+        try:
+            self._emit_impacts(None)  # groups still waiting on other sensors
+        except Exception:
+            pass
         for t in self._bt_tasks:
             t.cancel()
             try:
                 await t
-            except Exception:
+            except (asyncio.CancelledError, Exception):
                 pass
         for cli in self.bt_clients:
             try:
@@ -654,11 +926,26 @@ class Bridge:
                 await self.amg.stop()
             except Exception:
                 pass
+        if self.raw_archive is not None:
+            self.raw_archive.close()
+        if self.captures is not None:
+            for sid in self.captures.pending():
+                self._poll_capture(sid, self._bt50_samples[sid], force=True)
+            self.captures.writer.stop()
+        # Drain the async log writer (a no-op in synchronous mode)
+        self.logger.stop()
+        for s in self.sinks:
+            s.stop()
+        self.retention.stop()
 
-async def run(config_path: str):
+async def run(config_path: str, profile_seconds: float = 30.0, profile_cprofile: Optional[bool] = None):
     cfg = load_config(config_path)
     br = Bridge(cfg)
     await br.start()
+    # `kill -USR1 <pid>` profiles the running bridge into logs/profiles/
+    if profile_seconds > 0:
+        install_profile_signal(str(pathlib.Path(cfg.logging.dir) / "profiles"), profile_seconds, br.logger.write,
+                               cprofile=profile_cprofile)
     try:
         while True:
             await asyncio.sleep(1)
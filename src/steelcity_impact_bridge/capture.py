@@ -0,0 +1,194 @@
+"""Pre/post-trigger capture of BT50 sample windows.
+
+When a peak or detector hit fires on a sensor, the samples from `pre_ns`
+before it to `post_ns` after it are cut from the sensor's SampleRing (which
+doubles as the pre-trigger history) and appended, on a background thread,
+to a rolling per-day capture file:
+
+    sensorbuffer/capture_YYYYMMDD.bin        SAMPLE_DTYPE rows, window after window
+    sensorbuffer/capture_YYYYMMDD.idx.ndjson one line per window: sensor_id,
+                                             trigger_ns, reason, triggers,
+                                             offset (bytes), samples, t_first_ns,
+                                             t_last_ns
+
+Triggers that arrive while a window is still open extend it (up to
+`max_ns` long), so a burst of peaks is one capture. Without triggers
+nothing is written, and the writer thread is not even started.
+"""
+from __future__ import annotations
+import json, pathlib, queue, threading, time
+from typing import Dict, IO, Optional, Tuple
+
+import numpy as np
+
+from .ringbuf import SampleRing, SAMPLE_DTYPE
+
+_STOP = object()  # writer-thread shutdown sentinel
+
+
+def load_window(path: str, offset: int, samples: int) -> np.ndarray:
+    """One capture window's SAMPLE_DTYPE rows, from its index entry."""
+    return np.fromfile(path, dtype=SAMPLE_DTYPE, count=int(samples), offset=int(offset))
+
+
+class CaptureWriter:
+    """Appends capture windows to the day's capture file from a writer thread.
+
+    submit() only assigns the window its place in the file and queues it;
+    offsets are known up front because the one writer appends in submit
+    order. When `queue_size` windows are waiting, new ones are dropped.
+    """
+
+    def __init__(self, dir: str, queue_size: int = 256):
+        self.dir = pathlib.Path(dir)
+        self._q: "queue.Queue" = queue.Queue(maxsize=int(queue_size))
+        self._day = ""
+        self._deadline = 0.0
+        self._data_path: Optional[pathlib.Path] = None
+        self._size = 0
+        self.written = self.dropped = self.errors = self.bytes = 0
+        self._thread: Optional[threading.Thread] = None  # started by the first submit()
+
+    def _paths(self) -> Tuple[pathlib.Path, pathlib.Path]:
+        now = time.time()
+        if now >= self._deadline:
+            lt = time.localtime(now)
+            self._day = time.strftime("%Y%m%d", lt)
+            self._deadline = time.mktime((lt.tm_year, lt.tm_mon, lt.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+            self._data_path = self.dir / f"capture_{self._day}.bin"
+            # Nothing is queued for a new day's file yet, so its size is settled
+            self._size = self._data_path.stat().st_size if self._data_path.exists() else 0
+        return self._data_path, self.dir / f"capture_{self._day}.idx.ndjson"
+
+    def active_paths(self) -> list:
+        """The day's capture files, still being appended to."""
+        if self._data_path is None:
+            return []
+        return [str(self._data_path), str(self.dir / f"capture_{self._day}.idx.ndjson")]
+
+    def submit(self, sensor_id: str, trigger_ns: int, reason: str, triggers: int,
+               rows: np.ndarray) -> Optional[dict]:
+        """Queue one window; returns its index entry (with `file`), or None if dropped."""
+        data_path, idx_path = self._paths()
+        blob = np.ascontiguousarray(rows, dtype=SAMPLE_DTYPE).tobytes()
+        entry = {
+            "sensor_id": sensor_id, "trigger_ns": int(trigger_ns), "reason": reason,
+            "triggers": int(triggers), "offset": self._size, "samples": len(rows),
+            "t_first_ns": int(rows["ts_ns"][0]) if len(rows) else None,
+            "t_last_ns": int(rows["ts_ns"][-1]) if len(rows) else None,
+        }
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="capture-writer", daemon=True)
+            self._thread.start()
+        try:
+            self._q.put_nowait((data_path, idx_path, blob, json.dumps(entry) + "\n"))
+        except queue.Full:
+            self.dropped += 1
+            return None
+        self._size += len(blob)
+        return dict(entry, file=str(data_path))
+
+    def _run(self):
+        files: Dict[pathlib.Path, IO] = {}
+        while True:
+            item = self._q.get()
+            try:
+                if item is _STOP:
+                    break
+                data_path, idx_path, blob, line = item
+                if data_path not in files:
+                    for f in files.values():
+                        f.close()  # the previous day's pair
+                    files.clear()
+                    self.dir.mkdir(parents=True, exist_ok=True)
+                    files[data_path] = open(data_path, "ab")
+                    files[idx_path] = open(idx_path, "a", encoding="utf-8")
+                files[data_path].write(blob)
+                files[data_path].flush()
+                # The index line goes out after its data, so every entry it lists is complete
+                files[idx_path].write(line)
+                files[idx_path].flush()
+                self.written += 1
+                self.bytes += len(blob)
+            except Exception:
+                self.errors += 1
+            finally:
+                self._q.task_done()
+        for f in files.values():
+            try:
+                f.close()
+            except Exception:
+                pass
+
+    def flush(self) -> None:
+        """Block until every queued window is on disk."""
+        self._q.join()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._q.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {"written": self.written, "dropped": self.dropped, "queued": self._q.qsize(),
+                "bytes": self.bytes, "errors": self.errors}
+
+
+class _Window:
+    __slots__ = ("start_ns", "end_ns", "trigger_ns", "reason", "triggers")
+
+    def __init__(self, start_ns: int, end_ns: int, trigger_ns: int, reason: str):
+        self.start_ns = start_ns
+        self.end_ns = end_ns
+        self.trigger_ns = trigger_ns
+        self.reason = reason
+        self.triggers = 1
+
+
+class CaptureWindows:
+    """Per-sensor open capture windows, cut from the sample ring once complete."""
+
+    def __init__(self, writer: CaptureWriter, pre_ns: int = 200_000_000, post_ns: int = 500_000_000,
+                 max_ns: int = 5_000_000_000):
+        self.writer = writer
+        self.pre_ns = int(pre_ns)
+        self.post_ns = int(post_ns)
+        self.max_ns = int(max_ns)
+        self._open: Dict[str, _Window] = {}
+        self._done_to: Dict[str, int] = {}  # sensor_id -> end of its last window
+
+    def trigger(self, sensor_id: str, t_ns: int, reason: str) -> None:
+        # Samples already in an earlier window are not captured twice
+        start = max(t_ns - self.pre_ns, self._done_to.get(sensor_id, t_ns - self.pre_ns))
+        w = self._open.get(sensor_id)
+        if w is None:
+            self._open[sensor_id] = _Window(start, t_ns + self.post_ns, t_ns, reason)
+            return
+        if t_ns < w.trigger_ns:
+            w.trigger_ns = t_ns
+            w.start_ns = min(w.start_ns, start)
+        w.end_ns = min(max(w.end_ns, t_ns + self.post_ns), w.start_ns + self.max_ns)
+        w.triggers += 1
+        if reason == "hit":
+            w.reason = reason  # a window with a detector hit in it is a hit capture
+
+    def poll(self, sensor_id: str, ring: SampleRing, force: bool = False) -> Optional[dict]:
+        """Cut and submit the sensor's window once the ring holds all of it (or now, if forced)."""
+        w = self._open.get(sensor_id)
+        if w is None or not len(ring):
+            return None
+        if not force and int(ring.latest(1)["ts_ns"][0]) < w.end_ns:
+            return None
+        del self._open[sensor_id]
+        self._done_to[sensor_id] = w.end_ns + 1
+        held = ring.view(ring.oldest)
+        ts = held["ts_ns"]
+        lo = int(np.searchsorted(ts, w.start_ns, "left"))
+        hi = int(np.searchsorted(ts, w.end_ns, "right"))
+        if lo >= hi:
+            return None
+        return self.writer.submit(sensor_id, w.trigger_ns, w.reason, w.triggers, held[lo:hi])
+
+    def pending(self) -> list:
+        return list(self._open)
@@ -0,0 +1,204 @@
+from __future__ import annotations
+from collections import deque
+from typing import Optional
+
+
+class SampleClock:
+    """Online model of a BT50's sample clock from notification arrival times.
+
+    Sample k is taken at offset + period * k on the host's monotonic clock;
+    its notification arrives some BLE connection-interval delay later, never
+    earlier. The period is the least-squares slope over the last `window`
+    arrivals (exact integer running sums, O(1) per update), trimmed: once
+    fitted, an arrival more than `trim` RMS residuals (and a quarter period)
+    above the line is kept out of the sums, so a late BLE retry or a badly
+    estimated gap (below) does not bend the slope. The offset is the lower envelope of
+    the arrivals: the smallest residual in the window, kept in a monotonic
+    deque (amortised O(1)). Arrival jitter therefore only ever pushes the
+    model later, by the minimum delay seen in the window.
+
+    The caller counts frames, so a notification lost over the air makes every
+    later count short. update() compares each arrival with the time the
+    model expects for its count: later than the delay spread allows by half
+    a period or more means samples were lost, and the index is advanced by
+    the whole periods missing; earlier than the model by half a period means
+    an earlier advance was too much and is taken back. update() returns the
+    corrected index of the sample, which is what time_of() takes. time_of()
+    never returns less than it did for a lower index since the last reset.
+
+    Until `min_fit` arrivals are held the nominal period is used. A gap
+    longer than `reset_gap_ns` (e.g. a reconnect) restarts the model, as do
+    `min_fit` trimmed arrivals in a row.
+    """
+
+    def __init__(self, period_ns: int = 10_000_000, window: int = 512, min_fit: int = 16,
+                 reset_gap_ns: int = 1_000_000_000, trim: float = 4.0):
+        if window < 2:
+            raise ValueError("window must be at least 2")
+        self.nominal_period_ns = int(period_ns)
+        self.window = int(window)
+        self.min_fit = max(2, int(min_fit))
+        self.reset_gap_ns = int(reset_gap_ns)
+        self.trim = float(trim)
+        self.resets = 0
+        self.skipped = 0      # samples added to the frame count for lost notifications
+        self.trimmed = 0
+        self.reset()
+
+    def reset(self) -> None:
+        self._pts = deque()     # (k, t, in_sums) relative to the bases, oldest first
+        self._env = deque()     # (k, residual) with increasing residuals: sliding minimum
+        self._k0 = 0
+        self._t0 = 0
+        self._n = self._sk = self._st = self._skk = self._skt = self._stt = 0
+        self.period_ns = float(self.nominal_period_ns)
+        self._ref_period = self.period_ns   # slope the envelope residuals are taken against
+        self._since_rebase = 0
+        self._last_t: Optional[int] = None
+        self._late_run = 0
+        self._hi_k: Optional[int] = None   # highest index time_of() answered, and its time
+        self._hi_t = 0
+
+    @property
+    def n(self) -> int:
+        return self._n
+
+    def update(self, k: int, arrival_ns: int) -> int:
+        """Add the arrival time of the notification that carried the k-th counted
+        sample; returns that sample's index with lost samples accounted for."""
+        if self._last_t is not None and arrival_ns - self._last_t > self.reset_gap_ns:
+            self.reset()
+            self.resets += 1
+        self._last_t = arrival_ns
+        k += self.skipped
+        if not self._n and not self._pts:
+            self._k0, self._t0 = k, arrival_ns
+        elif self._n >= self.min_fit:
+            k = self._check_gap(k, arrival_ns)
+        kk, t = k - self._k0, arrival_ns - self._t0
+        used = self._n < self.min_fit or self._fits(kk, t)
+        if not used:
+            self.trimmed += 1
+            self._late_run += 1
+            if self._late_run >= self.min_fit:
+                # The model no longer describes the arrivals; start over from here
+                self.reset()
+                self.resets += 1
+                self._k0, self._t0 = k, arrival_ns
+                kk, t, used = 0, 0, True
+        if used:
+            self._late_run = 0
+            self._add(kk, t, 1)
+        self._pts.append((kk, t, used))
+        if len(self._pts) > self.window:
+            ok, ot, oused = self._pts.popleft()
+            if oused:
+                self._add(ok, ot, -1)
+        if self._n >= self.min_fit:
+            den = self._n * self._skk - self._sk * self._sk
+            if den > 0:
+                self.period_ns = (self._n * self._skt - self._sk * self._st) / den
+        self._since_rebase += 1
+        if self._since_rebase >= self.window:
+            self._rebase()
+        else:
+            self._push_env(kk, t)
+        oldest = self._pts[0][0]
+        while self._env[0][0] < oldest:
+            self._env.popleft()
+        return k
+
+    def _add(self, kk: int, t: int, sign: int) -> None:
+        self._n += sign
+        self._sk += sign * kk
+        self._st += sign * t
+        self._skk += sign * kk * kk
+        self._skt += sign * kk * t
+        self._stt += sign * t * t
+
+    def _fits(self, kk: int, t: int) -> bool:
+        # Residual above the least-squares line against the trimmed RMS, plus a
+        # quarter period so a perfectly regular stream does not trim everything
+        n = self._n
+        line = (self._st + self.period_ns * (n * kk - self._sk)) / n
+        return t - line <= self.trim * self.jitter_ns() + self.period_ns / 4
+
+    def _check_gap(self, k: int, arrival_ns: int) -> int:
+        excess = arrival_ns - self._model(k)
+        period, jitter = self.period_ns, self.jitter_ns()
+        if excess >= 4.0 * jitter + period / 2:
+            # Later than any delay seen allows: whole periods of samples went missing
+            # (less the typical delay above the envelope, about twice the RMS)
+            lost = max(1, int(round((excess - 2.0 * jitter) / period)))
+        elif excess <= -period / 2:
+            # Earlier than the sample can have been taken: an earlier advance overshot
+            lost = max(-self.skipped, int(round(excess / period)))
+        else:
+            return k
+        self.skipped += lost
+        return k + lost
+
+    def _push_env(self, kk: int, t: int) -> None:
+        r = t - self._ref_period * kk
+        env = self._env
+        while env and env[-1][1] >= r:
+            env.pop()
+        env.append((kk, r))
+
+    def _rebase(self) -> None:
+        # Re-take the envelope against the current slope so residuals stay
+        # comparable as the period estimate moves; once per window.
+        self._ref_period = self.period_ns
+        self._since_rebase = 0
+        self._env.clear()
+        for kk, t, _ in self._pts:
+            self._push_env(kk, t)
+
+    def _model(self, k: int) -> float:
+        if not self._env:
+            raise ValueError("no arrivals yet")
+        kk = k - self._k0
+        k_min, r_min = self._env[0]
+        # The envelope point sits on the reference slope; extrapolate from it with the fitted one
+        return self._t0 + r_min + self._ref_period * k_min + self.period_ns * (kk - k_min)
+
+    def time_of(self, k: int) -> int:
+        """Reconstructed acquisition time (ns) of sample k (an index from update()).
+
+        Clamped so that a higher index never gets an earlier time than a
+        lower one did, when the model steps back (a new envelope minimum, a
+        period update or a corrected gap).
+        """
+        t = int(round(self._model(k)))
+        if self._hi_k is None or k > self._hi_k:
+            if self._hi_k is not None:
+                t = max(t, self._hi_t)
+            self._hi_k, self._hi_t = k, t
+        elif k == self._hi_k:
+            t = self._hi_t
+        else:
+            t = min(t, self._hi_t)
+        return t
+
+    def jitter_ns(self) -> float:
+        """RMS of the arrival times about the least-squares line (0 before a fit)."""
+        n = self._n
+        if n < self.min_fit:
+            return 0.0
+        den = n * self._skk - self._sk * self._sk
+        syy = n * self._stt - self._st * self._st
+        if den <= 0:
+            return 0.0
+        sxy = n * self._skt - self._sk * self._st
+        # Exact integer numerator; only the final ratio is rounded
+        return max(0.0, (syy * den - sxy * sxy) / (den * n * n)) ** 0.5
+
+    def stats(self) -> dict:
+        return {
+            "n": self._n,
+            "period_ms": round(self.period_ns / 1e6, 5),
+            "jitter_ms": round(self.jitter_ns() / 1e6, 3),
+            "resets": self.resets,
+            "skipped": self.skipped,
+            "trimmed": self.trimmed,
+        }
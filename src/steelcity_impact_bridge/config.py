@@ -50,6 +50,13 @@ class DetectorCfg:
     baseline_min: float = 1e-4
     # absolute minimum amplitude to consider (guards low-noise spikes)
     min_amp: float = 1.0
+    # How BT50 samples reach the detector: 'buffer' (default) feeds one averaged
+    # amplitude per ~100 ms window; 'stream' feeds every sample with its real
+    # inter-sample dt and emits HIT as soon as the ring closes.
+    mode: str = "buffer"
+    # Impacts on different plates closer than this are one hit: the strongest
+    # peak is the primary, the others are logged as sympathetic.
+    attribution_window_ms: float = 20.0
 
 @dataclass
 class LoggingCfg:
@@ -67,6 +74,46 @@ class LoggingCfg:
     dual_file: bool = True
     # Optional directory under `dir` for debug logs; if None, uses `dir/debug`.
     debug_subdir: Optional[str] = "debug"
+    # Background writer: write() only queues the record and a thread does the
+    # JSON encoding and batched file writes. When more than `queue_size`
+    # records are waiting, new ones are dropped and counted in the status record.
+    async_writer: bool = False
+    queue_size: int = 10000
+    # Append every raw BT50 frame with its sample time to a compact binary
+    # archive per sensor per day under `dir/raw` (see archive.py). Off by
+    # default: it is about 311 MB per sensor per day at 100 Hz.
+    raw_archive: bool = False
+    # When a peak or detector hit fires, write the sensor's samples from
+    # capture_pre_ms before to capture_post_ms after it to the day's capture
+    # file under `dir/sensorbuffer` (see capture.py). Quiet periods write nothing.
+    captures: bool = True
+    capture_pre_ms: float = 200.0
+    capture_post_ms: float = 500.0
+    # Log segments: besides midnight, start new NDJSON files once they reach
+    # rotate_mb (0 = no size limit) or are rotate_minutes old (0 = no age limit).
+    # Closed segments are gzipped in the background when `compress` is on.
+    # Both are off by default: with them the daily alias holds only the newest
+    # segment, and tools reading bridge_*.ndjson see part of the day.
+    # Nothing is deleted unless quota_mb gives a class of files (main, debug,
+    # sensorbuffer, raw) a size in MB; that class is then pruned, oldest first,
+    # and every deletion is logged as a retention_prune record.
+    rotate_mb: float = 0.0
+    rotate_minutes: float = 0.0
+    compress: bool = False
+    quota_mb: Optional[Dict[str, float]] = None
+    # Per-message rate limits, checked before a record is encoded, e.g.
+    #   rate_limits: {bt50_buffer_status: {rate: 10, burst: 50}}
+    # lets 50 through at once and then 10 per second. What is held back is
+    # counted and written every suppressed_interval_s as one log_suppressed record.
+    rate_limits: Optional[Dict[str, Dict[str, float]]] = None
+    suppressed_interval_s: float = 10.0
+    # Extra destinations every record is also sent to, each with its own
+    # bounded queue and drop policy (see sinks.py), e.g.
+    #   sinks: [{kind: sqlite, path: ./logs/bridge.db},
+    #           {kind: udp, address: "127.0.0.1:9750", policy: drop_oldest}]
+    # Kinds: sqlite (the ingest tools' events table), udp, unix (datagram
+    # socket path), memory.
+    sinks: Optional[List[Dict[str, Any]]] = None
     # Control whether writer includes certain timestamp fields. Default True
     # NOTE: `ts_ms` and `t_iso` are no longer emitted by the logger; keep
     # this dataclass minimal to avoid confusion.
@@ -108,6 +155,8 @@ def load_config(path: str) -> AppCfg:
         warmup_ms=_as_int(det_raw, "warmup_ms", DetectorCfg.warmup_ms),
         baseline_min=_as_float(det_raw, "baseline_min", DetectorCfg.baseline_min),
         min_amp=_as_float(det_raw, "min_amp", DetectorCfg.min_amp),
+        mode=str(det_raw.get("mode", DetectorCfg.mode) or DetectorCfg.mode).lower(),
+        attribution_window_ms=_as_float(det_raw, "attribution_window_ms", DetectorCfg.attribution_window_ms),
     )
     log = LoggingCfg(**raw.get("logging", {}))
     return AppCfg(amg=amg, sensors=sensors, detector=det, logging=log)
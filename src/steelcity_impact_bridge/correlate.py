@@ -0,0 +1,74 @@
+from __future__ import annotations
+import heapq, itertools
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class Detection:
+    ts_ns: int
+    sensor_id: str
+    amplitude: float
+    data: Any = None
+    # Filled in when the group is closed
+    role: str = "primary"  # 'primary' | 'sympathetic'
+    primary_sensor: Optional[str] = None
+    group_size: int = 1
+
+
+class ImpactCorrelator:
+    """Groups near-simultaneous detections from different sensors into one hit.
+
+    Detections are kept in a heap ordered by sample time, so add() and each
+    pop are O(log n) however many sensors are reporting. A group is the
+    oldest pending detection plus everything within `window_ns` after it; it
+    is closed once the watermark (the sample time every sensor has been
+    processed up to) has passed the end of the window. The strongest peak
+    in a group is the primary hit and the rest are marked sympathetic.
+    """
+
+    def __init__(self, window_ns: int = 20_000_000):
+        self.window_ns = int(window_ns)
+        self._heap: List[Any] = []  # (ts_ns, seq, Detection); seq keeps equal times FIFO
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def add(self, ts_ns: int, sensor_id: str, amplitude: float, data: Any = None) -> Detection:
+        det = Detection(int(ts_ns), sensor_id, float(amplitude), data)
+        heapq.heappush(self._heap, (det.ts_ns, next(self._seq), det))
+        return det
+
+    def flush(self, watermark_ns: Optional[int] = None) -> List[List[Detection]]:
+        """Close every group whose window ends at or before `watermark_ns`.
+
+        None closes everything pending (e.g. at shutdown). Groups come back in
+        time order, members in time order within each group.
+        """
+        heap = self._heap
+        groups = []
+        while heap and (watermark_ns is None or heap[0][0] + self.window_ns <= watermark_ns):
+            end = heap[0][0] + self.window_ns
+            group = []
+            while heap and heap[0][0] <= end:
+                group.append(heapq.heappop(heap)[2])
+            primary = max(group, key=lambda d: d.amplitude)
+            for d in group:
+                d.role = "primary" if d is primary else "sympathetic"
+                d.primary_sensor = primary.sensor_id
+                d.group_size = len(group)
+            groups.append(group)
+        return groups
+
+
+def watermark(marks: Dict[str, int], max_hold_ns: int) -> Optional[int]:
+    """Sample time all sensors have reported up to, or None before any report.
+
+    A sensor that stops reporting holds groups back for at most `max_hold_ns`
+    behind the most advanced sensor.
+    """
+    if not marks:
+        return None
+    vals = marks.values()
+    return max(min(vals), max(vals) - max_hold_ns)
@@ -1,6 +1,37 @@
 
 from __future__ import annotations
+import functools, math
+from collections import deque
 from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Samples per internal chunk of update_batch(): _BATCH_CHUNK (cache-sized) when
+# every sample is checked, _BATCH_MAX when armed and idle and only the samples
+# near trigger candidates are.
+_BATCH_CHUNK = 1 << 15
+_BATCH_MAX = 1 << 17
+# Closed-form baseline EMA: 0.99**(j+1) and 0.01/0.99**(j+1) for every
+# position in a segment of _EMA_SEG samples (0.99**-32768 is about 1e143, well
+# inside float64 range; the sums restart at each segment), evaluated in blocks
+# of _EMA_BLOCK samples (small, so a ring's surroundings cost little more than
+# the ring).
+_EMA_SEG = 1 << 15
+_EMA_BLOCK = 8
+_EMA_POW = np.power(0.99, np.arange(_EMA_SEG + 1))
+_EMA_DECAY = _EMA_POW[1:]
+_EMA_GAIN = 0.01 / _EMA_DECAY
+# 0.99**-k at the start k of each block: block b's gains are _EMA_GAIN[:_EMA_BLOCK]
+# times _EMA_BLOCK_GAIN[b] and its decays _EMA_DECAY[:_EMA_BLOCK] over it
+_EMA_BLOCK_GAIN = _EMA_POW[0] / _EMA_POW[:_EMA_SEG:_EMA_BLOCK]
+_EMA_COLS = np.arange(_EMA_BLOCK)
+# Running gained sums within a block, decayed, as one product:
+# (x @ _EMA_TRI)[:, j] = (x[:, :j + 1] * _EMA_GAIN[:j + 1]).sum(1) * _EMA_DECAY[j]
+_EMA_TRI = np.triu(np.ones((_EMA_BLOCK, _EMA_BLOCK))) * np.outer(_EMA_GAIN[:_EMA_BLOCK], _EMA_DECAY[:_EMA_BLOCK])
+# Sums of multiples of 1/_EXACT_DEN below _EXACT_MAX are exact in float64.
+_EXACT_DEN = 1 << 20
+_EXACT_MAX = float(1 << 32)
 
 @dataclass
 class DetectorParams:
@@ -71,3 +102,475 @@ class HitDetector:
                 self.since_last_hit_ms = 0.0
                 return hit
             return None
+
+    def update_batch(self, amps, dt_ms: float) -> List[Tuple[int, dict]]:
+        """Vectorized equivalent of calling update(a, dt_ms) for every a in amps.
+
+        Returns (index, hit) pairs, where index is the position in `amps` of the
+        sample that closed the ring and hit is the dict update() would return.
+        The detector state afterwards matches the scalar path, so batches and
+        scalar calls can be interleaved freely. The idle baseline is evaluated
+        in closed form and agrees with the scalar recursion to float rounding.
+        """
+        a = np.ascontiguousarray(amps, dtype=np.float64).ravel()
+        dt = float(dt_ms)
+        if dt < 0:
+            raise ValueError("dt_ms must be >= 0")
+        hits: List[Tuple[int, dict]] = []
+        # The state carries over exactly between chunks
+        off, lazy = 0, True
+        while off < a.size:
+            if lazy and self.armed and self.state == "idle":
+                out = self._update_chunk(a[off:off + _BATCH_MAX], dt, off, full=False)
+                if out is not None:
+                    hits.extend(out)
+                    off += _BATCH_MAX
+                    continue
+                # Candidates are dense here: stay with cache-sized chunks
+                lazy = False
+            hits.extend(self._update_chunk(a[off:off + _BATCH_CHUNK], dt, off))
+            off += _BATCH_CHUNK
+        return hits
+
+    def _update_chunk(self, a: np.ndarray, dt: float, off: int = 0,
+                      full: bool = True) -> Optional[List[Tuple[int, dict]]]:
+        """update_batch() over one chunk; hit indices are reported plus `off`.
+
+        With full=False, returns None (state untouched) instead of scanning
+        every sample when the samples near trigger candidates do not suffice.
+        """
+        n = int(a.size)
+        p = self.p
+
+        env = np.abs(a)
+        sq = np.multiply(a, a)
+        # Only samples with env >= min_amp can trigger. The held ones (env >
+        # 2 * min_amp) are among them when min_amp >= 0, except NaN samples:
+        # held but no candidates, they show up as a NaN baseline.
+        cand = np.flatnonzero(env >= p.min_amp)
+        base = None
+        if p.min_amp >= 0:
+            base = _Baseline(sq, cand[env[cand] > p.min_amp * 2.0], self.idle_rms)
+        if base is None or math.isnan(base.last):
+            base = _Baseline(sq, np.flatnonzero(~(env <= p.min_amp * 2.0)), self.idle_rms)
+        min_count = _min_ring_count(p.ring_min_ms, dt)
+        # Samples after a hit before the dead time has elapsed (since_last_hit restarts at 0.0)
+        k_dead = _dead_steps(dt, float(p.dead_time_ms), n)
+        k_first = _first_reach(self.since_last_hit_ms, dt, p.dead_time_ms, n)
+
+        # Once armed and idle, the baseline is needed just around the trigger
+        # candidates: up to `reach` samples on, where their rings normally
+        # release. A ring that runs longer widens `reach`; when that covers most
+        # of the chunk, or otherwise, all of it is scanned.
+        out = None
+        if self.armed and self.state == "idle":
+            reach = 0 if min_count is None else max(1, min_count - 1) + _EMA_BLOCK
+            while out is None:
+                blocks = base.blocks_around(cand, reach)
+                if blocks is None:
+                    break
+                out = self._scan(env, sq, base, cand, blocks, reach, dt, off, min_count, k_dead, k_first)
+                reach = 4 * reach + _EMA_BLOCK
+        if out is None:
+            if not full:
+                return None
+            out = self._scan(env, sq, base, cand, None, None, dt, off, min_count, k_dead, k_first)
+        hits, last_hit, armed_from, (state, peak, sum_sq, count) = out
+
+        self.elapsed_ms = _accumulate_last(self.elapsed_ms, dt, n)
+        if last_hit is None:
+            self.since_last_hit_ms = _accumulate_last(self.since_last_hit_ms, dt, n)
+        else:
+            self.since_last_hit_ms = _accumulate_last(0.0, dt, n - 1 - last_hit)
+        self.idle_rms = base.last
+        self.armed = self.armed or armed_from < n
+        self.state, self.peak, self.sum_sq, self.count = state, peak, sum_sq, count
+        return hits
+
+    def _scan(self, env: np.ndarray, sq: np.ndarray, base: "_Baseline", cand: np.ndarray,
+              blocks: Optional[np.ndarray], reach: Optional[int], dt: float, off: int,
+              min_count: Optional[int], k_dead: Optional[int], k_first: Optional[int]):
+        """Hits of one chunk with the baseline evaluated in `blocks` (None = all);
+        `cand` are the samples with env >= min_amp, all inside `blocks`.
+
+        Returns (hits, last hit index, armed_from, ring state), or None when a
+        ring started in `blocks` does not release within `reach` samples of its
+        trigger, so `reach` has to widen (or the whole chunk be scanned).
+        """
+        n = env.size
+        p = self.p
+        pow_ratio = base.rows(blocks)
+        armed_from = 0
+        if blocks is None and not self.armed:
+            ready = (_accumulate(self.elapsed_ms, dt, n) >= p.warmup_ms) & (pow_ratio.ravel()[:n] >= p.baseline_min)
+            armed_from = int(ready.argmax()) if ready.any() else n
+        pow_ratio += 1e-9
+        if blocks is None:
+            pos = None
+            np.divide(base.x.reshape(pow_ratio.shape), pow_ratio, out=pow_ratio)
+            at = cand
+        else:
+            # Sample index of each evaluated value; padding past n reads as zero
+            pos = blocks[:, None] * _EMA_BLOCK + _EMA_COLS
+            np.divide(base.x[pos], pow_ratio, out=pow_ratio)
+            at = blocks.searchsorted(cand // _EMA_BLOCK) * _EMA_BLOCK + cand % _EMA_BLOCK
+        trig_idx = cand[pow_ratio.ravel()[at] >= p.triggerHigh]
+        # Samples that do not release are few; every other evaluated one does
+        stay = np.flatnonzero(~(pow_ratio <= p.triggerLow))
+        if pos is not None:
+            stay = pos.ravel()[stay]
+
+        if armed_from:
+            trig_idx = trig_idx[trig_idx >= armed_from]
+
+        hits: List[Tuple[int, dict]] = []
+        state, peak, sum_sq, count = self.state, self.peak, self.sum_sq, self.count
+        last_hit: Optional[int] = None
+        i = 0
+        if state == "ring":
+            # Ring carried over from the previous call (full scan only); count at sample j is count + j + 1
+            j = None
+            if min_count is not None:
+                j = int(_next_release(stay, np.array([max(0, min_count - count - 1)]))[0])
+                j = j if j < n else None
+            end = n if j is None else j + 1
+            peak, sum_sq = _ring_stats(env, sq, 0, end, peak, sum_sq)
+            count += end
+            if j is not None:
+                rms = (sum_sq / max(1, count)) ** 0.5
+                hits.append((off + j, {"peak": float(peak), "rms": float(rms), "dur_ms": float(count * dt)}))
+                state = "idle"
+                last_hit = j
+            i = end
+
+        if state == "idle" and trig_idx.size:
+            # Release sample for a ring started at each trigger candidate s: first
+            # release at or after s + max(1, min_count - 1), or -1 if none in the chunk
+            m = trig_idx.size
+            if min_count is None:
+                rel_for = np.full(m, -1)
+            else:
+                rel_for = _next_release(stay, trig_idx + max(1, min_count - 1))
+                rel_for[rel_for >= n] = -1
+            # Candidate after a ring that closes at j: the first trigger at or
+            # after j + k_dead (and past j), so the rings form a chain of indices
+            if k_dead is None:
+                nxt = np.full(m, m)
+            else:
+                nxt = trig_idx.searchsorted(np.where(rel_for >= 0, rel_for + max(1, k_dead), n))
+            if last_hit is None:
+                allowed = n if k_first is None else k_first - 1
+            else:
+                allowed = n if k_dead is None else last_hit + k_dead
+            chain = _chain(nxt, int(trig_idx.searchsorted(max(i, allowed))), m)
+            if chain.size:
+                if rel_for[chain[-1]] < 0:
+                    # Ring still open at the end of the chunk
+                    s = int(trig_idx[chain[-1]])
+                    if pos is not None and min_count is not None and s + reach < n - 1:
+                        return None
+                    state = "ring"
+                    count = n - s
+                    peak, sum_sq = _ring_stats(env, sq, s + 1, n, float(env[s]), float(sq[s]))
+                    chain = chain[:-1]
+                starts = trig_idx[chain]
+                ends = rel_for[chain]
+                if pos is not None and ends.size and int((ends - starts).max()) > reach:
+                    return None
+                if ends.size:
+                    closed, last_ring = _closed_rings(env, sq, starts, ends, dt, off)
+                    hits.extend(closed)
+                    last_hit = int(ends[-1])
+                    if state == "idle":
+                        peak, sum_sq, count = last_ring
+        return hits, last_hit, armed_from, (state, peak, sum_sq, count)
+
+
+class _Baseline:
+    """HitDetector's gated baseline EMA over one chunk, in closed form.
+
+    y = 0.99*y + 0.01*x where gate, else hold. Within a segment of _EMA_SEG
+    samples starting from y0, with G_j gated samples up to j,
+    y_j = 0.99**G_j * (y0 + sum over gated i <= j of 0.01*x_i / 0.99**G_i).
+    G_j is j + 1 less the held samples so far, which enter as a factor
+    f = 0.99**held, constant between held samples; a held sample adds
+    nothing and so repeats the value before it. The terms are summed per
+    block of _EMA_BLOCK samples up front, so rows() only forms running sums
+    over the blocks asked for. x is the squared amplitude, `held` the sorted
+    indices of the samples outside the gate.
+    """
+
+    def __init__(self, x: np.ndarray, held: np.ndarray, y0: float):
+        n = x.size
+        nb = max(1, -(-n // _EMA_BLOCK))
+        size = nb * _EMA_BLOCK
+        self.n = n
+        self.x = self.pad(x)
+        segs = range(0, size, _EMA_SEG)
+        g = self.x
+        self.f: Optional[np.ndarray] = None
+        if held.size:
+            # f steps down at each held sample and goes back to 1 at each segment start
+            bounds = np.arange(_EMA_SEG, size, _EMA_SEG)
+            if bounds.size:
+                first = held.searchsorted(bounds)
+                rank = np.arange(1, held.size + 1)
+                rank -= np.repeat(np.concatenate(([0], first)), np.diff(np.concatenate(([0], first, [held.size]))))
+                steps = np.concatenate(([0], np.insert(held, first, bounds), [size]))
+                powers = _EMA_POW[np.concatenate(([0], np.insert(rank, first, 0)))]
+            else:
+                steps = np.concatenate(([0], held, [size]))
+                powers = _EMA_POW[:held.size + 1]
+            self.f = np.repeat(powers, np.diff(steps))
+            g = g * self.f
+            g[held] = 0.0
+            self.f = self.f.reshape(nb, _EMA_BLOCK)
+        # Terms without their gain, which rows() applies to the blocks it evaluates
+        self.g = (g if self.f is not None else g.copy()).reshape(nb, _EMA_BLOCK)
+        sums = self.g @ _EMA_GAIN[:_EMA_BLOCK]
+        scale = np.empty(nb)
+        for lo in segs:
+            b0, b1 = lo // _EMA_BLOCK, min(nb, (lo + _EMA_SEG) // _EMA_BLOCK)
+            scale[b0:b1] = _EMA_BLOCK_GAIN[:b1 - b0]
+        sums *= scale
+        # Sum in front of each block (the segment's y0 included)
+        start = np.empty(nb)
+        y = float(y0)
+        for lo in segs:
+            b0, b1 = lo // _EMA_BLOCK, min(nb, (lo + _EMA_SEG) // _EMA_BLOCK)
+            start[b0] = y
+            np.cumsum(sums[b0:b1 - 1], out=start[b0 + 1:b1])
+            start[b0 + 1:b1] += y
+            # Baseline at the segment's last sample, or at n - 1 in the last one
+            j = min(n, lo + _EMA_SEG) - 1
+            y = float(start[b1 - 1] + sums[b1 - 1]) * float(_EMA_DECAY[j - lo])
+            if self.f is not None:
+                y /= float(self.f.flat[j])
+        self.last = y if n else float(y0)
+        # Up to the first gated sample y0 is held as is, which the closed form
+        # only gets to within rounding
+        gated = np.flatnonzero(held != np.arange(held.size))
+        self.y0, self.hold = float(y0), int(gated[0]) if gated.size else held.size
+        if self.hold >= n:
+            self.last = self.y0
+        # Fold it into each block's first term, in units of the block's own gain
+        scale *= _EMA_GAIN[0]
+        start /= scale
+        self.g[:, 0] += start
+
+    def pad(self, v: np.ndarray) -> np.ndarray:
+        size = self.n + (-self.n) % _EMA_BLOCK
+        if size == v.size and size:
+            return v
+        out = np.zeros(max(size, _EMA_BLOCK))
+        out[:v.size] = v
+        return out
+
+    def blocks_around(self, idx: np.ndarray, reach: int) -> Optional[np.ndarray]:
+        """Blocks covering samples idx[k]..idx[k] + reach, or None if that is most of them."""
+        nb = self.g.shape[0]
+        lo = idx // _EMA_BLOCK
+        # Cheap test first: each idx[k] covers at least its block and the span
+        # blocks after it, so gaps narrower than that add up to a lower bound
+        span = reach // _EMA_BLOCK + 1
+        if lo.size and 2 * (int(np.minimum(np.diff(lo), span).sum()) + span) > nb:
+            return None
+        hi = np.minimum((idx + reach) // _EMA_BLOCK, nb - 1)
+        covered = np.zeros(nb, dtype=bool)
+        for k in range(reach // _EMA_BLOCK + 2):
+            covered[np.minimum(lo + k, hi)] = True
+        blocks = np.flatnonzero(covered)
+        return None if 2 * blocks.size > nb else blocks
+
+    def rows(self, blocks: Optional[np.ndarray]) -> np.ndarray:
+        """Baseline at every sample of `blocks` (None = all), one row per block."""
+        if blocks is None:
+            y = self.g @ _EMA_TRI
+            if self.f is not None:
+                y /= self.f
+            y.ravel()[:self.hold] = self.y0
+            return y
+        y = self.g[blocks] @ _EMA_TRI
+        if self.f is not None:
+            y /= self.f[blocks]
+        if self.hold:
+            y[blocks[:, None] * _EMA_BLOCK + _EMA_COLS < self.hold] = self.y0
+        return y
+
+
+def _gated_ema(x: np.ndarray, gate: np.ndarray, y0: float) -> np.ndarray:
+    """Baseline track of HitDetector after every sample: y = 0.99*y + 0.01*x
+    where gate, else hold (see _Baseline). x is the squared amplitude."""
+    if not x.size:
+        return np.empty(0)
+    return _Baseline(x, np.flatnonzero(~gate), y0).rows(None).ravel()[:x.size]
+
+
+class PeakTracker:
+    """Single-pass local-maximum finder for a per-sensor amplitude stream.
+
+    A sample is a peak when it exceeds `threshold` and no sample within
+    `radius` frames on either side is larger. Each peak is reported exactly
+    once, as soon as its `radius` look-ahead frames have arrived, so peaks
+    near window boundaries are neither lost nor counted twice.
+    """
+    def __init__(self, threshold: float = 0.5, radius: int = 3):
+        self.threshold = threshold
+        self.radius = radius
+        self.frame_idx = 0  # running sample index for this sensor
+        self.judged_ns: Optional[int] = None  # sample time every peak up to is reported by
+        self._win = deque(maxlen=2 * radius + 1)  # (frame_idx, ts_ns, amp)
+
+    def update(self, ts_ns: int, amp: float) -> Optional[dict]:
+        win = self._win
+        win.append((self.frame_idx, ts_ns, amp))
+        self.frame_idx += 1
+        if len(win) <= self.radius:
+            return None
+        # Candidate is `radius` frames behind the newest sample
+        c = len(win) - 1 - self.radius
+        idx, ts, a = win[c]
+        self.judged_ns = ts
+        if a <= self.threshold:
+            return None
+        for k, (_, _, other) in enumerate(win):
+            if other > a and k != c:
+                return None
+        return {'frame_idx': idx, 'timestamp': ts, 'amplitude': a}
+
+
+def _ring_stats(env: np.ndarray, sq: np.ndarray, lo: int, hi: int, peak: float, sum_sq: float):
+    """Extend a ring's running peak / sum of squares over samples [lo, hi).
+
+    Like max(peak, env) in update(), the peak passes over NaN samples (fmax).
+    """
+    if hi > lo:
+        peak = max(peak, float(np.fmax.reduce(env[lo:hi])))
+    if hi - lo <= 64:
+        for v in sq[lo:hi].tolist():
+            sum_sq += v
+        return peak, sum_sq
+    return peak, float(np.cumsum(np.concatenate(([sum_sq], sq[lo:hi])))[-1])
+
+
+def _closed_rings(env: np.ndarray, sq: np.ndarray, starts: np.ndarray, ends: np.ndarray, dt: float,
+                  off: int = 0):
+    """(off + end, hit) pairs for rings spanning [start, end] inclusive, summed in scalar
+    order, plus the (peak, sum_sq, count) of the last ring."""
+    s = starts
+    lens = ends - s + 1
+    width = int(lens.max())
+    # A single column would be summed pairwise, not in turn as below
+    if width > 256 or lens.size == 1:
+        out = []
+        for lo, hi in zip(starts.tolist(), ends.tolist()):
+            peak, sum_sq = _ring_stats(env, sq, lo + 1, hi + 1, float(env[lo]), float(sq[lo]))
+            c = hi - lo + 1
+            out.append((off + hi, {"peak": float(peak), "rms": float((sum_sq / c) ** 0.5), "dur_ms": float(c * dt)}))
+        return out, (peak, sum_sq, c)
+    # One column per ring, zero-padded. Summing over axis 0 adds whole rows in
+    # turn, so each column sum follows the scalar `sum_sq += env*env` sequence
+    # exactly (adding 0.0 is exact).
+    cols = np.arange(width)[:, None]
+    inside = cols < lens
+    idx = np.minimum(s + cols, env.size - 1)
+    sums = np.where(inside, sq[idx], 0.0).sum(axis=0)
+    peaks = np.fmax.reduce(np.where(inside, env[idx], 0.0), axis=0)
+    # c * dt is the same product in numpy as in Python
+    out = [(at, {"peak": peak, "rms": (sum_sq / c) ** 0.5, "dur_ms": dur})
+           for at, c, peak, sum_sq, dur in zip((ends + off).tolist(), lens.tolist(), peaks.tolist(),
+                                               sums.tolist(), (lens * dt).tolist())]
+    return out, (float(peaks[-1]), float(sums[-1]), int(lens[-1]))
+
+
+def _chain(nxt: np.ndarray, p0: int, m: int) -> np.ndarray:
+    """p0, nxt[p0], nxt[nxt[p0]], ... while below m; nxt is non-decreasing with nxt[p] > p.
+
+    Every member after p0 is a value of nxt[p0:], and on most traces the
+    distinct values are exactly the chain, which one comparison confirms;
+    otherwise the chain is walked.
+    """
+    if p0 >= m:
+        return np.zeros(0, dtype=np.intp)
+    tail = nxt[p0:]
+    heads = np.concatenate(([p0], tail[:1], tail[1:][tail[1:] != tail[:-1]]))
+    heads = heads[heads < m]
+    if np.array_equal(nxt[heads[:-1]], heads[1:]):
+        return heads
+    out = []
+    nx = nxt.tolist()
+    while p0 < m:
+        out.append(p0)
+        p0 = nx[p0]
+    return np.array(out, dtype=np.intp)
+
+
+def _accumulate(start: float, dt: float, count: int) -> np.ndarray:
+    """Successive values of `start += dt`, with the same rounding as a Python loop."""
+    steps = np.full(count, dt, dtype=np.float64)
+    steps[0] = start + dt
+    return np.cumsum(steps)
+
+
+def _accumulate_last(start: float, dt: float, count: int) -> float:
+    """Final value of `start += dt` repeated count times, with loop rounding.
+
+    When start and dt are short dyadic fractions (10.0, 7.5, ...) every partial
+    sum is exactly representable, so the product form gives the same result
+    without materialising the sequence.
+    """
+    if count <= 0:
+        return float(start)
+    s_num, s_den = float(start).as_integer_ratio()
+    d_num, d_den = float(dt).as_integer_ratio()
+    if s_den <= _EXACT_DEN and d_den <= _EXACT_DEN and abs(start) + count * abs(dt) < _EXACT_MAX:
+        return float(start) + count * float(dt)
+    return float(_accumulate(start, dt, count)[-1])
+
+
+def _next_release(stay: np.ndarray, q: np.ndarray) -> np.ndarray:
+    """First index at or after each q[k] that is not in the sorted array `stay`."""
+    if not stay.size:
+        return q.copy()
+    # Last member of the run of consecutive members that each member is in
+    ends = np.append(np.flatnonzero(np.diff(stay) != 1), stay.size - 1)
+    k = np.minimum(stay.searchsorted(q), stay.size - 1)
+    return np.where(stay[k] == q, stay[ends[ends.searchsorted(k)]] + 1, q)
+
+
+def _first_reach(start: float, dt: float, limit: float, max_steps: int) -> Optional[int]:
+    """Smallest k in [1, max_steps] such that k additions of dt to start reach limit."""
+    if max_steps <= 0:
+        return None
+    if start + dt >= limit:
+        return 1
+    if dt <= 0:
+        return None
+    est = max(1, math.ceil((limit - start) / dt) + 2)
+    while True:
+        est = min(est, max_steps)
+        seq = _accumulate(start, dt, est)
+        k = int(np.argmax(seq >= limit))
+        if seq[k] >= limit:
+            return k + 1
+        if est >= max_steps:
+            return None
+        est *= 2
+
+
+@functools.lru_cache(maxsize=16)
+def _dead_steps(dt: float, dead_time_ms: float, max_steps: int) -> Optional[int]:
+    """_first_reach(0.0, dt, dead_time_ms, max_steps); the same for every chunk of a stream."""
+    return _first_reach(0.0, dt, dead_time_ms, max_steps)
+
+
+def _min_ring_count(ring_min_ms: float, dt: float) -> Optional[int]:
+    """Smallest ring sample count c >= 1 with c * dt >= ring_min_ms, or None if unreachable."""
+    if 1 * dt >= ring_min_ms:
+        return 1
+    if dt <= 0:
+        return None
+    c = max(1, math.ceil(ring_min_ms / dt) - 1)
+    while c * dt < ring_min_ms:
+        c += 1
+    return c
@@ -0,0 +1,89 @@
+from __future__ import annotations
+import threading
+from typing import Dict, Iterable
+
+import numpy as np
+
+
+class LogLinearHistogram:
+    """Fixed-memory latency histogram with HDR-style log-linear buckets.
+
+    Values are whole microseconds. Each power-of-two range is split into
+    2**sub_bits linear buckets, so any recorded value is reported to within
+    1/2**sub_bits of itself (about 6% at the default 4 bits) from
+    microseconds up to `range_us`; larger values land in the top bucket. The
+    exact maximum is tracked separately.
+    """
+
+    def __init__(self, sub_bits: int = 4, range_us: int = 1 << 32):
+        self.sub_bits = int(sub_bits)
+        self._sub = 1 << self.sub_bits
+        self._top = self._index(int(range_us))
+        self.counts = np.zeros(self._top + 1, dtype=np.int64)
+        self.n = 0
+        self.max_us = 0
+
+    def _index(self, v: int) -> int:
+        shift = v.bit_length() - self.sub_bits - 1
+        if shift <= 0:
+            return v
+        return (shift << self.sub_bits) + (v >> shift)
+
+    def _upper(self, idx: np.ndarray) -> np.ndarray:
+        # Largest value that maps to each bucket
+        shift = np.maximum(idx // self._sub - 1, 0)
+        mant = idx - shift * self._sub
+        return ((mant + 1) << shift) - 1
+
+    def record(self, us: int) -> None:
+        if us < 0:
+            us = 0
+        idx = self._index(us)
+        self.counts[idx if idx < self._top else self._top] += 1
+        self.n += 1
+        if us > self.max_us:
+            self.max_us = us
+
+    def percentiles(self, qs: Iterable[float]) -> list:
+        """Bucket upper bounds (us) at the given percentiles, capped at the max."""
+        if not self.n:
+            return [0 for _ in qs]
+        cum = np.cumsum(self.counts)
+        ranks = np.ceil(np.asarray(list(qs), dtype=np.float64) / 100.0 * self.n).clip(1, self.n)
+        idx = np.searchsorted(cum, ranks)
+        # The top bucket also holds everything beyond range_us
+        upper = np.where(idx < self._top, self._upper(idx), self.max_us)
+        return [int(v) for v in np.minimum(upper, self.max_us)]
+
+    def reset(self) -> None:
+        self.counts[:] = 0
+        self.n = 0
+        self.max_us = 0
+
+
+class StageLatency:
+    """One LogLinearHistogram per pipeline stage, summarised and cleared together.
+
+    record() may be called from another thread (the log writer) than snapshot().
+    """
+
+    def __init__(self, stages: Iterable[str]):
+        self.hists: Dict[str, LogLinearHistogram] = {s: LogLinearHistogram() for s in stages}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, dt_ns: int) -> None:
+        with self._lock:
+            self.hists[stage].record(dt_ns // 1000)
+
+    def snapshot(self) -> dict:
+        """{stage: {n, p50, p90, p99, max}} in ms for stages with samples; clears them."""
+        out = {}
+        with self._lock:
+            for stage, h in self.hists.items():
+                if not h.n:
+                    continue
+                p50, p90, p99 = h.percentiles((50, 90, 99))
+                out[stage] = {"n": h.n, "p50": p50 / 1e3, "p90": p90 / 1e3, "p99": p99 / 1e3,
+                              "max": h.max_us / 1e3}
+                h.reset()
+        return out
@@ -1,10 +1,180 @@
 
 from __future__ import annotations
-import os, json, time, pathlib, uuid
-from typing import Optional, IO
+import os, json, time, pathlib, queue, threading, uuid
+from typing import Callable, Dict, Optional, IO, Sequence
+from .amg import parse_frame_hex
+
+_STOP = object()  # writer-thread shutdown sentinel
+# Fields the logger stamps on every record
+_STAMP_KEYS = frozenset(("hms", "seq", "schema", "session_id", "pid"))
+
+
+try:  # optional, much faster generic encoder
+    import orjson
+except ImportError:  # pragma: no cover - depends on the install
+    orjson = None
+
+
+def _make_encoder():
+    """json.dumps with its default settings, minus building a C encoder on every call."""
+    enc = json.JSONEncoder()
+    c_make = getattr(json.encoder, "c_make_encoder", None)
+    if c_make is None:
+        return enc.encode
+    # Same arguments JSONEncoder.iterencode passes, without the circular-reference
+    # markers (records are plain trees)
+    it = c_make(None, enc.default, json.encoder.encode_basestring_ascii, None,
+                enc.key_separator, enc.item_separator, False, False, True)
+    join = "".join
+    return lambda o: join(it(o, 0))
+
+
+_encode = _make_encoder()
+
+# Template field kinds: (check, expr, conversion) for a value {v}. In the
+# check, {b} is where the value is first read (and bound to {v}). A trailing
+# "?" also allows None. "any" goes through the generic encoder unchecked.
+_KINDS = {
+    "str": ("type({b}) is str", "_esc({v})", ""),
+    "int": ("type({b}) is int", "{v}", ""),
+    # finite only: nan/inf are not JSON
+    "float": ("type({b}) is float and {v} - {v} == 0.0", "{v}", "!r"),
+    "num": ("(type({b}) is int or type({v}) is float and {v} - {v} == 0.0)", "{v}", "!r"),
+    "bool": ("type({b}) is bool", '"true" if {v} else "false"', ""),
+}
+
+
+def _compile_template(name: str, spec: dict, item_sep: str, key_sep: str):
+    """Build a serialiser for records shaped exactly like `spec` (same keys, same order).
+
+    `spec` maps each key to a kind from _KINDS (or "any") or to a nested spec
+    dict. The returned function gives the record's JSON text, or None when
+    the record does not match (the caller then uses the generic encoder).
+    """
+    checks, parts, n = [], [], [0]
+
+    def walk(node: dict, var: str):
+        checks.append(f"type({var}) is dict and tuple({var}) == {tuple(node)!r}")
+        parts.append("{{")
+        for i, (key, kind) in enumerate(node.items()):
+            if not (isinstance(key, str) and key.isidentifier()):
+                raise ValueError(f"template {name!r}: unsupported key {key!r}")
+            v = f"v{n[0]}"
+            n[0] += 1
+            b = f"({v} := {var}[{key!r}])"
+            parts.append((item_sep if i else "") + f'"{key}"{key_sep}')
+            if isinstance(kind, dict):
+                checks.append(f"{b} is not None")
+                walk(kind, v)
+            elif kind == "any":
+                checks.append(f"{b} is {v}")
+                parts.append(f"{{_enc({v})}}")
+            else:
+                check, expr, conv = _KINDS[kind.rstrip("?")]
+                expr = expr.format(v=v)
+                if kind.endswith("?"):
+                    checks.append(f"({b} is None or {check.format(b=v, v=v)})")
+                    expr = f"repr({expr})" if conv else expr
+                    parts.append(f'{{"null" if {v} is None else {expr}}}')
+                else:
+                    checks.append(check.format(b=b, v=v))
+                    parts.append(f"{{{expr}{conv}}}")
+        parts.append("}}")
+
+    walk(spec, "o")
+    src = (f"def _tpl(o):\n"
+           f"    if {' and '.join(checks)}:\n"
+           f"        return f'{''.join(parts)}'\n"
+           f"    return None\n")
+    env = {"_esc": json.encoder.encode_basestring_ascii, "_enc": _encode}
+    exec(compile(src, f"<log template {name}>", "exec"), env)
+    return env["_tpl"]
+
+
+class RecordEncoder:
+    """Encodes log records to NDJSON lines.
+
+    The generic path is orjson when it is installed (compact separators,
+    UTF-8) and the standard library otherwise. Message types that are
+    written at a high rate can register() a template: a serialiser compiled
+    for their fixed key layout that renders straight into one f-string. A
+    record is matched to a template by its `msg`, else its `event_type`, and
+    only uses it when every key and value type matches, and renders exactly
+    what the stdlib encoder would. Templates are skipped on the orjson
+    backend: its generic path is faster than any Python-level template.
+    """
+
+    def __init__(self, use_orjson: Optional[bool] = None):
+        self.backend = "orjson" if (orjson is not None and use_orjson is not False) else "json"
+        if self.backend == "orjson":
+            self.item_sep, self.key_sep = ",", ":"
+        else:
+            self.item_sep, self.key_sep = ", ", ": "
+        self._templates: Dict[str, Callable[[dict], Optional[str]]] = {}
+        self.templated = 0
+
+    def register(self, name: str, spec: dict) -> None:
+        """Serialise records whose msg (or event_type) is `name` with a template of `spec`."""
+        self._templates[name] = _compile_template(name, spec, self.item_sep, self.key_sep)
+
+    def _generic(self, obj: dict) -> bytes:
+        if orjson is not None and self.backend == "orjson":
+            try:
+                return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+            except TypeError:
+                pass  # e.g. an int too large for orjson; the stdlib takes anything JSON can
+        return _encode(obj).encode()
+
+    def line(self, obj: dict, tail: Optional[str] = None) -> bytes:
+        """One NDJSON line: obj encoded, with the pre-rendered stamp fields `tail` spliced in."""
+        tpl = self._templates
+        if tpl and self.backend == "json":
+            fn = tpl.get(obj.get("msg")) or tpl.get(obj.get("event_type"))
+            s = fn(obj) if fn is not None else None
+            if s is not None:
+                self.templated += 1
+                if tail is None:
+                    return (s + "\n").encode()
+                return (s[:-1] + self.item_sep + tail if len(s) > 2 else "{" + tail).encode()
+        b = self._generic(obj)
+        if tail is None:
+            return b + b"\n"
+        if len(b) > 2:
+            return b[:-1] + (self.item_sep + tail).encode()
+        return ("{" + tail).encode()
+
+
+class TokenBucket:
+    """Admits `rate` records per second on average, in bursts of up to `burst`."""
+
+    __slots__ = ("rate", "burst", "tokens", "last", "suppressed")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.tokens = self.burst
+        self.last = time.monotonic()
+        self.suppressed = 0
+
+    def take(self, now: float) -> bool:
+        tokens = self.tokens + (now - self.last) * self.rate
+        self.last = now
+        if tokens >= 1.0:
+            self.tokens = min(tokens, self.burst) - 1.0
+            return True
+        self.tokens = tokens
+        self.suppressed += 1
+        return False
+
 
 class NdjsonLogger:
-    def __init__(self, directory: str, file_prefix: str, *, dual_file: bool = False, debug_subdir: Optional[str] = None):
+    def __init__(self, directory: str, file_prefix: str, *, dual_file: bool = False, debug_subdir: Optional[str] = None,
+                 async_writer: bool = False, queue_size: int = 10000, flush_bytes: int = 64 * 1024,
+                 flush_interval_s: float = 0.2, encoder: Optional[RecordEncoder] = None,
+                 max_bytes: int = 0, max_age_s: float = 0.0,
+                 on_segment_closed: Optional[Callable[[str], None]] = None,
+                 rate_limits: Optional[Dict[str, dict]] = None, suppressed_interval_s: float = 10.0,
+                 sinks: Optional[Sequence] = None):
         self.dir = pathlib.Path(directory)
         self.dir.mkdir(parents=True, exist_ok=True)
         self.prefix = file_prefix
@@ -13,11 +183,41 @@ class NdjsonLogger:
         self.debug_subdir = debug_subdir or "debug"
         self._debug_dir: Optional[pathlib.Path] = None
         self.seq = 0
-        self._fh: Optional[IO[str]] = None
+        # Unbuffered binary appends: every write() is one complete line on disk
+        self._fh: Optional[IO[bytes]] = None
         self._rot_day: Optional[str] = None
+        self._rot_deadline = 0.0  # epoch seconds of the next local midnight
+        self._hms_sec = -1
+        self._hms_prefix = ""
+        # JSON encoding; hot message types register templates on it
+        self.encoder = encoder or RecordEncoder()
+        self._ident_for: Optional[str] = None
+        self._ident = ""
         self._path: Optional[pathlib.Path] = None
-        self._debug_fh: Optional[IO[str]] = None
+        self._debug_fh: Optional[IO[bytes]] = None
         self._debug_path: Optional[pathlib.Path] = None
+        # Segments: besides midnight, start new files once the current ones
+        # hold `max_bytes` (0 = no limit) or are `max_age_s` old (0 = no limit).
+        # Each file closed by a rotation is passed to `on_segment_closed`.
+        self.max_bytes = int(max_bytes)
+        self.max_age_s = float(max_age_s)
+        self.on_segment_closed = on_segment_closed
+        self._seg_limit = self.max_bytes if self.max_bytes > 0 else float("inf")
+        self._seg_bytes = 0
+        self.bytes = 0  # written to the files (each line counted once)
+        # Per-msg token buckets ({msg: {"rate": per_s, "burst": n}}), checked
+        # before anything else in write(); what they hold back is counted and
+        # reported every `suppressed_interval_s` as one log_suppressed record.
+        self._buckets: Dict[str, TokenBucket] = {
+            msg: TokenBucket(lim.get("rate", 1.0), lim.get("burst", lim.get("rate", 1.0)))
+            for msg, lim in (rate_limits or {}).items()}
+        self.suppressed_interval_s = float(suppressed_interval_s)
+        # Extra destinations (sinks.Sink): each written record is also offered
+        # to them, after the files' filtering and numbering (see sinks.py)
+        self.sinks = list(sinks or ())
+        self._debug_sinks = any(s.debug for s in self.sinks)
+        self._suppressed_due = time.monotonic() + self.suppressed_interval_s
+        self._suppressed_since = time.monotonic()
         # Logging mode: 'regular' or 'verbose'. In regular mode, debug-level
         # events can be filtered unless explicitly whitelisted. This can be
         # configured via environment vars or by passing attributes after
@@ -43,9 +243,29 @@ class NdjsonLogger:
         # `t_iso`). Only the human-friendly `hms` field is written for each
         # record. Configuration flags to include/exclude those fields were
         # removed to keep logs compact and consistent across all record types.
-    self.rotate()
+        self.rotate()
+        # Async mode: write() stamps and enqueues the record; a writer thread
+        # serialises it and writes in batches once `flush_bytes` are pending or
+        # `flush_interval_s` has passed, so file I/O never runs on the caller
+        # (BLE callbacks on the event loop). One queue and one thread keep the
+        # file order the seq order. A full queue drops the record (seq shows
+        # the gap) and counts it in `dropped`. Records must not be mutated
+        # after write() while the writer is running.
+        self.flush_bytes = int(flush_bytes)
+        self.flush_interval_s = float(flush_interval_s)
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self._queue: Optional[queue.Queue] = None
+        self._writer: Optional[threading.Thread] = None
+        if async_writer:
+            self._queue = queue.Queue(maxsize=max(1, int(queue_size)))
+            self._writer = threading.Thread(target=self._writer_loop, name="ndjson-writer", daemon=True)
+            self._writer.start()
 
     def rotate(self):
+        closed = [p for p in (self._path if self._fh else None,
+                              self._debug_path if self._debug_fh else None) if p is not None]
         # Close previous handle
         if self._fh:
             try:
@@ -65,8 +285,14 @@ class NdjsonLogger:
         now = time.time()
         stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(now))
         day = stamp[:8]
+        if closed and stamp in closed[0].name:
+            # Size rotation within the same second: number the new segment
+            n = 1
+            while (self.dir / f"{self.prefix}_{stamp}_{n}.ndjson").exists():
+                n += 1
+            stamp = f"{stamp}_{n}"
         path = self.dir / f"{self.prefix}_{stamp}.ndjson"
-        self._fh = open(path, "a", buffering=1, encoding="utf-8")
+        self._fh = open(path, "ab", buffering=0)
         self._path = path
         # Prepare debug path/handle when dual_file enabled
         if self.dual_file:
@@ -78,14 +304,19 @@ class NdjsonLogger:
                 self._debug_dir = self.dir
             dpath = self._debug_dir / f"{self.prefix}_debug_{stamp}.ndjson"
             try:
-                self._debug_fh = open(dpath, "a", buffering=1, encoding="utf-8")
+                self._debug_fh = open(dpath, "ab", buffering=0)
                 self._debug_path = dpath
             except Exception:
                 self._debug_fh = None
         self._rot_day = day
+        lt = time.localtime(now)
+        self._rot_deadline = time.mktime((lt.tm_year, lt.tm_mon, lt.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+        if self.max_age_s > 0:
+            self._rot_deadline = min(self._rot_deadline, now + self.max_age_s)
+        self._seg_bytes = 0
 
         # Maintain a daily alias so existing tools (expecting prefix_YYYYMMDD.ndjson) keep working
-    alias = self.dir / f"{self.prefix}_{day}.ndjson"
+        alias = self.dir / f"{self.prefix}_{day}.ndjson"
         try:
             if alias.exists() or alias.is_symlink():
                 try:
@@ -102,62 +333,71 @@ class NdjsonLogger:
                     # As a last resort, create/truncate alias to exist (not kept in sync)
                     with open(alias, "a", encoding="utf-8"):
                         pass
-        # Also create debug alias if dual file
-        if self.dual_file and self._debug_path:
-            try:
-                debug_alias = self._debug_dir / f"{self.prefix}_debug_{day}.ndjson"
-                if debug_alias.exists() or debug_alias.is_symlink():
-                    try:
-                        debug_alias.unlink()
-                    except Exception:
-                        pass
+            # Also create debug alias if dual file
+            if self.dual_file and self._debug_path:
                 try:
-                    os.link(self._debug_path, debug_alias)
-                except Exception:
+                    debug_alias = self._debug_dir / f"{self.prefix}_debug_{day}.ndjson"
+                    if debug_alias.exists() or debug_alias.is_symlink():
+                        try:
+                            debug_alias.unlink()
+                        except Exception:
+                            pass
                     try:
-                        os.symlink(str(self._debug_path), debug_alias)
+                        os.link(self._debug_path, debug_alias)
                     except Exception:
-                        with open(debug_alias, "a", encoding="utf-8"):
-                            pass
-            except Exception:
-                pass
+                        try:
+                            os.symlink(str(self._debug_path), debug_alias)
+                        except Exception:
+                            with open(debug_alias, "a", encoding="utf-8"):
+                                pass
+                except Exception:
+                    pass
         except Exception:
             # Non-fatal if alias creation fails
             pass
+        # After the alias moved on, so a closed segment's only other name is
+        # the alias of a day that has ended
+        if self.on_segment_closed is not None:
+            for p in closed:
+                self.on_segment_closed(str(p))
 
-    def write(self, obj: dict):
-        # Filtering: when in 'regular' mode, drop events that are debug-level
-        # (type == 'debug') unless the message is explicitly whitelisted.
+    def active_paths(self) -> list:
+        """Files currently being written (their aliases share the inode)."""
+        return [str(p) for p, fh in ((self._path, self._fh), (self._debug_path, self._debug_fh)) if fh]
+
+    def _regular_drops(self, obj: dict) -> bool:
+        """Regular-mode records no file (and no sink) takes, checked before any encoding."""
+        msg = obj.get("msg")
+        # High-rate per-sample buffer status: noisy by nature; allow only when explicitly whitelisted
+        if msg == "bt50_buffer_status":
+            return obj.get("type") == "debug" and msg not in self.verbose_whitelist
+        # Empty heartbeats (no sensors)
+        if msg == "alive" and obj.get("type") == "status":
+            data = obj.get("data")
+            sensors = data.get("sensors") if isinstance(data, dict) else None
+            return isinstance(sensors, list) and len(sensors) == 0
+        return False
+
+    def _main_allows(self, obj: dict) -> bool:
+        """Regular-mode filter for the main file (the debug file takes everything else)."""
         try:
-            # In regular mode we apply two kinds of suppression:
-            # 1) suppress frequent empty heartbeat status lines: {"type":"status","msg":"alive","data":{"sensors": []}}
-            # 2) suppress debug-level lines when they carry a "current_amp" that is effectively zero.
+            # In regular mode debug-level lines are suppressed when they carry a
+            # "current_amp" that is effectively zero, or else unless whitelisted.
             if self.mode == "regular":
                 typ = obj.get("type")
                 msg = obj.get("msg")
                 data = obj.get("data") if isinstance(obj.get("data"), dict) else {}
 
-                # Suppress empty heartbeats (no sensors) to reduce noise in regular runs
-                if typ == "status" and msg == "alive":
-                    sensors = data.get("sensors")
-                    if isinstance(sensors, list) and len(sensors) == 0:
-                        return
-
                 # For debug events apply whitelist *unless* a numeric current_amp is present and is zeroish.
                 if typ == "debug":
                     ca = data.get("current_amp")
 
-                    # Explicit suppression for high-rate bt50 buffer status messages in regular mode
-                    # These are noisy by nature; allow only when explicitly whitelisted.
-                    if msg == "bt50_buffer_status" and not (msg and (msg in self.verbose_whitelist)):
-                        return
-
                     # If current_amp is present and numeric, treat values <= threshold as zero and suppress.
                     # If it's greater than the threshold, allow the event regardless of whitelist.
                     if ca is not None:
                         try:
                             if abs(float(ca)) <= float(self.current_amp_threshold):
-                                return
+                                return False
                             else:
                                 # non-zero meaningful amplitude -> allow regardless of whitelist
                                 # Skip further whitelist checks by proceeding to write.
@@ -170,76 +410,252 @@ class NdjsonLogger:
                     # only allow if whitelisted.
                     if ca is None:
                         if not (msg and (msg in self.verbose_whitelist)):
-                            return
+                            return False
         except Exception:
             # If filtering fails for any reason, fall back to writing the event
             pass
-    # If the event contains a raw hex payload from the AMG/timer, try to
+        return True
+
+    def write(self, obj: dict, on_written: Optional[Callable[[], None]] = None):
+        """Log one record. `on_written` is called once its line is in the files:
+        on the writer thread after the batch holding it in async mode, before
+        returning otherwise. Not called for records that are filtered or dropped."""
+        if self._buckets:
+            now_m = time.monotonic()
+            b = self._buckets.get(obj.get("msg"))
+            if b is not None and not b.take(now_m):
+                if now_m >= self._suppressed_due:
+                    self.flush_suppressed()
+                return
+            if now_m >= self._suppressed_due:
+                self.flush_suppressed()
+        # Filtering: when in 'regular' mode, drop events that are debug-level
+        # (type == 'debug') unless the message is explicitly whitelisted.
+        # Filtered records still go to the debug file when dual-file is on,
+        # except the high-rate ones no file takes, which cost nothing further.
+        if self.mode == "regular" and self._regular_drops(obj):
+            return
+        to_main = self.mode != "regular" or self._main_allows(obj)
+        if not to_main and not (self.dual_file and self._debug_fh) and not self._debug_sinks:
+            return
+        # If the event contains a raw hex payload from the AMG/timer, try to
         # decode it into friendly fields so logs are easier to consume.
-        try:
-            data = obj.get("data") if isinstance(obj.get("data"), dict) else {}
-            hex_payload = data.get("hex") or data.get("payload")
-            if isinstance(hex_payload, str) and hex_payload:
-                try:
-                    # Prefer absolute import; fall back to relative if needed.
-                    try:
-                        from steelcity_impact_bridge.amg import parse_frame_hex
-                    except Exception:
-                        from .amg import parse_frame_hex
-                    f = parse_frame_hex(hex_payload)
-                    if f:
-                        amg = {
-                            "shot_idx": int(f.get("b2")),
-                            "T_s": float(f.get("p1", 0)) / 100.0,
-                            "split_s": float(f.get("p2", 0)) / 100.0,
-                            "first_s": float(f.get("p3", 0)) / 100.0,
-                            "tail_hex": f"0x{int(f.get('tail')):02x}",
-                            "raw_hex": f.get("hex"),
-                        }
-                        # Attach decoded AMG data under data['amg'] and keep raw hex
-                        data["amg"] = amg
-                        obj["data"] = data
-                except Exception:
-                    # Non-fatal: if AMG parsing fails, continue and write raw event
-                    pass
-        except Exception:
-            pass
+        data = obj.get("data")
+        if type(data) is dict and ("hex" in data or "payload" in data):
+            self._decode_amg(data)
 
-    self.seq += 1
-        # Monotonic clock (ms) for stable deltas
-        # Allow suppression of ts_ms/t_iso for event records when configured
+        self.seq += 1
         now = time.time()
-        lt = time.localtime(now)
-        msec = int((now % 1.0) * 1000)
-        # Always include human-friendly local time for readability
-        hms = time.strftime("%H:%M:%S", lt) + f".{msec:03d}"
-        obj.setdefault("hms", hms)
+        # Always include human-friendly local time for readability; the
+        # HH:MM:SS part is rendered once per second, only the ms each record
+        sec = int(now)
+        if sec != self._hms_sec:
+            self._hms_sec = sec
+            self._hms_prefix = time.strftime("%H:%M:%S.", time.localtime(sec))
+        hms = f"{self._hms_prefix}{int((now - sec) * 1000):03d}"
         # Never include machine timestamps in any record. If callers have
         # accidentally attached `ts_ms` or `t_iso`, remove them to ensure
         # logs do not contain those fields.
-        obj.pop("ts_ms", None)
-        obj.pop("t_iso", None)
-        # Sequence and identity
-        obj.setdefault("seq", self.seq)
-        obj.setdefault("schema", "v1")
-        obj.setdefault("session_id", self.session_id)
-        obj.setdefault("pid", self.pid)
-        # If rotation day changed, rotate handles (this will also reopen debug fh)
-        if time.strftime("%Y%m%d") != self._rot_day:
+        if "ts_ms" in obj or "t_iso" in obj:
+            obj.pop("ts_ms", None)
+            obj.pop("t_iso", None)
+        # Sequence and identity. Normally none of these keys are set by the
+        # caller and they are appended to the encoded record as text.
+        if _STAMP_KEYS.isdisjoint(obj):
+            ident = self._ident if self._ident_for is self.session_id else self._identity()
+            tail = f'{self._tail_hms}{hms}{self._tail_seq}{self.seq}{ident}}}\n'
+        else:
+            obj.setdefault("hms", hms)
+            obj.setdefault("seq", self.seq)
+            obj.setdefault("schema", "v1")
+            obj.setdefault("session_id", self.session_id)
+            obj.setdefault("pid", self.pid)
+            tail = None
+        if self.sinks:
+            event = (self.seq, now, self.session_id, obj)
+            for s in self.sinks:
+                if to_main or s.debug:
+                    s.offer(event)
+            if not (to_main or self.dual_file):
+                return  # only debug sinks take it
+        if self._queue is not None:
+            try:
+                self._queue.put_nowait((obj, to_main, tail, on_written))
+            except queue.Full:
+                self.dropped += 1
+            return
+        # If the rotation deadline (next local midnight, or the segment's age
+        # limit) passed or the segment is full, rotate handles (this will also
+        # reopen debug fh)
+        if now >= self._rot_deadline or self._seg_bytes >= self._seg_limit:
             self.rotate()
-
+        try:
+            line = self.encoder.line(obj, tail)  # once, for both files
+        except Exception:
+            return
+        self._seg_bytes += len(line)
+        self.bytes += len(line)
         # Always write full record to debug file when enabled
         try:
             if self.dual_file and self._debug_fh:
-                # Write a copy to debug (full, except ts_ms/t_iso already removed)
-                self._debug_fh.write(json.dumps(obj) + "\n")
+                self._debug_fh.write(line)
         except Exception:
             # non-fatal
             pass
+        # Write to main file only if filtering allowed it
+        try:
+            if to_main and self._fh:
+                self._fh.write(line)
+        except Exception:
+            pass
+        self.written += 1
+        if on_written is not None:
+            on_written()
 
-        # Write to main file only if filtering allowed it (we already applied filters above)
+    def flush_suppressed(self) -> None:
+        """Write one log_suppressed record for what the rate limits held back since the last one."""
+        now = time.monotonic()
+        self._suppressed_due = now + self.suppressed_interval_s
+        counts = {msg: b.suppressed for msg, b in self._buckets.items() if b.suppressed}
+        if not counts:
+            self._suppressed_since = now
+            return
+        for b in self._buckets.values():
+            b.suppressed = 0
+        since, self._suppressed_since = self._suppressed_since, now
+        self.write({"type": "info", "msg": "log_suppressed",
+                    "data": {"interval_s": round(now - since, 1), "suppressed": counts}})
+
+    def _identity(self) -> str:
+        # JSON text of the stamp fields around hms and seq, in the encoder's
+        # separators; re-rendered if session_id changes
+        if self._ident_for is not self.session_id:
+            i, k = self.encoder.item_sep, self.encoder.key_sep
+            self._ident_for = self.session_id
+            self._tail_hms = f'"hms"{k}"'
+            self._tail_seq = f'"{i}"seq"{k}'
+            self._ident = (f'{i}"schema"{k}"v1"{i}"session_id"{k}{json.dumps(self.session_id)}'
+                           f'{i}"pid"{k}{json.dumps(self.pid)}')
+        return self._ident
+
+    @staticmethod
+    def _decode_amg(data: dict) -> None:
+        hex_payload = data.get("hex") or data.get("payload")
+        if not (isinstance(hex_payload, str) and hex_payload):
+            return
+        try:
+            f = parse_frame_hex(hex_payload)
+            if f:
+                # Attach decoded AMG data under data['amg'] and keep raw hex
+                data["amg"] = {
+                    "shot_idx": int(f.get("b2")),
+                    "T_s": float(f.get("p1", 0)) / 100.0,
+                    "split_s": float(f.get("p2", 0)) / 100.0,
+                    "first_s": float(f.get("p3", 0)) / 100.0,
+                    "tail_hex": f"0x{int(f.get('tail')):02x}",
+                    "raw_hex": f.get("hex"),
+                }
+        except Exception:
+            # Non-fatal: if AMG parsing fails, continue and write raw event
+            pass
+
+    def _writer_loop(self):
+        q = self._queue
+        main, debug = [], []
+        done = []     # on_written callbacks of the buffered records
+        pending = 0   # bytes buffered
+        taken = 0     # queue items buffered (task_done once written)
+        deadline = None
+        stopping = False
+        while not stopping:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = q.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            while item is not None:
+                taken += 1
+                if item is _STOP:
+                    stopping = True
+                    break
+                obj, to_main, tail, on_written = item
+                if on_written is not None:
+                    done.append(on_written)
+                try:
+                    line = self.encoder.line(obj, tail)
+                except Exception:
+                    line = None
+                if line is not None:
+                    if self.dual_file:
+                        debug.append(line)
+                    if to_main:
+                        main.append(line)
+                    pending += len(line)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval_s
+                if pending >= self.flush_bytes:
+                    break
+                try:
+                    item = q.get_nowait()
+                except queue.Empty:
+                    item = None
+            if taken and (stopping or pending >= self.flush_bytes or time.monotonic() >= deadline):
+                self._write_batch(main, debug)
+                self.written += len(debug) if self.dual_file else len(main)
+                self.batches += 1
+                for cb in done:
+                    try:
+                        cb()
+                    except Exception:
+                        pass
+                main, debug, done = [], [], []
+                pending = 0
+                deadline = None
+                for _ in range(taken):
+                    q.task_done()
+                taken = 0
+
+    def _write_batch(self, main: list, debug: list) -> None:
+        if time.time() >= self._rot_deadline or self._seg_bytes >= self._seg_limit:
+            self.rotate()
+        n = sum(map(len, debug if self.dual_file else main))
+        self._seg_bytes += n
+        self.bytes += n
         try:
-            if self._fh:
-                self._fh.write(json.dumps(obj) + "\n")
+            if debug and self._debug_fh:
+                self._debug_fh.write(b"".join(debug))
         except Exception:
             pass
+        try:
+            if main and self._fh:
+                self._fh.write(b"".join(main))
+        except Exception:
+            pass
+
+    def flush(self) -> None:
+        """Block until every record written so far is in the files."""
+        if self._queue is not None:
+            self._queue.join()
+
+    def stop(self) -> None:
+        """Write out everything queued and stop the writer thread.
+
+        Later write() calls go straight to the files, as in synchronous mode.
+        """
+        if self._buckets:
+            self.flush_suppressed()
+        if self._queue is None:
+            return
+        self._queue.put(_STOP)
+        if self._writer is not None:
+            self._writer.join()
+        self._queue = None
+        self._writer = None
+
+    def stats(self) -> dict:
+        out = {"written": self.written, "dropped": self.dropped, "bytes": self.bytes}
+        if self._buckets:
+            out["suppressed"] = sum(b.suppressed for b in self._buckets.values())
+        if self._queue is not None:
+            out.update(queued=self._queue.qsize(), batches=self.batches)
+        return out
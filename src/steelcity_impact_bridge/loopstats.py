@@ -0,0 +1,137 @@
+from __future__ import annotations
+import asyncio, time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+def _ms(ns: float) -> float:
+    return round(ns / 1e6, 3)
+
+
+class CallbackTimer:
+    """Wall time spent in one callback since the last snapshot.
+
+    Keeps a count, total, max and the number of calls that ran longer than
+    `budget_ns`; snapshot() reports and clears them, so every status record
+    covers just its own interval.
+    """
+
+    __slots__ = ("budget_ns", "n", "total_ns", "max_ns", "over")
+
+    def __init__(self, budget_ns: int):
+        self.budget_ns = int(budget_ns)
+        self.n = self.total_ns = self.max_ns = self.over = 0
+
+    def add(self, dt_ns: int) -> None:
+        self.n += 1
+        self.total_ns += dt_ns
+        if dt_ns > self.max_ns:
+            self.max_ns = dt_ns
+        if dt_ns > self.budget_ns:
+            self.over += 1
+
+    def snapshot(self, interval_ns: int) -> dict:
+        out = {
+            "n": self.n,
+            "mean_ms": _ms(self.total_ns / self.n) if self.n else 0.0,
+            "max_ms": _ms(self.max_ns),
+            "over_budget": self.over,
+            # Share of the interval the loop spent inside this callback
+            "busy_pct": round(100.0 * self.total_ns / interval_ns, 2) if interval_ns > 0 else 0.0,
+        }
+        self.n = self.total_ns = self.max_ns = self.over = 0
+        return out
+
+
+class LoopLagProbe:
+    """Measures how late the event loop runs a timer it was asked to run.
+
+    Every `interval_s` a sleep is timed; its overshoot is the time other
+    callbacks (BLE notifications, our processing) held the loop. The most
+    recent `maxlen` samples of the current interval are kept. While `tap`
+    is a list, every sample (ns) is also appended to it, unbounded and never
+    cleared by snapshot(), for a caller measuring a span of its own.
+    """
+
+    def __init__(self, interval_s: float = 0.025, budget_ns: int = 5_000_000, maxlen: int = 1024):
+        self.interval_s = float(interval_s)
+        self.budget_ns = int(budget_ns)
+        self._lag = deque(maxlen=maxlen)
+        self._max = 0
+        self._over = 0
+        self._task: Optional[asyncio.Task] = None
+        self.tap: Optional[List[int]] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        want = int(self.interval_s * 1e9)
+        while True:
+            t = time.perf_counter_ns()
+            await asyncio.sleep(self.interval_s)
+            self.add(max(0, time.perf_counter_ns() - t - want))
+
+    def add(self, lag_ns: int) -> None:
+        self._lag.append(lag_ns)
+        if lag_ns > self._max:
+            self._max = lag_ns
+        if lag_ns > self.budget_ns:
+            self._over += 1
+        if self.tap is not None:
+            self.tap.append(lag_ns)
+
+    def snapshot(self) -> dict:
+        if not self._lag:
+            return {"n": 0}
+        lag = np.fromiter(self._lag, dtype=np.float64)
+        p50, p99 = np.percentile(lag, [50, 99])
+        out = {"n": int(lag.size), "p50_ms": _ms(p50), "p99_ms": _ms(p99),
+               "max_ms": _ms(self._max), "over_budget": self._over}
+        self._lag.clear()
+        self._max = self._over = 0
+        return out
+
+
+def timed(fn: Callable, timer: CallbackTimer) -> Callable:
+    """Wrap `fn` so each call's wall time is added to `timer`."""
+    clock = time.perf_counter_ns
+
+    def wrapper(*args):
+        t = clock()
+        try:
+            return fn(*args)
+        finally:
+            timer.add(clock() - t)
+    return wrapper
+
+
+class CallbackStats:
+    """Named CallbackTimers sharing one budget, snapshotted together."""
+
+    def __init__(self, budget_ns: int):
+        self.budget_ns = int(budget_ns)
+        self.timers: Dict[str, CallbackTimer] = {}
+        self._since = time.perf_counter_ns()
+
+    def timer(self, name: str) -> CallbackTimer:
+        t = self.timers.get(name)
+        if t is None:
+            t = self.timers[name] = CallbackTimer(self.budget_ns)
+        return t
+
+    def wrap(self, name: str, fn: Callable) -> Callable:
+        return timed(fn, self.timer(name))
+
+    def snapshot(self) -> dict:
+        now = time.perf_counter_ns()
+        interval, self._since = now - self._since, now
+        return {name: t.snapshot(interval) for name, t in self.timers.items()}
@@ -0,0 +1,148 @@
+from __future__ import annotations
+import asyncio, collections, cProfile, os, pathlib, signal, sys, threading, time
+from typing import Callable, Optional, Tuple
+
+
+class StackSampler:
+    """Samples one thread's Python stack every `interval_s` from a helper thread.
+
+    Unlike a sys.setprofile hook, nothing runs on the sampled thread's calls;
+    the cost is one GIL hand-off per sample. Stacks are counted in collapsed
+    form (root;...;leaf), ready for flamegraph.pl or speedscope.
+    """
+
+    def __init__(self, thread_id: int, interval_s: float = 0.005):
+        self.thread_id = thread_id
+        self.interval_s = float(interval_s)
+        self.counts = collections.Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        tid = self.thread_id
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(tid)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}")
+                frame = frame.f_back
+            self.counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.counts.most_common())
+
+
+class Profiler:
+    """One on-demand profiling run of the calling (event loop) thread.
+
+    The stack sampler gives where wall time goes as collapsed stacks, at
+    the cost of one GIL hand-off per sample. With `cprofile`, cProfile also
+    records exact per-function call counts and times (pstats); it hooks
+    every call on the loop thread, which slows the bridge noticeably, so
+    it is off unless asked for.
+    """
+
+    def __init__(self, out_dir: str, interval_s: float = 0.005, cprofile: bool = False):
+        self.out_dir = pathlib.Path(out_dir)
+        self._profile = cProfile.Profile() if cprofile else None
+        self._sampler = StackSampler(threading.get_ident(), interval_s)
+        self.started = 0.0
+        self.seconds = 0.0
+
+    def start(self) -> None:
+        self.started = time.monotonic()
+        self._sampler.start()
+        if self._profile is not None:
+            self._profile.enable()
+
+    def stop(self) -> None:
+        if self._profile is not None:
+            self._profile.disable()
+        self._sampler.stop()
+        self.seconds = time.monotonic() - self.started
+
+    def dump(self) -> Tuple[Optional[pathlib.Path], pathlib.Path]:
+        """Write <stamp>.collapsed (and <stamp>.pstats with cprofile, else None is
+        returned for it); safe to call off the loop thread."""
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d_%H%M%S") + f"_{os.getpid()}"
+        pstats_path = None
+        collapsed_path = self.out_dir / f"profile_{stamp}.collapsed"
+        if self._profile is not None:
+            pstats_path = self.out_dir / f"profile_{stamp}.pstats"
+            self._profile.dump_stats(str(pstats_path))
+        collapsed_path.write_text(self._sampler.collapsed(), encoding="utf-8")
+        return pstats_path, collapsed_path
+
+    @property
+    def samples(self) -> int:
+        return self._sampler.samples
+
+
+def install_profile_signal(out_dir: str, seconds: float = 30.0,
+                           log: Optional[Callable[[dict], None]] = None,
+                           signum: Optional[int] = None, cprofile: Optional[bool] = None) -> bool:
+    """Profile the running event loop for `seconds` each time `signum` (SIGUSR1) arrives.
+
+    Results go to `out_dir` without blocking the loop; a signal while a run
+    is in progress is ignored. Runs sample stacks only unless `cprofile` is
+    set (default: the PROFILE_CPROFILE environment variable). Returns False
+    where the signal is unavailable.
+    """
+    if cprofile is None:
+        cprofile = os.getenv("PROFILE_CPROFILE", "0") not in ("", "0", "false", "False")
+    signum = signum if signum is not None else getattr(signal, "SIGUSR1", None)
+    if signum is None:
+        return False
+    loop = asyncio.get_running_loop()
+    log = log or (lambda rec: None)
+    active = []
+
+    def _done(fut, prof: Profiler):
+        active.clear()
+        try:
+            pstats_path, collapsed_path = fut.result()
+            log({"type": "info", "msg": "profile_written",
+                 "data": {"seconds": round(prof.seconds, 1), "samples": prof.samples,
+                          "pstats": None if pstats_path is None else str(pstats_path),
+                          "collapsed": str(collapsed_path)}})
+        except Exception as e:
+            log({"type": "error", "msg": "profile_write_failed", "data": {"error": str(e)}})
+
+    def _finish(prof: Profiler):
+        prof.stop()
+        fut = loop.run_in_executor(None, prof.dump)
+        fut.add_done_callback(lambda f: _done(f, prof))
+
+    def _on_signal():
+        if active:
+            log({"type": "info", "msg": "profile_busy", "data": {}})
+            return
+        prof = Profiler(out_dir, cprofile=cprofile)
+        active.append(prof)
+        prof.start()
+        log({"type": "info", "msg": "profile_started",
+             "data": {"seconds": seconds, "dir": str(out_dir), "cprofile": cprofile}})
+        loop.call_later(seconds, _finish, prof)
+
+    try:
+        loop.add_signal_handler(signum, _on_signal)
+    except (NotImplementedError, RuntimeError, ValueError):
+        return False
+    return True
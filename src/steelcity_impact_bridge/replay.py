@@ -0,0 +1,438 @@
+"""Replay recorded bridge sessions through the detection pipeline, offline.
+
+    python -m steelcity_impact_bridge.replay [-c config.yaml] [-o OUT] [-j N] LOG...
+
+Each LOG is a debug NDJSON file written by NdjsonLogger, plain or a gzipped
+segment (or a directory of them). BT50 samples come from the continuous raw
+archive (logs/raw/<sensor>_YYYYMMDD.bt50raw, logging.raw_archive) over the
+session's time span when one covers it; otherwise from the capture windows
+that session wrote to
+logs/sensorbuffer/capture_*.bin (capture_written records), or the
+buffer_detail_*.txt dumps of older sessions (buffer_detail_written records).
+Those only hold the samples around detected impacts, so a session replayed
+from them is not continuous: the detector restarts its idle baseline in
+each window and sees nothing between them. The samples
+are re-encoded as 0x55,0x61 frames, one per notification at its recorded time (which
+the sample clock keeps as is); AMG frames come from the raw hex on the timer event
+records. Everything is pushed through Bridge._on_bt50_packet and the AMG
+signal handlers in time order on a virtual clock, with no BLE and no
+sleeping. Sessions run in parallel in a process pool; each one's output log
+goes to OUT/<session_id>/ and a one-line JSON summary is printed per session.
+
+Log records carry only a wall-clock `hms`, so AMG frames are placed on the
+sensors' monotonic time base with an offset fitted from records that carry
+both (SHOT_RAW timestamp_ms, bt50_buffer_init, capture/buffer file end times).
+"""
+from __future__ import annotations
+import argparse, dataclasses, json, pathlib, statistics, sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .archive import SUFFIX, ArchiveReader, archive_sensor_id, velocities
+from .bridge import Bridge
+from .capture import load_window
+from .retention import open_log
+from .config import AppCfg, AmgCfg, DetectorCfg, LoggingCfg, load_config
+from .ble.amg_signals import classify_signals
+
+_DAY_MS = 86_400_000
+# AMG timer records whose data.raw is the notification that produced them.
+# T0 and Timer_T0 (and both SHOT_RAW writers) come from the same frame.
+_AMG_MSGS = ("T0", "SHOT_RAW", "String_END", "String_TIMEOUT_END")
+# Records that point at recorded BT50 samples: capture windows, and the
+# per-window text dumps older versions wrote
+_SAMPLE_MSGS = ("capture_written", "buffer_detail_written")
+
+
+class VirtualClock:
+    """Callable stand-in for time.monotonic_ns, advanced by the replay loop."""
+
+    def __init__(self, now_ns: int = 0):
+        self.now_ns = int(now_ns)
+
+    def __call__(self) -> int:
+        return self.now_ns
+
+
+class RecordedTimes:
+    """Per-sensor clock for replay: dumped sample times are already acquisition
+    times, so each frame keeps the time it is fed with instead of being re-fitted.
+    `period_ns` only spaces out frames of a notification that carries several."""
+
+    def __init__(self, period_ns: int = 10_000_000):
+        self.period_ns = int(period_ns)
+        self._k, self._t = -1, 0
+
+    def update(self, k: int, arrival_ns: int) -> int:
+        self._k, self._t = k, arrival_ns
+        return k
+
+    def time_of(self, k: int) -> int:
+        return self._t + (k - self._k) * self.period_ns
+
+    def stats(self) -> dict:
+        return {"n": self._k + 1, "recorded": True}
+
+
+def _hms_ms(hms: str) -> Optional[int]:
+    try:
+        hh, mm, rest = hms.split(":")
+        ss, _, ms = rest.partition(".")
+        return ((int(hh) * 60 + int(mm)) * 60 + int(ss)) * 1000 + int(ms or 0)
+    except Exception:
+        return None
+
+
+def read_sessions(path: pathlib.Path) -> Dict[str, List[dict]]:
+    """Records of an NDJSON log (plain or .gz) grouped by session_id, in write order."""
+    out: Dict[str, List[dict]] = {}
+    with open_log(path) as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except Exception:
+                continue
+            if isinstance(rec, dict):
+                out.setdefault(str(rec.get("session_id", "")), []).append(rec)
+    for recs in out.values():
+        recs.sort(key=lambda r: r.get("seq", 0))
+        # Unwrap local time of day across midnight
+        day, last = 0, None
+        for r in recs:
+            ms = _hms_ms(str(r.get("hms", "")))
+            if ms is None:
+                continue
+            if last is not None and ms + _DAY_MS // 2 < last:
+                day += _DAY_MS
+            last = ms
+            r["_wall_ms"] = day + ms
+    return out
+
+
+def load_buffer_file(path: pathlib.Path) -> np.ndarray:
+    """(ts_ns, vx, vy, vz) rows of a buffer_detail_*.txt dump."""
+    try:
+        a = np.loadtxt(path, delimiter=",", comments="#", ndmin=2)
+    except Exception:
+        return np.empty((0, 4))
+    if a.size == 0 or a.shape[1] < 6:
+        return np.empty((0, 4))
+    return a[:, [1, 3, 4, 5]]
+
+
+def load_capture(path: pathlib.Path, data: dict) -> np.ndarray:
+    """(ts_ns, vx, vy, vz) rows of the capture window a capture_written record describes."""
+    try:
+        w = load_window(str(path), data["offset"], data["samples"])
+    except (KeyError, OSError, ValueError):
+        return np.empty((0, 4))
+    return np.column_stack([w["ts_ns"], w["vx"], w["vy"], w["vz"]]).astype(np.float64)
+
+
+def _resolve(name: str, roots: Iterable[pathlib.Path]) -> Optional[pathlib.Path]:
+    p = pathlib.Path(name)
+    if p.is_file():
+        return p
+    for root in roots:
+        for cand in (root / "sensorbuffer" / p.name, root / p.name):
+            if cand.is_file():
+                return cand
+    return None
+
+
+def bt50_samples(recs: List[dict], roots: List[pathlib.Path]) -> Tuple[Dict[str, np.ndarray], List[Tuple[int, int]]]:
+    """Per-sensor de-duplicated samples, plus (wall_ms, mono_ns) anchors from the dumps."""
+    chunks: Dict[str, List[np.ndarray]] = {}
+    anchors = []
+    for r in recs:
+        msg = r.get("msg")
+        if msg not in _SAMPLE_MSGS:
+            continue
+        data = r.get("data") or {}
+        path = _resolve(str(data.get("file" if msg == "capture_written" else "filename", "")), roots)
+        if path is None:
+            continue
+        rows = load_capture(path, data) if msg == "capture_written" else load_buffer_file(path)
+        if not len(rows):
+            continue
+        chunks.setdefault(str(data.get("sensor_id")), []).append(rows)
+        if "_wall_ms" in r:
+            anchors.append((r["_wall_ms"], int(rows[-1, 0])))
+    out = {}
+    for sid, parts in chunks.items():
+        rows = np.concatenate(parts)
+        # Consecutive text dumps overlap by a few samples; keep each timestamp once
+        _, first = np.unique(rows[:, 0].astype(np.int64), return_index=True)
+        out[sid] = rows[first]
+    return out, anchors
+
+
+def amg_frames(recs: List[dict], offset_ns: int) -> List[Tuple[int, bytes]]:
+    """Time-ordered (mono_ns, raw) AMG notifications recovered from the timer records."""
+    seen = set()
+    out = []
+    t0_idx = None  # T0 still placed by wall time only
+    for r in recs:
+        msg = r.get("msg")
+        if msg not in _AMG_MSGS:
+            continue
+        data = r.get("data") or {}
+        try:
+            raw = bytes.fromhex(str(data.get("raw", "")))
+        except ValueError:
+            continue
+        if not raw:
+            continue
+        if data.get("timestamp_ms") is not None:
+            ts = int(round(float(data["timestamp_ms"]) * 1e6))
+            # The first shot after a T0 pins it exactly through its t_rel_ms
+            if t0_idx is not None and r.get("t_rel_ms") is not None:
+                out[t0_idx] = (ts - int(round(float(r["t_rel_ms"]) * 1e6)), out[t0_idx][1])
+                t0_idx = None
+        elif "_wall_ms" in r:
+            ts = r["_wall_ms"] * 1_000_000 + offset_ns
+        else:
+            continue
+        # Both SHOT_RAW writers log the same notification
+        key = (msg, raw, ts // 1_000_000)
+        if key in seen:
+            continue
+        seen.add(key)
+        if msg == "T0":
+            t0_idx = len(out)
+        out.append((ts, raw))
+    out.sort(key=lambda x: x[0])
+    return out
+
+
+def clock_offset_ns(recs: List[dict], anchors: List[Tuple[int, int]]) -> int:
+    """Median of (monotonic - wall) over records that carry both."""
+    diffs = [mono - wall * 1_000_000 for wall, mono in anchors]
+    for r in recs:
+        if "_wall_ms" not in r:
+            continue
+        data = r.get("data") or {}
+        mono = None
+        if r.get("msg") == "SHOT_RAW" and data.get("timestamp_ms") is not None:
+            mono = int(round(float(data["timestamp_ms"]) * 1e6))
+        elif r.get("msg") == "bt50_buffer_init" and data.get("init_ts_ns") is not None:
+            mono = int(data["init_ts_ns"])
+        if mono is not None:
+            diffs.append(mono - r["_wall_ms"] * 1_000_000)
+    return int(statistics.median(diffs)) if diffs else 0
+
+
+def _archive_stats(r: dict) -> dict:
+    # raw_archive stats of an alive record, {} if none
+    if r.get("msg") != "alive":
+        return {}
+    return (r.get("data") or {}).get("raw_archive") or {}
+
+
+def archive_samples(recs: List[dict], roots: Sequence[pathlib.Path],
+                    anchors: Sequence[Tuple[int, int]] = ()) -> Dict[str, np.ndarray]:
+    """Per-sensor (ts_ns, vx, vy, vz) rows of the raw archive over the session's time span.
+
+    The span runs from the session's first to its last record (wall times
+    placed on the monotonic clock by clock_offset_ns, with the (wall_ms,
+    mono_ns) anchors of bt50_samples), widened to any monotonic
+    stamps the records carry. The archive stores Unix
+    times; the session's alive records carry the offset back. Rows are
+    keyed by the sensor id in the file name (the header may hold a cut id
+    in old files). Empty when the session never reported one or no archive
+    file covers it.
+    """
+    offsets = [_archive_stats(r).get("offset_ns") for r in recs]
+    offsets = [o for o in offsets if o is not None]
+    walls = [r["_wall_ms"] for r in recs if "_wall_ms" in r]
+    if not offsets or not walls:
+        return {}
+    off = int(offsets[-1])
+    mono = clock_offset_ns(recs, list(anchors))
+    stamps = [m for _, m in anchors] + [min(walls) * 1_000_000 + mono, (max(walls) + 1) * 1_000_000 + mono]
+    for r in recs:
+        # Records that carry a monotonic time of their own
+        data = r.get("data") or {}
+        if r.get("msg") == "bt50_buffer_init" and data.get("init_ts_ns") is not None:
+            stamps.append(int(data["init_ts_ns"]))
+        elif r.get("msg") == "SHOT_RAW" and data.get("timestamp_ms") is not None:
+            stamps.append(int(round(float(data["timestamp_ms"]) * 1e6)))
+    t0, t1 = min(stamps), max(stamps) + 1
+    parts: Dict[str, List[np.ndarray]] = {}
+    dirs = {(root / "raw").resolve() for root in roots}
+    for path in sorted(f for d in dirs if d.is_dir() for f in d.glob("*" + SUFFIX)):
+        try:
+            with ArchiveReader(str(path)) as rd:
+                rows = rd.between(t0 + off, t1 + off)
+                if len(rows):
+                    parts.setdefault(archive_sensor_id(path), []).append(np.column_stack(
+                        [rows["ts_ns"] - off, velocities(rows)]).astype(np.float64))
+        except (OSError, ValueError):
+            continue
+    return {sid: np.concatenate(p) for sid, p in parts.items()}
+
+
+def sample_period_ns(rows: np.ndarray, default: int) -> int:
+    """Median spacing of recorded sample times (gaps between capture windows
+    are few), or `default` with fewer than two samples."""
+    steps = np.diff(rows[:, 0].astype(np.int64))
+    steps = steps[steps > 0]
+    return int(np.median(steps)) if steps.size else int(default)
+
+
+def encode_frames(rows: np.ndarray) -> bytes:
+    """Re-encode (ts, vx, vy, vz) rows as concatenated 28-byte 0x55,0x61 frames."""
+    words = np.zeros((len(rows), 14), dtype="<i2")
+    words.view(np.uint8)[:, :2] = (0x55, 0x61)
+    words[:, 1:4] = np.clip(np.rint(rows[:, 1:4]), -32768, 32767)
+    words[:, 7] = 2500  # 25.00 C; not recorded in the dumps
+    return words.tobytes()
+
+
+def _feed(br: Bridge, samples: Dict[str, np.ndarray], amg: List[Tuple[int, bytes]]) -> None:
+    """Push the samples and AMG frames through the bridge in time order on a virtual clock."""
+    clock = VirtualClock()
+    br.clock = clock
+    for sid, rows in samples.items():
+        br.detectors[sid] = br._new_detector()
+        br._bt50_clocks[sid] = RecordedTimes(sample_period_ns(rows, br.bt50_sample_period_ns))
+
+    # Merge sensor samples and AMG frames into one time-ordered stream
+    ts_parts, kind_parts, idx_parts = [], [], []
+    frames = {}
+    for k, (sid, rows) in enumerate(samples.items()):
+        frames[k] = (sid, encode_frames(rows))
+        ts_parts.append(rows[:, 0].astype(np.int64))
+        kind_parts.append(np.full(len(rows), k))
+        idx_parts.append(np.arange(len(rows)))
+    ts_parts.append(np.array([t for t, _ in amg], dtype=np.int64))
+    kind_parts.append(np.full(len(amg), -1))
+    idx_parts.append(np.arange(len(amg)))
+    ts_all = np.concatenate(ts_parts)
+    order = np.argsort(ts_all, kind="stable")
+    kinds = np.concatenate(kind_parts)[order]
+    idxs = np.concatenate(idx_parts)[order]
+    ts_all = ts_all[order]
+
+    for ts, kind, i in zip(ts_all.tolist(), kinds.tolist(), idxs.tolist()):
+        clock.now_ns = ts
+        if kind < 0:
+            raw = amg[i][1]
+            for sig in classify_signals(raw):
+                if sig == "T0":
+                    br._on_t0(ts, raw)
+                br._on_amg_signal(ts, sig, raw)
+        else:
+            sid, buf = frames[kind]
+            br._on_bt50_packet(sid, ts, buf[i * 28:(i + 1) * 28])
+    br._emit_impacts(None)
+
+
+def replay_session(log_path: str, session_id: str, cfg: AppCfg, out_dir: str,
+                   buffer_roots: Optional[List[str]] = None) -> dict:
+    """Replay one recorded session; returns a summary dict."""
+    path = pathlib.Path(log_path)
+    recs = read_sessions(path).get(session_id, [])
+    roots = [pathlib.Path(p) for p in (buffer_roots or [])] + [path.parent, path.parent.parent]
+    samples, anchors = bt50_samples(recs, roots)
+    # The continuous archive, where there is one, replaces the capture windows
+    archived = archive_samples(recs, roots, anchors)
+    samples.update(archived)
+    offset = clock_offset_ns(recs, anchors)
+    amg = amg_frames(recs, offset)
+
+    out = pathlib.Path(out_dir) / (session_id or path.stem)
+    # The recorded samples are the input: no captures, raw archive or extra
+    # sinks. Every record is kept (verbose, no rate limits) so the output
+    # holds all the pipeline did, whatever the live logging settings were.
+    cfg = dataclasses.replace(cfg, logging=dataclasses.replace(
+        cfg.logging, dir=str(out), dual_file=False, captures=False, raw_archive=False, sinks=None,
+        mode="verbose", rate_limits=None))
+    br = Bridge(cfg)
+    try:
+        _feed(br, samples, amg)
+    finally:
+        # Drain and close the log before its records are counted
+        br.logger.stop()
+
+    counts: Dict[str, int] = {}
+    for f in out.glob("*.ndjson"):
+        if _is_alias(f):
+            continue
+        with open(f, "r", encoding="utf-8") as fh:
+            for line in fh:
+                rec = json.loads(line)
+                key = rec.get("event_type") or rec.get("msg")
+                if key in ("impact_detected", "impact_sympathetic", "HIT", "T0", "SHOT_RAW"):
+                    counts[key] = counts.get(key, 0) + 1
+    return {
+        "log": str(path),
+        "session_id": session_id,
+        "out": str(out),
+        "samples": {sid: int(len(rows)) for sid, rows in samples.items()},
+        "sample_source": {sid: "archive" if sid in archived else "captures" for sid in samples},
+        "amg_frames": len(amg),
+        "clock_offset_ns": offset,
+        "counts": counts,
+    }
+
+
+def _is_alias(f: pathlib.Path) -> bool:
+    # Daily hardlink alias of a timestamped log: prefix_YYYYMMDD.ndjson[.gz]
+    last = f.name.split(".", 1)[0].rsplit("_", 1)[-1]
+    return len(last) == 8 and last.isdigit()
+
+
+def _expand(paths: Iterable[str]) -> List[pathlib.Path]:
+    out = []
+    for p in map(pathlib.Path, paths):
+        if p.is_dir():
+            out += sorted(f for pat in ("*.ndjson", "*.ndjson.gz") for f in p.rglob(pat) if not _is_alias(f))
+        elif p.is_file():
+            out.append(p)
+    return out
+
+
+def _run(args) -> dict:
+    return replay_session(*args)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m steelcity_impact_bridge.replay",
+        description="Replay recorded sessions through the bridge offline",
+        epilog="BT50 samples come from the raw archive (logs/raw, logging.raw_archive) when it "
+               "covers a session. Sessions recorded with captures only replay just the windows "
+               "around detected impacts: not continuous, so quiet stretches and anything the live "
+               "detector missed are not replayed.")
+    ap.add_argument("logs", nargs="+", help="debug NDJSON files or directories")
+    ap.add_argument("-c", "--config", help="config.yaml whose detector settings to replay with")
+    ap.add_argument("-o", "--out", default="replay_out", help="output directory")
+    ap.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: CPUs)")
+    ap.add_argument("--buffers", action="append", default=[],
+                    help="extra log directory to look for capture/buffer_detail files and raw/ archives in")
+    a = ap.parse_args(argv)
+
+    if a.config:
+        cfg = load_config(a.config)
+    else:
+        cfg = AppCfg(amg=AmgCfg(), sensors=[], detector=DetectorCfg(), logging=LoggingCfg())
+    jobs = []
+    for path in _expand(a.logs):
+        for sid, recs in read_sessions(path).items():
+            if any(r.get("msg") in _SAMPLE_MSGS or r.get("msg") in _AMG_MSGS or _archive_stats(r)
+                   for r in recs):
+                jobs.append((str(path), sid, cfg, a.out, a.buffers))
+    if not jobs:
+        print("no replayable sessions found", file=sys.stderr)
+        return 2
+    with ProcessPoolExecutor(max_workers=a.jobs) as pool:
+        for summary in pool.map(_run, jobs):
+            print(json.dumps(summary))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
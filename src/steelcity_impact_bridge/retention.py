@@ -0,0 +1,248 @@
+"""Background compression of closed log segments and per-class disk quotas.
+
+A closed NDJSON segment is gzipped as a series of independent members of
+about `member_bytes` input each, always cut at a line end, so the result
+is an ordinary .gz file (gzip, zcat) that can also be entered in the
+middle: `<segment>.gz.idx` lists each member's (uncompressed offset,
+compressed offset) and read_from() starts at the member holding a given
+offset. Quotas are enforced per class of files (main log, debug log,
+sensorbuffer captures, raw archives) by deleting the oldest files first.
+A file is deleted together with everything that shares its name up to the
+first dot (a capture's .bin and .idx.ndjson, a raw archive and its .idx, a
+segment and its .gz.idx) and with its other hard links.
+"""
+from __future__ import annotations
+import gzip, json, os, pathlib, queue, threading, time, zlib
+from typing import Callable, Dict, Iterable, IO, List, Optional, Sequence, Tuple
+
+_STOP = object()  # worker shutdown sentinel
+
+
+def compress_segment(src: str, member_bytes: int = 1 << 20, level: int = 6) -> Tuple[int, int]:
+    """Gzip `src` to `src`.gz with a member index, then remove `src`.
+
+    Other hard links to `src` (the daily alias of a closed day) are moved to
+    the compressed file as `<link>.gz`. Returns (bytes in, bytes out).
+    """
+    src_p = pathlib.Path(src)
+    dst = src_p.with_name(src_p.name + ".gz")
+    tmp = dst.with_name(dst.name + ".tmp")
+    members: List[Tuple[int, int]] = []
+    raw_off = 0
+    with open(src_p, "rb") as fi, open(tmp, "wb") as fo:
+        while True:
+            chunk = fi.read(member_bytes)
+            if not chunk:
+                break
+            if not chunk.endswith(b"\n"):
+                chunk += fi.readline()  # members start on a record
+            members.append((raw_off, fo.tell()))
+            fo.write(gzip.compress(chunk, compresslevel=level, mtime=0))
+            raw_off += len(chunk)
+        out = fo.tell()
+    os.replace(tmp, dst)
+    with open(str(dst) + ".idx", "w", encoding="utf-8") as f:
+        json.dump({"members": members, "size": raw_off}, f)
+    st = src_p.stat()
+    if st.st_nlink > 1:
+        for other in os.scandir(src_p.parent):
+            if other.name == src_p.name or other.is_symlink():
+                continue
+            try:
+                if other.inode() == st.st_ino:
+                    os.unlink(other.path)
+                    os.link(dst, other.path + ".gz")
+            except OSError:
+                pass
+    os.unlink(src_p)
+    return raw_off, out
+
+
+def read_from(path: str, offset: int = 0) -> Iterable[bytes]:
+    """Decompressed bytes of a compressed segment from `offset` on, in chunks.
+
+    With the .idx sidecar only the member holding `offset` and those after
+    it are read; without it the file is decompressed from the start.
+    """
+    start_raw = start_gz = 0
+    try:
+        with open(str(path) + ".idx", "r", encoding="utf-8") as f:
+            for raw_off, gz_off in json.load(f)["members"]:
+                if raw_off > offset:
+                    break
+                start_raw, start_gz = raw_off, gz_off
+    except (OSError, ValueError, KeyError):
+        pass
+    skip = offset - start_raw
+    with open(path, "rb") as f:
+        f.seek(start_gz)
+        d = zlib.decompressobj(wbits=31)
+        while True:
+            buf = f.read(1 << 16)
+            if not buf:
+                break
+            while buf:
+                data, buf = d.decompress(buf), b""
+                if d.eof:  # the rest belongs to the next member
+                    buf = d.unused_data
+                    d = zlib.decompressobj(wbits=31)
+                if skip:
+                    cut = min(skip, len(data))
+                    data, skip = data[cut:], skip - cut
+                if data:
+                    yield data
+
+
+def open_log(path) -> IO[str]:
+    """Text stream of an NDJSON log, plain or compressed."""
+    if str(path).endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+class LogRetention:
+    """Compresses closed segments and enforces per-class quotas on a worker thread.
+
+    `classes` maps a name to (directory, glob patterns, quota bytes); a quota
+    of 0 means unlimited. `protect()` returns paths that are still being
+    written and must not be touched. Files are pruned as units (see above),
+    oldest last write first; `on_prune(class, paths, bytes)` is called with
+    each unit before it is deleted.
+    """
+
+    def __init__(self, classes: Dict[str, Tuple[str, Sequence[str], int]], compress: bool = True,
+                 protect: Optional[Callable[[], Iterable[str]]] = None, member_bytes: int = 1 << 20,
+                 on_prune: Optional[Callable[[str, List[str], int], None]] = None):
+        self.classes = {name: (pathlib.Path(d), tuple(pats), int(q)) for name, (d, pats, q) in classes.items()}
+        self.compress = bool(compress)
+        self.protect = protect or (lambda: ())
+        self.on_prune = on_prune
+        self.member_bytes = int(member_bytes)
+        self.compressed_in = self.compressed_out = 0
+        self.deleted_files = self.deleted_bytes = 0
+        self.errors = 0
+        self._q: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._last: Optional[Tuple[float, int, int, int]] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="log-retention", daemon=True)
+            self._thread.start()
+
+    def closed(self, path: str) -> None:
+        """A segment will not be written again: compress it (if enabled), then check quotas."""
+        self._q.put(str(path))
+
+    def enforce(self) -> None:
+        self._q.put(None)
+
+    def _run(self):
+        while True:
+            item = self._q.get()
+            try:
+                if item is _STOP:
+                    return
+                if item is not None and self.compress and os.path.exists(item):
+                    n_in, n_out = compress_segment(item, self.member_bytes)
+                    self.compressed_in += n_in
+                    self.compressed_out += n_out
+                self._enforce()
+            except Exception:
+                self.errors += 1
+            finally:
+                self._q.task_done()
+
+    def _enforce(self) -> None:
+        protected = set()
+        for p in self.protect():
+            try:
+                protected.add(os.stat(p).st_ino)
+            except OSError:
+                pass
+        for name, (d, patterns, quota) in self.classes.items():
+            if quota <= 0 or not d.is_dir():
+                continue
+            units = _units(d, patterns)
+            total = sum(sum(u[1].values()) for u in units)
+            for mtime, inodes, names in sorted(units, key=lambda u: u[0]):
+                if total <= quota:
+                    break
+                if protected.intersection(inodes):
+                    continue
+                size = sum(inodes.values())
+                if self.on_prune is not None:
+                    try:
+                        self.on_prune(name, sorted(str(p) for p in names), size)
+                    except Exception:
+                        self.errors += 1
+                for p in names:
+                    try:
+                        p.unlink()
+                    except FileNotFoundError:
+                        pass
+                    except OSError:
+                        self.errors += 1
+                total -= size
+                self.deleted_files += 1
+                self.deleted_bytes += size
+
+    def flush(self) -> None:
+        """Block until queued compressions and quota passes are done."""
+        self._q.join()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._q.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def volume(self, written_bytes: int) -> dict:
+        """Bytes written (from the logger's counter) and compressed per hour since the last call."""
+        now = time.monotonic()
+        cur = (now, int(written_bytes), self.compressed_in, self.compressed_out)
+        prev, self._last = self._last, cur
+        out = {"written_bytes": cur[1], "compressed_in": cur[2], "compressed_out": cur[3],
+               "deleted_files": self.deleted_files, "deleted_bytes": self.deleted_bytes,
+               "errors": self.errors}
+        if prev is not None and now > prev[0]:
+            per_h = 3600.0 / (now - prev[0])
+            out.update(written_per_hour=int((cur[1] - prev[1]) * per_h),
+                       compressed_in_per_hour=int((cur[2] - prev[2]) * per_h),
+                       compressed_out_per_hour=int((cur[3] - prev[3]) * per_h))
+        return out
+
+
+def _units(d: pathlib.Path, patterns: Sequence[str]) -> List[Tuple[float, Dict[int, int], set]]:
+    """Files in `d` matching `patterns`, grouped into units pruned together.
+
+    Names sharing the part before the first dot, or an inode, are one unit:
+    (newest mtime, {inode: size}, paths).
+    """
+    parent: Dict[str, str] = {}
+
+    def find(k: str) -> str:
+        while parent[k] != k:
+            parent[k] = parent[parent[k]]
+            k = parent[k]
+        return k
+
+    files = {}
+    by_ino: Dict[int, str] = {}
+    for pat in patterns:
+        for p in d.glob(pat):
+            if p in files or p.name.endswith(".tmp") or p.is_symlink() or not p.is_file():
+                continue
+            st = p.stat()
+            stem = p.name.split(".", 1)[0]
+            files[p] = (stem, st)
+            parent.setdefault(stem, stem)
+            other = by_ino.setdefault(st.st_ino, stem)
+            parent[find(stem)] = find(other)
+    units: Dict[str, list] = {}
+    for p, (stem, st) in files.items():
+        u = units.setdefault(find(stem), [0.0, {}, set()])
+        u[0] = max(u[0], st.st_mtime)
+        u[1][st.st_ino] = st.st_size
+        u[2].add(p)
+    return [tuple(u) for u in units.values()]
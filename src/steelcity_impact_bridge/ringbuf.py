@@ -0,0 +1,68 @@
+from __future__ import annotations
+from typing import Optional
+
+import numpy as np
+
+# One BT50 sample as kept by the bridge: arrival/acquisition time plus the
+# amplitude proxy and the three velocity channels (mm/s).
+SAMPLE_DTYPE = np.dtype([
+    ("ts_ns", "<i8"),
+    ("amp", "<f4"),
+    ("vx", "<f4"),
+    ("vy", "<f4"),
+    ("vz", "<f4"),
+])
+
+
+class SampleRing:
+    """Fixed-capacity per-sensor sample history with zero-copy window views.
+
+    Every sample is written twice, at slot i and i + capacity, so any run of
+    up to `capacity` most recent samples is a single contiguous slice of the
+    backing array. Samples are addressed by their absolute sequence number
+    (0 for the first sample ever appended); `total` is the next one.
+    Memory use is fixed at 2 * capacity * SAMPLE_DTYPE.itemsize bytes.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = int(capacity)
+        self._buf = np.zeros(2 * self.capacity, dtype=SAMPLE_DTYPE)
+        self.total = 0
+
+    def __len__(self) -> int:
+        return min(self.total, self.capacity)
+
+    def append(self, ts_ns: int, amp: float, vx: float, vy: float, vz: float) -> None:
+        i = self.total % self.capacity
+        rec = (ts_ns, amp, vx, vy, vz)
+        self._buf[i] = rec
+        self._buf[i + self.capacity] = rec
+        self.total += 1
+
+    @property
+    def oldest(self) -> int:
+        """Sequence number of the oldest sample still held."""
+        return max(0, self.total - self.capacity)
+
+    def view(self, start: int, stop: Optional[int] = None) -> np.ndarray:
+        """Samples with sequence numbers [start, stop) as a read-only view.
+
+        The range is clipped to what the ring still holds. The view aliases
+        the ring, so consume it before appending another `capacity` samples.
+        """
+        stop = self.total if stop is None else min(int(stop), self.total)
+        start = max(int(start), self.oldest)
+        if start >= stop:
+            out = self._buf[:0]
+        else:
+            s = start % self.capacity
+            out = self._buf[s:s + (stop - start)]
+        out = out.view()
+        out.flags.writeable = False
+        return out
+
+    def latest(self, n: int) -> np.ndarray:
+        """The n most recent samples (fewer if the ring holds fewer)."""
+        return self.view(self.total - n)
@@ -0,0 +1,364 @@
+"""Extra destinations for log records, each behind its own bounded queue.
+
+NdjsonLogger stays the front door: it applies rate limits and the
+regular-mode filter, numbers the record, writes the NDJSON files, and
+then offers the record to every attached sink as an event tuple
+
+    (seq, ts, session_id, record)    ts = time.time() at write()
+
+offer() never blocks. Each sink has a queue of `queue_size` events and a
+worker thread that hands them to emit() in batches of up to `batch_size`,
+collected for at most `batch_interval_s` after the first one. When the
+queue is full, `policy` decides what is lost: "drop_new" refuses the
+incoming event, "drop_oldest" evicts the oldest queued one. Either way
+the count shows up in stats(), so a slow consumer costs records in that
+sink only, never time on the caller (BLE callbacks on the event loop) or
+records in the other sinks. SqliteSink writes the ingest tools' `events`
+table directly.
+
+Sinks see what the main file gets; one built with `debug=True` also gets
+what only the debug file takes. Records must not be mutated after write().
+"""
+from __future__ import annotations
+import collections, json, os, queue, socket, sqlite3, threading, time
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+from .logs import RecordEncoder
+
+_STOP = object()  # worker shutdown sentinel
+
+POLICIES = ("drop_new", "drop_oldest")
+
+Event = Tuple[int, float, str, dict]
+
+
+def flat_record(event: Event, pid: int = -1) -> dict:
+    """The record with its stamp fields, and its wall time as ts_ms."""
+    seq, ts, session_id, obj = event
+    rec = dict(obj)
+    rec.setdefault("seq", seq)
+    rec.setdefault("schema", "v1")
+    rec.setdefault("session_id", session_id)
+    rec.setdefault("pid", pid)
+    rec["ts_ms"] = round(ts * 1000.0, 3)
+    return rec
+
+
+class Sink:
+    """Bounded queue and batching worker; subclasses implement emit() (and open()/close()).
+
+    open(), emit() and close() all run on the worker thread, so a sink can
+    keep thread-bound resources (an SQLite connection). An exception from
+    emit() loses that batch, counted in `failed` and `errors`.
+    """
+
+    kind = "sink"
+
+    def __init__(self, name: Optional[str] = None, queue_size: int = 10000, batch_size: int = 500,
+                 batch_interval_s: float = 0.05, policy: str = "drop_new", debug: bool = False):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown drop policy {policy!r} (expected one of {POLICIES})")
+        self.name = name or self.kind
+        self.batch_size = max(1, int(batch_size))
+        self.batch_interval_s = float(batch_interval_s)
+        self.policy = policy
+        self.debug = bool(debug)
+        self.offered = self.written = self.dropped = self.failed = 0
+        self.batches = self.errors = 0
+        self.high_water = 0
+        self.last_error: Optional[str] = None
+        self._q: "queue.Queue" = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._thread: Optional[threading.Thread] = threading.Thread(
+            target=self._run, name=f"sink-{self.name}", daemon=True)
+        self._thread.start()
+
+    def offer(self, event: Event) -> bool:
+        """Queue one event without blocking; False if it (or, with drop_oldest, another) was dropped."""
+        self.offered += 1
+        if self._thread is None:
+            self.dropped += 1
+            return False
+        q = self._q
+        try:
+            q.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            if self.policy == "drop_new":
+                return False
+            try:
+                q.get_nowait()
+                q.task_done()
+            except queue.Empty:
+                pass
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                pass  # the worker cannot have refilled it; another producer did
+            return False
+        n = q.qsize()
+        if n > self.high_water:
+            self.high_water = n
+        return True
+
+    def open(self) -> None:
+        pass
+
+    def emit(self, batch: List[Event]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def _run(self):
+        q = self._q
+        try:
+            self.open()
+        except Exception as e:
+            self.errors += 1
+            self.last_error = f"open: {e}"
+        stopping = False
+        while not stopping:
+            item = q.get()
+            batch: List[Event] = []
+            taken = 1
+            if item is _STOP:
+                stopping = True
+            else:
+                batch.append(item)
+                deadline = time.monotonic() + self.batch_interval_s
+                while len(batch) < self.batch_size:
+                    try:
+                        item = q.get_nowait()
+                    except queue.Empty:
+                        timeout = deadline - time.monotonic()
+                        if timeout <= 0:
+                            break
+                        try:
+                            item = q.get(timeout=timeout)
+                        except queue.Empty:
+                            break
+                    taken += 1
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+            if batch:
+                try:
+                    self.emit(batch)
+                    self.written += len(batch)
+                    self.batches += 1
+                except Exception as e:
+                    self.failed += len(batch)
+                    self.errors += 1
+                    self.last_error = str(e)
+            for _ in range(taken):
+                q.task_done()
+        try:
+            self.close()
+        except Exception as e:
+            self.errors += 1
+            self.last_error = f"close: {e}"
+
+    def flush(self) -> None:
+        """Block until every event queued so far has been emitted (or failed)."""
+        self._q.join()
+
+    def stop(self) -> None:
+        """Emit what is queued, close the sink and stop its thread; later offers are dropped."""
+        if self._thread is not None:
+            self._q.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> dict:
+        out = {"written": self.written, "dropped": self.dropped, "failed": self.failed,
+               "queued": self._q.qsize(), "high_water": self.high_water,
+               "batches": self.batches, "errors": self.errors}
+        if self.last_error is not None:
+            out["last_error"] = self.last_error
+        return out
+
+
+class MemorySink(Sink):
+    """Keeps the last `capacity` events in memory, for tests and debugging."""
+
+    kind = "memory"
+
+    def __init__(self, capacity: int = 10000, **kw):
+        self.events: Deque[Event] = collections.deque(maxlen=int(capacity))
+        super().__init__(**kw)
+
+    def emit(self, batch: List[Event]) -> None:
+        self.events.extend(batch)
+
+    def records(self) -> List[dict]:
+        """The held events as flat records (see flat_record), oldest first."""
+        pid = os.getpid()
+        return [flat_record(e, pid) for e in list(self.events)]
+
+
+def _parse_address(address: Union[str, Tuple[str, int]]) -> Tuple[int, Any]:
+    """(socket family, sendto address) for "host:port", (host, port), "unix:/path" or "/path"."""
+    if isinstance(address, (tuple, list)):
+        return socket.AF_INET, (str(address[0]), int(address[1]))
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[5:]
+    if address.startswith("/"):
+        return socket.AF_UNIX, address
+    host, sep, port = address.rpartition(":")
+    if not sep:
+        raise ValueError(f"datagram address {address!r} is neither host:port nor a socket path")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+class DatagramSink(Sink):
+    """Publishes records as NDJSON datagrams on a local UDP port or Unix datagram socket.
+
+    Fire and forget: lines are packed into datagrams of up to `max_datagram`
+    bytes and sent without blocking. With nobody listening (or a listener
+    that falls behind) the datagrams are lost and counted in `unsent`,
+    which is not an error. Records carry their stamp fields and ts_ms.
+    """
+
+    kind = "datagram"
+
+    def __init__(self, address: Union[str, Tuple[str, int]], max_datagram: int = 32768, **kw):
+        self.family, self.address = _parse_address(address)
+        self.max_datagram = int(max_datagram)
+        self.pid = os.getpid()
+        self.encoder = RecordEncoder()
+        self.datagrams = self.unsent = 0
+        self._sock: Optional[socket.socket] = None
+        super().__init__(**kw)
+
+    def open(self) -> None:
+        self._sock = socket.socket(self.family, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+
+    def emit(self, batch: List[Event]) -> None:
+        line, pid = self.encoder.line, self.pid
+        buf: List[bytes] = []
+        size = count = 0
+        for e in batch:
+            b = line(flat_record(e, pid))
+            if buf and size + len(b) > self.max_datagram:
+                self._send(buf, count)
+                buf, size, count = [], 0, 0
+            buf.append(b)
+            size += len(b)
+            count += 1
+        if buf:
+            self._send(buf, count)
+
+    def _send(self, lines: List[bytes], count: int) -> None:
+        try:
+            self._sock.sendto(b"".join(lines), self.address)
+            self.datagrams += 1
+        except OSError as e:  # no listener, its buffer is full, or the datagram is too big
+            self.unsent += count
+            self.last_error = str(e)
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def stats(self) -> dict:
+        out = super().stats()
+        out.update(datagrams=self.datagrams, unsent=self.unsent)
+        return out
+
+
+# The `events` table of tools/ingest_follow.py and tools/ingest_sqlite.py
+EVENTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+  id INTEGER PRIMARY KEY,
+  seq INTEGER NOT NULL,
+  ts_ms REAL NOT NULL,
+  type TEXT NOT NULL,
+  msg TEXT,
+  plate TEXT,
+  t_rel_ms REAL,
+  session_id TEXT,
+  pid INTEGER,
+  schema TEXT,
+  data_json TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_session ON events(session_id);
+CREATE INDEX IF NOT EXISTS idx_events_type ON events(type);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON events(ts_ms);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_events_sess_seq ON events(session_id, seq);
+"""
+
+_INSERT = ("INSERT OR IGNORE INTO events(seq, ts_ms, type, msg, plate, t_rel_ms, session_id, pid, "
+           "schema, data_json) VALUES(?,?,?,?,?,?,?,?,?,?)")
+
+
+class SqliteSink(Sink):
+    """Inserts records into the `events` table of an SQLite database, one transaction per batch.
+
+    Same schema and (session_id, seq) de-duplication as the ingest tools, so
+    the database can be shared with them, but ts_ms is the record's real
+    wall time at write() rather than when a follower got to it. The
+    connection lives on the worker thread, in WAL mode; with the default
+    batching a transaction commits every 50 ms or 500 rows, whichever first.
+    """
+
+    kind = "sqlite"
+
+    def __init__(self, path: str, **kw):
+        self.path = str(path)
+        self.pid = os.getpid()
+        self._conn: Optional[sqlite3.Connection] = None
+        super().__init__(**kw)
+
+    def open(self) -> None:
+        d = os.path.dirname(self.path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # durable at checkpoints; WAL keeps it consistent
+        conn.executescript(EVENTS_SCHEMA)
+        self._conn = conn
+
+    def emit(self, batch: List[Event]) -> None:
+        if self._conn is None:
+            self.open()  # the first attempt failed (e.g. the card was busy); try again
+        pid, dumps = self.pid, json.dumps
+        rows = []
+        for seq, ts, session_id, obj in batch:
+            t_rel = obj.get("t_rel_ms")
+            rows.append((seq, ts * 1000.0, str(obj.get("type")), obj.get("msg"), obj.get("plate"),
+                         None if t_rel is None else float(t_rel), session_id, pid,
+                         obj.get("schema", "v1"),
+                         dumps(obj.get("data", {}), separators=(",", ":"), default=str)))
+        with self._conn:  # one transaction; rolled back if any row fails
+            self._conn.executemany(_INSERT, rows)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def build_sink(spec: Dict[str, Any]) -> Sink:
+    """A sink from its config entry: {kind: sqlite|udp|unix|memory, ...options}."""
+    opts = dict(spec)
+    kind = opts.pop("kind", None)
+    if kind in ("udp", "unix"):
+        address = opts.pop("address", None)
+        if not address:
+            raise ValueError(f"{kind} sink needs an address")
+        if kind == "unix" and not str(address).startswith(("unix:", "/")):
+            address = "unix:" + str(address)
+        opts.setdefault("name", kind)
+        return DatagramSink(address, **opts)
+    if kind == "sqlite":
+        path = opts.pop("path", None)
+        if not path:
+            raise ValueError("sqlite sink needs a path")
+        return SqliteSink(path, **opts)
+    if kind == "memory":
+        return MemorySink(**opts)
+    raise ValueError(f"unknown sink kind {kind!r}")
@@ -0,0 +1,363 @@
+"""Detector parameter sweep: many HitDetector configurations over one trace at once.
+
+    python -m steelcity_impact_bridge.sweep LOG [-g grid.yaml] [--top 20] [--json out.json]
+
+LOG is a debug NDJSON session as read by the replay engine; the amplitude
+trace comes from the continuous raw archive (logs/raw) when it covers the
+session, else from its capture windows / buffer dumps, and the labelled
+shots from its SHOT_RAW records. A trace is split wherever consecutive
+samples are more than `gap_ms` apart (separate capture windows, a
+reconnect) and each piece is run on its own, from a fresh detector; only
+shots inside a piece can be found, so shots outside all of them are left
+out of the score. Each combination is scored by precision, recall and the
+mean shot-to-detection latency, and the table is ranked by F1.
+
+The sweep models the stream-mode detector (every sample fed with the
+nominal sample period). For a given min_amp the idle baseline, and so the
+power ratio, does not depend on the detector state, so a run reduces to
+jumps: next trigger at or after the allowed index, then the first release
+far enough into the ring. Those "first index >= a whose value >= h" lookups
+are answered for every combination together from max segment trees stacked
+per min_amp, one hit per round, so a round costs O(log T) array operations
+over the parameter axis. Results match HitDetector.update sample for sample.
+"""
+from __future__ import annotations
+import argparse, itertools, json, pathlib, sys
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .detector import DetectorParams, _accumulate, _first_reach, _gated_ema, _min_ring_count
+
+# Swept DetectorParams fields, in table order
+AXES = ("triggerHigh", "triggerLow", "ring_min_ms", "dead_time_ms", "warmup_ms", "min_amp", "baseline_min")
+
+DEFAULT_GRID = {
+    "triggerHigh": [2.0, 4.0, 8.0, 16.0, 32.0, 64.0],
+    "triggerLow": [0.5, 1.0, 2.0, 4.0],
+    "ring_min_ms": [10, 30, 60],
+    "dead_time_ms": [50, 100, 200, 400],
+    "warmup_ms": [300],
+    "min_amp": [0.5, 1.0, 2.0, 5.0, 10.0],
+    "baseline_min": [1e-4],
+}
+
+
+def expand_grid(axes: Dict[str, Sequence[float]]) -> Dict[str, np.ndarray]:
+    """Cartesian product of the given axes; missing ones take DetectorParams defaults."""
+    names = list(AXES)
+    values = [list(axes.get(k, [getattr(DetectorParams, k)])) for k in names]
+    combos = np.array(list(itertools.product(*values)), dtype=np.float64).reshape(-1, len(names))
+    return {k: combos[:, i] for i, k in enumerate(names)}
+
+
+class _MaxTrees:
+    """One max segment tree per row of `values`, laid out heap-style in a 2-D array."""
+
+    def __init__(self, values: np.ndarray):
+        rows, n = values.shape
+        size = 1
+        while size < max(1, n):
+            size *= 2
+        tree = np.full((rows, 2 * size), -np.inf)
+        tree[:, size:size + n] = values
+        lo = size
+        while lo > 1:
+            hi, lo = lo, lo // 2
+            np.maximum(tree[:, 2 * lo:2 * hi:2], tree[:, 2 * lo + 1:2 * hi:2], out=tree[:, lo:hi])
+        self.size = size
+        self.n = n
+        self._flat = tree.ravel()
+        self._levels = size.bit_length()
+
+    def first_at_least(self, row: np.ndarray, start: np.ndarray, h: np.ndarray) -> np.ndarray:
+        """Per query, the first index >= start in `row` whose value is >= h, else -1."""
+        size, flat = self.size, self._flat
+        base = row * (2 * size)
+        out = np.full(start.shape, -1, dtype=np.int64)
+        done = start >= self.n
+        node = size + np.minimum(start, self.n - 1)
+        found = np.zeros(start.shape, dtype=bool)
+        # Climb: test the node, else move to the next subtree to its right
+        for _ in range(2 * self._levels + 2):
+            pend = np.flatnonzero(~done)
+            if not pend.size:
+                break
+            nd = node[pend]
+            hit = flat[base[pend] + nd] >= h[pend]
+            found[pend[hit]] = True
+            done[pend[hit]] = True
+            mv = pend[~hit]
+            m = node[mv] + 1
+            m //= m & -m
+            node[mv] = m
+            done[mv[m == 1]] = True  # ran off the right end
+        # Descend to the leftmost qualifying leaf
+        q = np.flatnonzero(found)
+        for _ in range(self._levels):
+            inner = q[node[q] < size]
+            if not inner.size:
+                break
+            left = 2 * node[inner]
+            go_left = flat[base[inner] + left] >= h[inner]
+            node[inner] = np.where(go_left, left, left + 1)
+        out[q] = node[q] - size
+        return out
+
+
+def run_grid(amps, dt_ms: float, params: Dict[str, np.ndarray],
+             max_hits: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Run every parameter combination over `amps` (one sample per dt_ms).
+
+    Returns (combo, onset, close, saturated): for each hit the combination
+    index, the sample index that opened the ring and the one that closed it,
+    ordered by combination then time; and a per-combination flag set when
+    the run stopped at max_hits.
+    """
+    a = np.ascontiguousarray(amps, dtype=np.float64).ravel()
+    dt = float(dt_ms)
+    if dt <= 0:
+        raise ValueError("dt_ms must be > 0")
+    n = a.size
+    P = int(params["triggerHigh"].size)
+    env = np.abs(a)
+    sq = a * a
+    elapsed = _accumulate(0.0, dt, n) if n else np.empty(0)
+
+    # Per min_amp group: baseline, power ratio and the two trees queried per round
+    amp_vals, group = np.unique(params["min_amp"], return_inverse=True)
+    G = amp_vals.size
+    idle = np.empty((G, n))
+    trig = np.empty((G, n))
+    rel = np.empty((G, n))
+    for g, m in enumerate(amp_vals.tolist()):
+        idle[g] = _gated_ema(sq, env <= m * 2.0, 1e-6)
+        ratio = sq / (idle[g] + 1e-9)
+        trig[g] = np.where(env >= m, ratio, -np.inf)
+        np.negative(ratio, out=rel[g])  # ratio <= low  <=>  -ratio >= -low
+    idle_t, trig_t, rel_t = _MaxTrees(idle), _MaxTrees(trig), _MaxTrees(rel)
+
+    # Per combination constants, with the scalar detector's rounding
+    warm = np.searchsorted(elapsed, params["warmup_ms"], side="left")
+    armed = idle_t.first_at_least(group, warm, params["baseline_min"])
+    armed[armed < 0] = n
+    ring_min, dead = {}, {}
+    min_count = np.empty(P, dtype=np.int64)
+    k_dead = np.empty(P, dtype=np.int64)
+    for i, (rm, dd) in enumerate(zip(params["ring_min_ms"].tolist(), params["dead_time_ms"].tolist())):
+        if rm not in ring_min:
+            c = _min_ring_count(rm, dt)
+            ring_min[rm] = n + 1 if c is None else c
+        if dd not in dead:
+            k = _first_reach(0.0, dt, dd, n + 1)
+            dead[dd] = n + 1 if k is None else k
+        min_count[i], k_dead[i] = ring_min[rm], dead[dd]
+    high, low = params["triggerHigh"], -params["triggerLow"]
+
+    combos, onsets, closes = [], [], []
+    saturated = np.zeros(P, dtype=bool)
+    idx = np.arange(P)
+    allowed = armed.copy()
+    count = np.zeros(P, dtype=np.int64)
+    while idx.size:
+        s = trig_t.first_at_least(group[idx], allowed[idx], high[idx])
+        keep = s >= 0
+        idx, s = idx[keep], s[keep]
+        j = rel_t.first_at_least(group[idx], s + np.maximum(1, min_count[idx] - 1), low[idx])
+        keep = j >= 0  # otherwise the ring is still open at the end of the trace
+        idx, s, j = idx[keep], s[keep], j[keep]
+        combos.append(idx)
+        onsets.append(s)
+        closes.append(j)
+        allowed[idx] = j + k_dead[idx]
+        count[idx] += 1
+        if max_hits is not None:
+            full = count[idx] >= max_hits
+            saturated[idx[full]] = True
+            idx = idx[~full]
+    if combos:
+        c, s, j = np.concatenate(combos), np.concatenate(onsets), np.concatenate(closes)
+        order = np.lexsort((s, c))
+        return c[order], s[order], j[order], saturated
+    e = np.empty(0, dtype=np.int64)
+    return e, e, e, saturated
+
+
+@dataclass
+class SweepScores:
+    params: Dict[str, np.ndarray]
+    hits: np.ndarray
+    true_pos: np.ndarray
+    precision: np.ndarray
+    recall: np.ndarray
+    f1: np.ndarray
+    latency_ms: np.ndarray  # mean shot-to-detection (ring close) time of matched hits
+    saturated: np.ndarray
+    shots: int = 0  # labelled shots scored against
+
+    def ranking(self) -> np.ndarray:
+        """Combination indices, best first: F1, then recall, then latency."""
+        lat = np.where(np.isnan(self.latency_ms), np.inf, self.latency_ms)
+        return np.lexsort((lat, -self.recall, -self.f1, self.saturated))
+
+    def rows(self, top: Optional[int] = None) -> List[dict]:
+        out = []
+        for i in self.ranking()[:top].tolist():
+            row = {k: float(v[i]) for k, v in self.params.items()}
+            row.update(hits=int(self.hits[i]), tp=int(self.true_pos[i]),
+                       precision=round(float(self.precision[i]), 4), recall=round(float(self.recall[i]), 4),
+                       f1=round(float(self.f1[i]), 4),
+                       latency_ms=None if np.isnan(self.latency_ms[i]) else round(float(self.latency_ms[i]), 1),
+                       saturated=bool(self.saturated[i]))
+            out.append(row)
+        return out
+
+
+def score(params: Dict[str, np.ndarray], combo: np.ndarray, onset_ns: np.ndarray, close_ns: np.ndarray,
+          shots_ns: np.ndarray, saturated: Optional[np.ndarray] = None,
+          pre_ms: float = 50.0, post_ms: float = 300.0) -> SweepScores:
+    """Score hits against labelled shot times.
+
+    A hit matches the latest shot at most pre_ms after and post_ms before its
+    onset; each shot counts once per combination (its earliest hit), so
+    extra hits on the same shot lower precision.
+    """
+    P = int(params["triggerHigh"].size)
+    shots = np.sort(np.asarray(shots_ns, dtype=np.int64))
+    S = shots.size
+    hits = np.bincount(combo, minlength=P)
+    k = np.searchsorted(shots, onset_ns + int(pre_ms * 1e6), side="right") - 1
+    ok = (k >= 0) & (onset_ns - shots[np.maximum(k, 0)] <= int(post_ms * 1e6)) if S else np.zeros(combo.size, bool)
+    m = np.flatnonzero(ok)
+    # Earliest hit per (combination, shot): input is time ordered within a combination
+    order = m[np.lexsort((onset_ns[m], combo[m]))]
+    _, first = np.unique(combo[order] * max(S, 1) + k[order], return_index=True)
+    first = order[first]
+    tp = np.bincount(combo[first], minlength=P)
+    lat_sum = np.bincount(combo[first], weights=(close_ns[first] - shots[k[first]]) / 1e6, minlength=P)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        precision = np.where(hits > 0, tp / np.maximum(hits, 1), 0.0)
+        recall = tp / S if S else np.zeros(P)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+        latency = np.where(tp > 0, lat_sum / np.maximum(tp, 1), np.nan)
+    return SweepScores(params, hits, tp, precision, recall, f1, latency,
+                       np.zeros(P, bool) if saturated is None else saturated, S)
+
+
+def segments(ts: np.ndarray, gap_ns: float) -> List[Tuple[int, int]]:
+    """[lo, hi) index ranges of `ts` with no step between samples longer than gap_ns."""
+    cuts = (np.flatnonzero(np.diff(ts) > gap_ns) + 1).tolist()
+    bounds = [0] + cuts + [len(ts)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def covered(shots_ns, spans: Sequence[Tuple[int, int]]) -> np.ndarray:
+    """The shots that fall inside one of the (first_ns, last_ns) spans."""
+    shots = np.sort(np.asarray(shots_ns, dtype=np.int64))
+    inside = np.zeros(shots.size, dtype=bool)
+    for lo, hi in spans:
+        inside[np.searchsorted(shots, lo, "left"):np.searchsorted(shots, hi, "right")] = True
+    return shots[inside]
+
+
+def sweep_traces(traces: Dict[str, Tuple[np.ndarray, np.ndarray]], shots_ns, params: Dict[str, np.ndarray],
+                 max_hits: Optional[int] = None, gap_ms: float = 100.0, **kw) -> SweepScores:
+    """Run the grid over each sensor's (ts_ns, amp) trace and score the union of their hits.
+
+    Each stretch without a gap longer than gap_ms (or 1.5 sample periods)
+    is run separately at the trace's median sample period; shots outside
+    every stretch are not scored. max_hits applies per stretch.
+    """
+    c_all, on_all, cl_all = [], [], []
+    spans = []
+    P = int(params["triggerHigh"].size)
+    sat = np.zeros(P, dtype=bool)
+    for ts, amp in traces.values():
+        if len(ts) < 2:
+            continue
+        dt_ns = float(np.median(np.diff(ts)))
+        for lo, hi in segments(ts, max(gap_ms * 1e6, 1.5 * dt_ns)):
+            if hi - lo < 2:
+                continue
+            c, s, j, sat_s = run_grid(amp[lo:hi], dt_ns / 1e6, params, max_hits=max_hits)
+            c_all.append(c)
+            on_all.append(ts[lo + s])
+            cl_all.append(ts[lo + j])
+            sat |= sat_s
+            spans.append((int(ts[lo]), int(ts[hi - 1])))
+    shots = covered(shots_ns, spans)
+    if not c_all:
+        e = np.empty(0, dtype=np.int64)
+        return score(params, e, e, e, shots, sat, **kw)
+    return score(params, np.concatenate(c_all), np.concatenate(on_all), np.concatenate(cl_all),
+                 shots, sat, **kw)
+
+
+def load_session(log: pathlib.Path, session_id: Optional[str] = None, buffer_roots: Sequence[str] = ()):
+    """(traces, shots_ns) from a recorded session: per-sensor (ts_ns, amp) and SHOT_RAW times."""
+    from .replay import _SAMPLE_MSGS, archive_samples, bt50_samples, read_sessions
+    sessions = read_sessions(log)
+    if session_id is None:
+        # The session with the most recorded sample windows
+        session_id = max(sessions, key=lambda k: sum(r.get("msg") in _SAMPLE_MSGS for r in sessions[k]))
+    recs = sessions[session_id]
+    roots = [pathlib.Path(p) for p in buffer_roots] + [log.parent, log.parent.parent]
+    samples, anchors = bt50_samples(recs, roots)
+    # The continuous archive, where there is one, replaces the capture windows
+    samples.update(archive_samples(recs, roots, anchors))
+    traces = {sid: (rows[:, 0].astype(np.int64), np.sqrt((rows[:, 1:4] ** 2).sum(axis=1)))
+              for sid, rows in samples.items()}
+    shots = sorted({int(round(float(r["data"]["timestamp_ms"]) * 1e6)) for r in recs
+                    if r.get("msg") == "SHOT_RAW" and (r.get("data") or {}).get("timestamp_ms") is not None})
+    return traces, np.array(shots, dtype=np.int64)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m steelcity_impact_bridge.sweep",
+                                 description="Rank detector settings against a recorded session's AMG shots")
+    ap.add_argument("log", help="debug NDJSON of the session")
+    ap.add_argument("-s", "--session", help="session_id (default: the one with the most BT50 data)")
+    ap.add_argument("-g", "--grid", help="YAML mapping of DetectorCfg field -> list of values")
+    ap.add_argument("--top", type=int, default=20)
+    ap.add_argument("--pre-ms", type=float, default=50.0, help="hit onset may precede the shot by this much")
+    ap.add_argument("--post-ms", type=float, default=300.0, help="and follow it by up to this much")
+    ap.add_argument("--max-hits", type=int, default=None,
+                    help="stop a combination after this many hits (default: 4 x shots + 20)")
+    ap.add_argument("--buffers", action="append", default=[], help="extra capture/buffer_detail directory")
+    ap.add_argument("--json", help="write the full ranked table here")
+    a = ap.parse_args(argv)
+
+    axes = DEFAULT_GRID
+    if a.grid:
+        import yaml
+        with open(a.grid, "r", encoding="utf-8") as f:
+            axes = {k: (v if isinstance(v, list) else [v]) for k, v in (yaml.safe_load(f) or {}).items()}
+        unknown = set(axes) - set(AXES)
+        if unknown:
+            print(f"unknown grid fields: {sorted(unknown)}", file=sys.stderr)
+            return 2
+    params = expand_grid(axes)
+    traces, shots = load_session(pathlib.Path(a.log), a.session, a.buffers)
+    if not traces or not shots.size:
+        print("session has no BT50 dumps or no SHOT_RAW labels", file=sys.stderr)
+        return 2
+    max_hits = a.max_hits if a.max_hits is not None else 4 * int(shots.size) + 20
+    res = sweep_traces(traces, shots, params, max_hits=max_hits, pre_ms=a.pre_ms, post_ms=a.post_ms)
+    rows = res.rows()
+    if a.json:
+        with open(a.json, "w", encoding="utf-8") as f:
+            json.dump({"combinations": len(rows), "shots": int(shots.size), "shots_covered": res.shots,
+                       "ranking": rows}, f, indent=1)
+    if res.shots < shots.size:
+        print(f"{shots.size - res.shots} of {shots.size} shots fall outside the recorded samples "
+              "and are not scored", file=sys.stderr)
+    cols = list(AXES) + ["hits", "tp", "precision", "recall", "f1", "latency_ms"]
+    print("  ".join(cols))
+    for row in rows[:a.top]:
+        print("  ".join(str(row[c]) for c in cols) + ("  (capped)" if row["saturated"] else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
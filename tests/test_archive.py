@@ -0,0 +1,111 @@
+import struct
+
+import numpy as np
+
+from steelcity_impact_bridge.archive import (
+    ArchiveReader, RawArchive, RECORD_DTYPE, HEADER_SIZE, SENSOR_ID_MAX, archive_sensor_id, velocities)
+from steelcity_impact_bridge.bridge import Bridge
+from steelcity_impact_bridge.config import AppCfg, AmgCfg, DetectorCfg, LoggingCfg
+
+
+def frame(vx: int, vy: int = 0, vz: int = 0) -> bytes:
+    return bytes([0x55, 0x61]) + struct.pack("<13h", vx, vy, vz, 0, 0, 0, 2500, 0, 0, 0, 0, 0, 0)
+
+
+def write(tmp_path, n, index_every=16, batch=3):
+    arc = RawArchive(str(tmp_path), index_every=index_every, offset_ns=0)
+    for k in range(0, n, batch):
+        ks = range(k, min(n, k + batch))
+        arc.append("P1", [j * 10_000_000 for j in ks], b"".join(frame(j, -j, 7) for j in ks))
+    arc.close()
+    return next(tmp_path.glob("P1_*.bt50raw"))
+
+
+def test_records_round_trip_through_the_mapping(tmp_path):
+    path = write(tmp_path, 100)
+    assert path.stat().st_size == HEADER_SIZE + 100 * RECORD_DTYPE.itemsize
+    with ArchiveReader(str(path)) as rd:
+        assert rd.sensor_id == "P1" and len(rd) == 100
+        assert rd.ts_ns.tolist() == [j * 10_000_000 for j in range(100)]
+        assert bytes(rd.records["frame"][42]) == frame(42, -42, 7)
+        v = velocities(rd.records)
+        assert v[:, 0].tolist() == list(range(100)) and v[5].tolist() == [5, -5, 7]
+        # Views of the file, not copies
+        assert not rd.records.flags.owndata and not v.flags.owndata
+
+
+def test_time_range_matches_a_full_scan(tmp_path):
+    path = write(tmp_path, 1000)
+    with ArchiveReader(str(path)) as rd:
+        assert len(rd.index) == 1000 // 16 + 1
+        ts = np.asarray(rd.ts_ns)
+        for t0, t1 in [(0, 1), (155_000_000, 3_000_000_001), (-5, 10**12), (9_990_000_000, 10**12),
+                       (160_000_000, 160_000_000), (4_000_000_000, 1_000_000_000)]:
+            got = rd.between(t0, t1)["ts_ns"].tolist()
+            assert got == ts[(ts >= t0) & (ts < t1)].tolist()
+
+
+def test_reopening_appends_after_a_torn_record(tmp_path):
+    path = write(tmp_path, 40)
+    with open(path, "ab") as f:
+        f.write(b"\x01" * 11)  # crash mid-record
+    arc = RawArchive(str(tmp_path), index_every=16, offset_ns=0)
+    arc.append("P1", [400_000_000, 410_000_000], frame(1) + frame(2))
+    arc.close()
+    with ArchiveReader(str(path)) as rd:
+        assert len(rd) == 42
+        assert rd.ts_ns[-3:].tolist() == [390_000_000, 400_000_000, 410_000_000]
+        assert rd.index["record"].tolist() == [0, 16, 32]
+
+
+def test_flush_puts_queued_frames_on_disk(tmp_path):
+    arc = RawArchive(str(tmp_path), index_every=16, offset_ns=0)
+    for k in range(20):
+        arc.append("P1", [k * 10_000_000], frame(k))
+    arc.flush()
+    path = next(tmp_path.glob("P1_*.bt50raw"))
+    with ArchiveReader(str(path)) as rd:
+        assert len(rd) == 20 and len(rd.index) == 2
+    assert arc.stats()["records"] == 20 and arc.stats()["queued"] == 0
+    assert str(path) in arc.active_paths()
+    arc.close()
+    assert arc.active_paths() == []
+
+
+def test_sensor_ids_are_kept_whole_and_over_long_ones_rejected(tmp_path):
+    sid = "Plate_Ä" * 4  # 32 bytes in UTF-8: cut at 16 it would split the Ä
+    long_sid = "x" * (SENSOR_ID_MAX + 1)
+    arc = RawArchive(str(tmp_path), index_every=16, offset_ns=0)
+    arc.append(long_sid, [0], frame(1))
+    arc.append(sid, [0, 10_000_000], frame(1) + frame(2))
+    arc.close()
+    # The over-long id made no file and did not stop the writer
+    assert arc.stats()["errors"] == 1 and arc.stats()["records"] == 2
+    (path,) = tmp_path.glob("*.bt50raw")
+    assert archive_sensor_id(path) == sid
+    with ArchiveReader(str(path)) as rd:
+        assert rd.sensor_id == sid and len(rd) == 2
+
+
+def test_bridge_archives_every_frame(tmp_path):
+    cfg = AppCfg(AmgCfg(), [], DetectorCfg(), LoggingCfg(dir=str(tmp_path), dual_file=False,
+                                                         raw_archive=True))
+    br = Bridge(cfg)
+    br.captures = None
+    br.detectors["P1"] = br._new_detector()
+    payloads = [frame(k % 5) + frame(k % 3) for k in range(50)]
+    for k, p in enumerate(payloads):
+        br._on_bt50_packet("P1", 1_000_000_000 + k * 20_000_000, p)
+    br.raw_archive.close()
+    path = next((tmp_path / "raw").glob("P1_*.bt50raw"))
+    with ArchiveReader(str(path)) as rd:
+        assert len(rd) == 100
+        assert bytes(rd.records["frame"].tobytes()) == b"".join(payloads)
+        assert (np.diff(rd.ts_ns) > 0).all()
+
+
+def test_bridge_archive_is_opt_in(tmp_path):
+    br = Bridge(AppCfg(AmgCfg(), [], DetectorCfg(), LoggingCfg(dir=str(tmp_path), dual_file=False)))
+    br._on_bt50_packet("P1", 1_000_000_000, frame(3))
+    br.logger.stop()
+    assert br.raw_archive is None and not (tmp_path / "raw").exists()
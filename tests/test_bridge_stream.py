@@ -0,0 +1,147 @@
+import json
+import struct
+
+from steelcity_impact_bridge.bridge import Bridge
+from steelcity_impact_bridge.config import AppCfg, AmgCfg, DetectorCfg, LoggingCfg
+
+
+def frame(vx: int) -> bytes:
+    # 0x55 0x61 header + 13x int16 (VX first, TEMP=25.00C)
+    return bytes([0x55, 0x61]) + struct.pack("<13h", vx, 0, 0, 0, 0, 0, 2500, 0, 0, 0, 0, 0, 0)
+
+
+def make_bridge(tmp_path, mode):
+    cfg = AppCfg(
+        amg=AmgCfg(),
+        sensors=[],
+        detector=DetectorCfg(mode=mode),
+        logging=LoggingCfg(dir=str(tmp_path / "logs"), dual_file=False),
+    )
+    br = Bridge(cfg)
+    br.detectors["P1"] = br._new_detector()
+    return br
+
+
+def records(tmp_path, msg=None):
+    out = []
+    for f in (tmp_path / "logs").glob("bridge_*.ndjson"):
+        for line in f.read_text(encoding="utf-8").splitlines():
+            rec = json.loads(line)
+            if msg is None or rec.get("msg") == msg:
+                out.append(rec)
+    # The daily alias is a hardlink of the same file; de-duplicate by seq
+    return list({r["seq"]: r for r in out}.values())
+
+
+def feed(br, amps, period_ns=10_000_000):
+    for k, v in enumerate(amps):
+        br._on_bt50_packet("P1", k * period_ns, frame(v))
+
+
+def test_stream_mode_emits_hit_when_ring_closes(tmp_path):
+    br = make_bridge(tmp_path, "stream")
+    br.t0_ns = 0
+    quiet = [0, 1] * 30
+    feed(br, quiet + [120, 90, 60, 36, 18, 9, 3] + [0, 1] * 10)
+    hits = records(tmp_path, "HIT")
+    assert len(hits) == 1
+    hit = hits[0]
+    assert hit["plate"] == "P1"
+    assert hit["data"]["peak"] == 120.0
+    # t_rel_ms is the ring onset, not the sample that closed it
+    assert abs(hit["t_rel_ms"] - len(quiet) * 10.0) < 1e-6
+    summary = br._latency_summary()
+    assert summary["mode"] == "stream" and summary["n"] == 1
+    # Ring onset -> HIT is its own stage; "queue" is the peak path's attribution wait
+    stages = br._stages("P1").snapshot()
+    assert stages["ring"]["n"] == 1 and stages["write"]["n"] >= 1
+
+
+def test_buffer_mode_does_not_emit_hit(tmp_path):
+    br = make_bridge(tmp_path, "buffer")
+    feed(br, [0, 1] * 30 + [120, 90, 60, 36, 18, 9, 3] + [0, 1] * 10)
+    assert records(tmp_path, "HIT") == []
+
+
+def test_peak_straddling_windows_is_reported_once(tmp_path):
+    br = make_bridge(tmp_path, "buffer")
+    br.t0_ns = 0
+    # ~10 quiet samples per 100 ms window with a single spike every 25 frames
+    amps = [50 if k % 25 == 12 else 0 for k in range(200)]
+    feed(br, amps)
+    impacts = [r for r in records(tmp_path) if r.get("event_type") == "impact_detected"]
+    peak_ts = sorted(r["raw_data"]["peak_timestamp"] for r in impacts)
+    # Every spike that has been through a window is reported, and only once
+    assert peak_ts == sorted(set(peak_ts))
+    assert len(peak_ts) >= 7
+
+
+def test_peak_is_queued_as_soon_as_it_is_confirmed(tmp_path):
+    br = make_bridge(tmp_path, "buffer")
+    br.bt50_window_samples = 10_000  # no analysis window ever runs
+    br.t0_ns = 0
+    feed(br, [0] * 30 + [50] + [0] * 3)
+    # Confirmed by its third look-ahead frame
+    assert len(br.correlator) == 1
+    # Out once the 20 ms attribution window has been processed past
+    for k in (34, 35):
+        br._on_bt50_packet("P1", k * 10_000_000, frame(0))
+    assert len(br.correlator) == 0
+    impacts = [r for r in records(tmp_path) if r.get("event_type") == "impact_detected"]
+    assert [r["raw_data"]["peak_timestamp"] for r in impacts] == [300_000_000]
+    assert records(tmp_path, "bt50_impact_analysis") == []
+
+
+def test_batched_notifications_feed_every_frame(tmp_path):
+    br = make_bridge(tmp_path, "stream")
+    # Four frames per notification every 40 ms, then one notification split mid-frame
+    for k in range(10):
+        br._on_bt50_packet("P1", (k + 1) * 40_000_000, b"".join(frame(4 * k + j) for j in range(4)))
+    ring = br._bt50_samples["P1"]
+    assert ring.total == 40
+    ts = ring.view(0)["ts_ns"]
+    assert list(ts[:8]) == [k * 10_000_000 for k in range(1, 9)]
+    assert list(ring.view(0)["vx"][:8]) == list(range(8))
+    tail = frame(7) + frame(8)
+    br._on_bt50_packet("P1", 410_000_000, tail[:40])
+    br._on_bt50_packet("P1", 420_000_000, tail[40:])
+    assert ring.total == 42
+    assert list(ring.latest(2)["vx"]) == [7.0, 8.0]
+
+
+def test_neighbouring_plate_is_marked_sympathetic(tmp_path):
+    br = make_bridge(tmp_path, "buffer")
+    br.detectors["P2"] = br._new_detector()
+    br.t0_ns = 0
+    for k in range(120):
+        ts = k * 10_000_000
+        br._on_bt50_packet("P1", ts, frame(80 if k == 50 else 0))
+        br._on_bt50_packet("P2", ts + 2_000_000, frame(30 if k == 50 else 0))
+    recs = records(tmp_path)
+    hits = [r for r in recs if r.get("event_type") == "impact_detected"]
+    sym = [r for r in recs if r.get("event_type") == "impact_sympathetic"]
+    assert [h["sensor_id"] for h in hits] == ["P1"]
+    assert hits[0]["attribution"] == {"role": "primary", "group_size": 2, "sympathetic": ["P2"]}
+    assert hits[0]["string_impact_sequence"] == 1
+    assert [s["sensor_id"] for s in sym] == ["P2"]
+    assert sym[0]["attribution"]["primary_sensor"] == "P1"
+
+
+def test_impact_held_across_t0_stays_in_its_string(tmp_path):
+    br = make_bridge(tmp_path, "buffer")
+    br.detectors["P2"] = br._new_detector()
+    br.t0_ns = 0
+    for k in range(160):
+        ts = k * 10_000_000
+        if k == 70:
+            # The next string starts while the k=50 impact waits on the stalled P2
+            br._on_t0(ts, bytes.fromhex("0105"))
+            assert not [r for r in records(tmp_path) if r.get("event_type") == "impact_detected"]
+        br._on_bt50_packet("P1", ts, frame(80 if k in (50, 120) else 0))
+        if k < 40:
+            br._on_bt50_packet("P2", ts + 2_000_000, frame(0))
+    hits = [r for r in records(tmp_path) if r.get("event_type") == "impact_detected"]
+    assert [round(h["raw_data"]["peak_timestamp"] / 1e6) for h in hits] == [500, 1200]
+    assert [h["string_impact_sequence"] for h in hits] == [1, 1]
+    assert [round(h["t_rel_ms"]) for h in hits] == [500, 500]
+    assert [h["split_time_ms"] for h in hits] == [None, None]
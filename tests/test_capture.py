@@ -0,0 +1,61 @@
+import json
+import pathlib
+import struct
+
+from steelcity_impact_bridge.bridge import Bridge
+from steelcity_impact_bridge.capture import CaptureWindows, CaptureWriter, load_window
+from steelcity_impact_bridge.config import AppCfg, AmgCfg, DetectorCfg, LoggingCfg
+from steelcity_impact_bridge.ringbuf import SampleRing
+
+MS = 1_000_000
+
+
+def fill(ring, start, stop):
+    for k in range(start, stop):
+        ring.append(k * 10 * MS, float(k), float(k), 0.0, 0.0)
+
+
+def test_window_is_cut_once_the_post_trigger_samples_are_in(tmp_path):
+    ring = SampleRing(256)
+    caps = CaptureWindows(CaptureWriter(str(tmp_path)), pre_ns=100 * MS, post_ns=200 * MS)
+    fill(ring, 0, 60)
+    caps.trigger("P1", 500 * MS, "peak")
+    assert caps.poll("P1", ring) is None  # 700 ms not reached yet
+    fill(ring, 60, 71)
+    entry = caps.poll("P1", ring)
+    caps.writer.stop()
+    assert entry["samples"] == 31 and entry["offset"] == 0 and entry["reason"] == "peak"
+    assert (entry["t_first_ns"], entry["t_last_ns"]) == (400 * MS, 700 * MS)
+    rows = load_window(entry["file"], entry["offset"], entry["samples"])
+    assert rows["amp"].tolist() == [float(k) for k in range(40, 71)]
+    index = pathlib.Path(entry["file"]).with_suffix(".idx.ndjson")
+    (line,) = index.read_text().splitlines()
+    assert json.loads(line) == {k: v for k, v in entry.items() if k != "file"}
+
+
+def test_overlapping_triggers_merge_and_samples_are_not_captured_twice(tmp_path):
+    ring = SampleRing(256)
+    caps = CaptureWindows(CaptureWriter(str(tmp_path)), pre_ns=100 * MS, post_ns=200 * MS)
+    fill(ring, 0, 100)
+    caps.trigger("P1", 300 * MS, "peak")
+    caps.trigger("P1", 400 * MS, "hit")
+    first = caps.poll("P1", ring)
+    assert (first["t_first_ns"], first["t_last_ns"], first["triggers"], first["reason"]) == \
+        (200 * MS, 600 * MS, 2, "hit")
+    caps.trigger("P1", 650 * MS, "peak")  # its pre-trigger part is already on disk
+    second = caps.poll("P1", ring)
+    caps.writer.stop()
+    assert second["t_first_ns"] == 610 * MS and second["offset"] == first["samples"] * ring._buf.itemsize
+    assert caps.writer.stats()["written"] == 2
+
+
+def test_quiet_sensor_writes_nothing(tmp_path):
+    cfg = AppCfg(AmgCfg(), [], DetectorCfg(), LoggingCfg(dir=str(tmp_path), dual_file=False,
+                                                        raw_archive=False))
+    br = Bridge(cfg)
+    br.detectors["P1"] = br._new_detector()
+    quiet = bytes([0x55, 0x61]) + struct.pack("<13h", 0, 0, 0, 0, 0, 0, 2500, 0, 0, 0, 0, 0, 0)
+    for k in range(300):
+        br._on_bt50_packet("P1", k * 10 * MS, quiet)
+    assert not (tmp_path / "sensorbuffer").exists()
+    assert br.captures.writer._thread is None
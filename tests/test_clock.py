@@ -0,0 +1,72 @@
+import random
+
+from steelcity_impact_bridge.clock import SampleClock
+
+
+def test_clock_removes_arrival_jitter():
+    rnd = random.Random(3)
+    clock = SampleClock(period_ns=10_000_000)
+    period, offset = 9_987_000, 5_000_000_000
+    k = 0
+    raw_err, fit_err = [], []
+    for i in range(3000):
+        k += rnd.choice([1, 1, 2, 3])  # frames per notification
+        true_ns = offset + period * (k - 1)
+        arrival = true_ns + rnd.randint(2_000_000, 30_000_000)  # BLE delay, never early
+        clock.update(k - 1, arrival)
+        if i >= 200:
+            raw_err.append(arrival - true_ns)
+            fit_err.append(clock.time_of(k - 1) - true_ns)
+    assert abs(clock.period_ns - period) < 2_000
+    spread = lambda xs: max(xs) - min(xs)
+    assert spread(fit_err) < spread(raw_err) / 4
+    # The envelope sits just above the minimum BLE delay
+    assert 0 < sum(fit_err) / len(fit_err) < 5_000_000
+    assert 5.0 < clock.stats()["jitter_ms"] < 12.0
+
+
+def test_clock_resets_after_gap():
+    clock = SampleClock(period_ns=10_000_000, min_fit=4)
+    for k in range(20):
+        clock.update(k, k * 10_000_000)
+    assert clock.time_of(19) == 190_000_000
+    clock.update(20, 5_000_000_000)
+    assert clock.resets == 1 and clock.n == 1
+    assert clock.time_of(20) == 5_000_000_000
+    assert clock.time_of(18) == 4_980_000_000
+
+
+def test_clock_advances_index_over_lost_notifications():
+    rnd = random.Random(5)
+    clock = SampleClock(period_ns=10_000_000)
+    period, offset = 10_003_000, 2_000_000_000
+    true_k = counted = 0
+    last, errs = None, []
+    for i in range(3000):
+        n = rnd.choice([1, 1, 2, 3])
+        true_k += n
+        if i > 100 and rnd.random() < 0.05:
+            continue  # lost over the air: the frame count falls behind
+        counted += n
+        arrival = offset + period * (true_k - 1) + rnd.randint(2_000_000, 6_000_000)
+        idx = clock.update(counted - 1, arrival)
+        times = [clock.time_of(k) for k in range(idx - n + 1, idx + 1)]
+        assert last is None or times[0] >= last
+        assert times == sorted(times)
+        last = times[-1]
+        if i > 200:
+            errs.append(times[-1] - (offset + period * (true_k - 1)))
+    assert clock.skipped == true_k - counted
+    assert max(abs(e) for e in errs) < period / 2
+    assert abs(clock.period_ns - period) < 2_000
+
+
+def test_clock_time_of_never_steps_back():
+    clock = SampleClock(period_ns=10_000_000, min_fit=4)
+    for k in range(20):
+        clock.update(k, 1_000_000 + k * 10_000_000)
+    t19 = clock.time_of(19)
+    # An arrival earlier than the model allows pulls the envelope back 16 ms
+    assert clock.update(20, 185_000_000) == 20
+    assert clock.time_of(20) == t19
+    assert clock.time_of(18) <= t19
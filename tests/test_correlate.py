@@ -0,0 +1,23 @@
+from steelcity_impact_bridge.correlate import ImpactCorrelator, watermark
+
+
+def test_groups_wait_for_watermark_and_pick_strongest():
+    c = ImpactCorrelator(window_ns=20)
+    c.add(100, "P2", 5.0)
+    c.add(108, "P1", 9.0)
+    c.add(115, "P3", 1.0)
+    c.add(200, "P1", 3.0)
+    assert c.flush(119) == []  # window of the first detection still open
+    groups = c.flush(130)
+    assert len(groups) == 1 and len(c) == 1
+    roles = {d.sensor_id: (d.role, d.primary_sensor, d.group_size) for d in groups[0]}
+    assert roles == {"P1": ("primary", "P1", 3), "P2": ("sympathetic", "P1", 3),
+                     "P3": ("sympathetic", "P1", 3)}
+    (last,), = c.flush(None)
+    assert last.role == "primary" and last.group_size == 1
+
+
+def test_watermark_bounds_stalled_sensor():
+    assert watermark({}, 50) is None
+    assert watermark({"P1": 1_000, "P2": 900}, 500) == 900
+    assert watermark({"P1": 1_000, "P2": 100}, 500) == 500
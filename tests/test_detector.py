@@ -1,5 +1,5 @@
 
-from steelcity_impact_bridge.detector import HitDetector, DetectorParams
+from steelcity_impact_bridge.detector import HitDetector, DetectorParams, PeakTracker
 
 def run_stream(samples, dt_ms=10.0):
     params = DetectorParams(
@@ -36,3 +36,107 @@ def test_two_hits_within_deadtime():
     samples = [0.2]*40 + [5.0,4.0,3.0,2.0] + [0.3]*5 + [5.0,4.0,3.0,2.0] + [0.3]*50
     hits = run_stream(samples)
     assert len(hits) == 1
+
+def _impact_stream(n, seed=1):
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    x = rng.normal(0.0, 0.3, n)
+    ring = np.array([6.0, 5.0, 4.0, 3.0, 2.0, 1.5, 1.0, 0.5])
+    for s in rng.integers(50, n - 20, n // 300):
+        x[s:s + 8] += ring * rng.uniform(0.5, 3.0)
+    return x
+
+def _state(d):
+    return (d.state, d.elapsed_ms, d.since_last_hit_ms, d.peak, d.sum_sq, d.count, d.armed)
+
+def _compare_batch_scalar(params, samples, dt_ms, splits):
+    import numpy as np
+    scalar = HitDetector(params)
+    expected = []
+    for i, a in enumerate(samples.tolist()):
+        h = scalar.update(a, dt_ms)
+        if h:
+            expected.append((i, h))
+    batch = HitDetector(params)
+    got, off = [], 0
+    for chunk in np.array_split(samples, splits):
+        got += [(off + i, h) for i, h in batch.update_batch(chunk, dt_ms)]
+        off += len(chunk)
+    assert got == expected
+    assert _state(batch) == _state(scalar)
+    assert abs(batch.idle_rms - scalar.idle_rms) <= 1e-12 * scalar.idle_rms
+    return expected
+
+def test_update_batch_matches_scalar_default_params():
+    samples = _impact_stream(50_000)
+    for dt_ms in (10.0, 7.5, 3.3):
+        hits = _compare_batch_scalar(DetectorParams(), samples, dt_ms, splits=7)
+        assert len(hits) > 50
+
+def test_update_batch_matches_scalar_sensitive_params():
+    # Mirrors the very low thresholds used in config.yaml
+    params = DetectorParams(triggerHigh=0.05, triggerLow=0.01, ring_min_ms=10, dead_time_ms=50,
+                            warmup_ms=2000, baseline_min=1e-6, min_amp=0.01)
+    _compare_batch_scalar(params, _impact_stream(50_000, seed=2), 10.0, splits=1)
+
+def test_update_batch_matches_scalar_long_rings():
+    # Rings several times ring_min_ms long, released well past the first window checked
+    import numpy as np
+    rng = np.random.default_rng(3)
+    x = rng.normal(0.0, 0.3, 80_000)
+    ring = 6.0 * 0.93 ** np.arange(60)
+    for s in rng.integers(50, x.size - 80, x.size // 400):
+        x[s:s + 60] += ring * rng.uniform(0.5, 3.0)
+    hits = _compare_batch_scalar(DetectorParams(), x, 10.0, splits=3)
+    assert max(h["dur_ms"] for _, h in hits) > 200
+
+def test_update_batch_matches_scalar_single_ring_and_nan():
+    # One ring in a chunk is summed on its own; NaN samples are held by the
+    # baseline and passed over by the peak
+    import numpy as np
+    rng = np.random.default_rng(5)
+    x = rng.normal(0.0, 0.3, 3000)
+    x[1000:1040] += 6.0 * rng.uniform(0.5, 1.5, 40) * 0.95 ** np.arange(40)
+    _compare_batch_scalar(DetectorParams(), x, 10.0, splits=1)
+    x[[500, 1010, 2000]] = np.nan
+    hits = [h for _, h in HitDetector(DetectorParams()).update_batch(x, 10.0)]
+    # repr() so that the NaN rms of the ring compares equal
+    assert repr(hits) == repr(run_stream(x.tolist()))
+    assert hits[0]["peak"] > 4.0 and np.isnan(hits[0]["rms"])
+
+def test_update_batch_ring_spans_calls():
+    import numpy as np
+    samples = np.array([0.2]*40 + [5.0] + [4.0,3.0,2.0,1.0] + [0.3]*50)
+    d = HitDetector(DetectorParams())
+    first = d.update_batch(samples[:42], 10.0)
+    assert first == [] and d.state == "ring"
+    rest = d.update_batch(samples[42:], 10.0)
+    assert len(rest) == 1
+    assert rest[0][1] == run_stream(samples.tolist())[0]
+
+def _reference_peaks(amps, threshold=0.5, radius=3):
+    # Whole-array version of the windowed neighbour check the tracker replaces
+    out = []
+    for i, a in enumerate(amps):
+        if a <= threshold:
+            continue
+        lo, hi = max(0, i - radius), min(len(amps), i + radius + 1)
+        if all(amps[j] <= a for j in range(lo, hi) if j != i):
+            out.append(i)
+    return out
+
+def test_peak_tracker_matches_reference_once_confirmed():
+    import random
+    rnd = random.Random(3)
+    amps = [rnd.choice([0.0, 0.2, 0.8, 1.5, 3.0]) for _ in range(2000)]
+    tr = PeakTracker(threshold=0.5, radius=3)
+    found = []
+    for k, a in enumerate(amps):
+        p = tr.update(k * 10, a)
+        if p is not None:
+            # Confirmed exactly three frames after the peak itself
+            assert p["frame_idx"] == k - 3
+            assert p["timestamp"] == p["frame_idx"] * 10
+            found.append(p["frame_idx"])
+    # The last three samples lack look-ahead and are not confirmed yet
+    assert found == [i for i in _reference_peaks(amps) if i < len(amps) - 3]
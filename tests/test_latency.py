@@ -0,0 +1,38 @@
+import random
+
+import numpy as np
+
+from steelcity_impact_bridge.latency import LogLinearHistogram, StageLatency
+
+
+def test_histogram_percentiles_within_bucket_precision():
+    rng = random.Random(3)
+    vals = [int(rng.lognormvariate(7, 1.5)) for _ in range(20000)]
+    h = LogLinearHistogram()
+    for v in vals:
+        h.record(v)
+    assert h.n == len(vals) and h.max_us == max(vals)
+    for q, got in zip((50, 90, 99), h.percentiles((50, 90, 99))):
+        want = np.percentile(vals, q, method="inverted_cdf")
+        assert want <= got <= want * (1 + 1 / 16) + 1
+
+
+def test_histogram_memory_is_fixed_and_small_values_exact():
+    h = LogLinearHistogram()
+    size = h.counts.size
+    for v in (0, 1, 5, 31, 10 ** 12):
+        h.record(v)
+    assert h.counts.size == size
+    assert h.percentiles((20, 40, 60)) == [0, 1, 5]
+    assert h.percentiles((100,)) == [10 ** 12]
+
+
+def test_stage_snapshot_reports_ms_and_clears():
+    st = StageLatency(("parse", "write"))
+    for _ in range(10):
+        st.record("parse", 2_000_000)
+    snap = st.snapshot()
+    assert set(snap) == {"parse"}
+    assert snap["parse"]["n"] == 10 and snap["parse"]["max"] == 2.0
+    assert abs(snap["parse"]["p50"] - 2.0) < 2.0 / 16
+    assert st.snapshot() == {}
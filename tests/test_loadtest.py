@@ -0,0 +1,14 @@
+import asyncio
+
+from steelcity_impact_bridge.loadtest import run_step
+
+
+def test_load_step_runs_bridge_with_fake_clients(tmp_path):
+    r = asyncio.run(run_step(3, duration_s=1.0, warmup_s=0.3, rate_hz=100, batch=2,
+                             burst_every_s=0.4, log_dir=str(tmp_path),
+                             amg={"string_gap_s": 0.05, "shot_every_s": 0.1, "shots": 3}))
+    assert r["sensors"] == 3 and r["offered_pps"] == 150
+    assert r["delivered_pps"] > 100
+    assert r["callback_errors"] == 0
+    assert r["impacts"] > 0 and r["shots"] > 0
+    assert set(r["lag_ms"]) == {"p50", "p90", "p99", "max"}
@@ -0,0 +1,70 @@
+import copy
+import json
+import struct
+
+from steelcity_impact_bridge.bridge import Bridge, LOG_TEMPLATES
+from steelcity_impact_bridge.config import AppCfg, AmgCfg, DetectorCfg, LoggingCfg
+from steelcity_impact_bridge.logs import RecordEncoder
+
+
+def frame(vx: int) -> bytes:
+    return bytes([0x55, 0x61]) + struct.pack("<13h", vx, 0, 0, 0, 0, 0, 2500, 0, 0, 0, 0, 0, 0)
+
+
+def bridge_records(tmp_path):
+    cfg = AppCfg(AmgCfg(), [], DetectorCfg(), LoggingCfg(dir=str(tmp_path), dual_file=False))
+    br = Bridge(cfg)
+    br.captures = None
+    out = []
+    write = br.logger.write
+    br.logger.write = lambda obj, **kw: (out.append(copy.deepcopy(obj)), write(obj, **kw))
+    br.t0_ns = 0
+    for sid in ("P1", "P2"):
+        br.detectors[sid] = br._new_detector()
+    for k in range(400):
+        vx = [120, 80, 40, 10][k % 100] if k % 100 < 4 else k % 2
+        br._on_bt50_packet("P1", k * 10_000_000, frame(vx))
+        br._on_bt50_packet("P2", k * 10_000_000 + 1000, frame(vx // 3))
+    br._emit_impacts(None)
+    return out
+
+
+def test_templates_render_exactly_what_the_generic_encoder_does(tmp_path):
+    recs = bridge_records(tmp_path)
+    for use_orjson in (False, None):
+        plain = RecordEncoder(use_orjson=use_orjson)
+        fast = RecordEncoder(use_orjson=use_orjson)
+        for name, spec in LOG_TEMPLATES.items():
+            fast.register(name, spec)
+        for rec in recs:
+            assert fast.line(rec, None) == plain.line(rec, None)
+        tail = '"seq"' + fast.key_sep + "7}\n"
+        for rec in recs:
+            line = fast.line(rec, tail)
+            assert json.loads(line)["seq"] == 7
+        # every hot type was seen and templated
+        hot = {r.get("msg") for r in recs} | {r.get("event_type") for r in recs}
+        assert set(LOG_TEMPLATES) <= hot
+        if fast.backend == "orjson":
+            assert fast.templated == 0
+            continue
+        assert fast.templated >= len([r for r in recs if r.get("msg") in LOG_TEMPLATES
+                                      or r.get("event_type") in LOG_TEMPLATES])
+
+
+def test_template_falls_back_when_the_record_does_not_match():
+    enc = RecordEncoder(use_orjson=False)
+    enc.register("t", {"msg": "str", "data": {"x": "float", "n": "int?", "ok": "bool"}})
+    good = {"msg": "t", "data": {"x": 1.5, "n": None, "ok": True}}
+    assert enc.line(good) == json.dumps(good).encode() + b"\n"
+    assert enc.templated == 1
+    for bad in (
+        {"msg": "t", "data": {"x": 1.5, "n": None, "ok": True, "extra": 1}},  # extra key
+        {"msg": "t", "data": {"n": None, "x": 1.5, "ok": True}},              # key order
+        {"msg": "t", "data": {"x": 1, "n": None, "ok": True}},                # int for float
+        {"msg": "t", "data": {"x": 1.5, "n": True, "ok": True}},              # bool for int
+        {"msg": "t", "data": {"x": float("nan"), "n": 1, "ok": False}},       # not finite
+        {"msg": "t", "data": None},
+    ):
+        assert enc.line(bad) == json.dumps(bad).encode() + b"\n"
+    assert enc.templated == 1
@@ -0,0 +1,46 @@
+import asyncio, time
+
+from steelcity_impact_bridge.loopstats import CallbackStats, LoopLagProbe
+
+
+def test_callback_stats_count_time_and_over_budget():
+    stats = CallbackStats(budget_ns=2_000_000)
+    fast = stats.wrap("fast", lambda x: x + 1)
+    slow = stats.wrap("slow", lambda: time.sleep(0.005))
+    assert fast(1) == 2
+    fast(2)
+    slow()
+    snap = stats.snapshot()
+    assert snap["fast"]["n"] == 2 and snap["fast"]["over_budget"] == 0
+    assert snap["slow"]["n"] == 1 and snap["slow"]["over_budget"] == 1
+    assert snap["slow"]["max_ms"] >= 5.0
+    # Counters cover one interval only
+    assert stats.snapshot()["slow"]["n"] == 0
+
+
+def test_loop_lag_probe_sees_blocking_callback():
+    async def main():
+        probe = LoopLagProbe(interval_s=0.005, budget_ns=10_000_000)
+        probe.start()
+        await asyncio.sleep(0.05)
+        time.sleep(0.03)  # a callback hogging the loop
+        await asyncio.sleep(0.05)
+        probe.stop()
+        return probe.snapshot()
+    snap = asyncio.run(main())
+    assert snap["n"] > 3
+    assert snap["max_ms"] >= 20.0 and snap["over_budget"] >= 1
+    assert snap["p50_ms"] < snap["max_ms"]
+
+
+def test_loop_lag_tap_keeps_every_sample_across_snapshots():
+    probe = LoopLagProbe(maxlen=4)
+    probe.add(1)
+    probe.tap = tap = []
+    for v in range(10):
+        probe.add(v)
+    probe.snapshot()
+    probe.add(99)
+    probe.tap = None
+    probe.add(7)
+    assert tap == list(range(10)) + [99]
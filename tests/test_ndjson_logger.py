@@ -93,6 +93,20 @@ def test_bt50_buffer_status_whitelist_and_default(tmp_path: Path):
     assert any(json.loads(u).get("msg") == "bt50_buffer_status" for u in unique)
 
 
+def test_regular_mode_keeps_high_rate_status_out_of_debug_file(tmp_path: Path):
+    d = tmp_path / "logs"
+    logger = NdjsonLogger(str(d), "testbridge", dual_file=True)
+    logger.mode = "regular"
+    logger.verbose_whitelist = set()
+    logger.write({"type": "debug", "msg": "bt50_buffer_status", "data": {"current_amp": 3.0}})
+    logger.write({"type": "debug", "msg": "bt50_impact_analysis", "data": {}})
+    assert logger.seq == 1  # the status record was never stamped or encoded
+    # The daily alias is a hardlink of the same file; de-duplicate by seq
+    debug = {r["seq"]: r["msg"] for r in _read_ndjson_lines(d / "debug")}
+    assert debug == {1: "bt50_impact_analysis"}
+    assert _read_ndjson_lines(d) == []
+
+
 def test_current_amp_threshold_suppression(tmp_path: Path):
     d = tmp_path / "logs"
     logger = NdjsonLogger(str(d), "testbridge")
@@ -122,3 +136,111 @@ def test_current_amp_threshold_suppression(tmp_path: Path):
         except Exception:
             continue
     assert found, f"Expected to find an entry with current_amp ~0.01 in {unique}"
+
+
+def test_async_writer_keeps_order_and_flushes_on_stop(tmp_path: Path):
+    d = tmp_path / "logs"
+    logger = NdjsonLogger(str(d), "testbridge", dual_file=True, async_writer=True,
+                          flush_bytes=4096, flush_interval_s=5.0)
+    logger.mode = "regular"
+    for i in range(500):
+        logger.write({"type": "info", "msg": "n", "data": {"i": i}})
+        logger.write({"type": "debug", "msg": "dbg", "data": {"i": i}})
+    logger.stop()
+    main = {l["seq"]: l for l in _read_ndjson_lines(d)}
+    debug = {l["seq"]: l for l in _read_ndjson_lines(d / "debug")}
+    assert [l["data"]["i"] for l in main.values()] == list(range(500))
+    assert sorted(debug) == list(range(1, 1001))
+    assert list(main) == sorted(main)
+    assert logger.stats()["dropped"] == 0
+    # After stop() writes go straight to the files
+    logger.write({"type": "info", "msg": "late", "data": {}})
+    assert any(l["msg"] == "late" for l in _read_ndjson_lines(d))
+
+
+def test_async_writer_drops_when_queue_full(tmp_path: Path):
+    import threading
+    d = tmp_path / "logs"
+    logger = NdjsonLogger(str(d), "testbridge", async_writer=True, queue_size=2, flush_bytes=1)
+    gate = threading.Event()
+    write_batch = logger._write_batch
+    logger._write_batch = lambda main, debug: (gate.wait(), write_batch(main, debug))
+    for i in range(20):
+        logger.write({"type": "info", "msg": "n", "data": {"i": i}})
+    assert logger.dropped >= 15
+    gate.set()
+    logger.stop()
+    lines = _read_ndjson_lines(d)
+    seqs = sorted({l["seq"] for l in lines})
+    assert len(seqs) == 20 - logger.dropped
+    assert logger.stats()["written"] == len(seqs)
+
+
+def test_on_written_runs_once_the_line_is_in_the_file(tmp_path: Path):
+    import threading
+    d = tmp_path / "logs"
+    logger = NdjsonLogger(str(d), "testbridge", async_writer=True, flush_bytes=1 << 20, flush_interval_s=5.0)
+    seen = []
+    written = threading.Event()
+
+    def on_written():
+        logger._fh.flush()
+        seen.extend({l["seq"]: l["msg"] for l in _read_ndjson_lines(d)}.values())
+        written.set()
+
+    logger.write({"type": "event", "msg": "HIT", "data": {}}, on_written=on_written)
+    # Still waiting in the writer's batch
+    assert not written.wait(0.2)
+    logger.stop()
+    assert written.is_set() and seen == ["HIT"]
+    # Synchronous writes call back before returning; filtered records never do
+    calls = []
+    logger.mode = "regular"
+    logger.write({"type": "event", "msg": "late", "data": {}}, on_written=lambda: calls.append("late"))
+    logger.write({"type": "debug", "msg": "dbg", "data": {}}, on_written=lambda: calls.append("dbg"))
+    assert calls == ["late"]
+
+
+def test_stamped_fields_match_for_spliced_and_caller_set_records(tmp_path: Path):
+    d = tmp_path / "logs"
+    logger = NdjsonLogger(str(d), "testbridge")
+    logger.write({"type": "info", "msg": "a", "data": {"x": 1.5}})
+    logger.write({})
+    logger.write({"type": "info", "msg": "b", "seq": 99})
+    # Past the rotation deadline the next write opens new files
+    logger._rot_deadline = 0.0
+    logger.write({"type": "info", "msg": "c"})
+    assert logger._rot_deadline > time.time()
+    lines = sorted({json.dumps(l) for l in _read_ndjson_lines(d)})
+    recs = {json.loads(l)["seq"]: json.loads(l) for l in lines}
+    stamps = ["hms", "seq", "schema", "session_id", "pid"]
+    assert list(recs[1]) == ["type", "msg", "data"] + stamps
+    assert list(recs[2]) == stamps
+    # A caller-set field is kept; the rest are still stamped
+    assert recs[99]["msg"] == "b" and set(stamps) <= set(recs[99])
+    assert recs[1]["session_id"] == logger.session_id and recs[1]["pid"] == logger.pid
+    assert len(recs[1]["hms"]) == 12 and recs[1]["data"] == {"x": 1.5}
+    assert recs[4]["msg"] == "c"
+
+
+def test_rate_limits_suppress_and_summarise(tmp_path, monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+    log = NdjsonLogger(str(tmp_path), "rl", rate_limits={"noisy": {"rate": 2, "burst": 5}},
+                       suppressed_interval_s=10.0)
+    log.mode = "verbose"
+    for _ in range(20):
+        log.write({"type": "debug", "msg": "noisy", "data": {}})
+    log.write({"type": "event", "msg": "HIT", "data": {}})  # other messages are not limited
+    clock[0] += 3.0  # 6 more tokens, capped at the burst of 5
+    for _ in range(20):
+        log.write({"type": "debug", "msg": "noisy", "data": {}})
+    assert log.stats()["suppressed"] == 30
+    clock[0] += 7.5
+    log.write({"type": "event", "msg": "HIT", "data": {}})
+    recs = [json.loads(l) for f in tmp_path.glob("rl_*_*.ndjson") for l in f.read_text().splitlines()]
+    msgs = [r["msg"] for r in recs]
+    assert msgs.count("noisy") == 10 and msgs.count("HIT") == 2
+    (summary,) = [r for r in recs if r["msg"] == "log_suppressed"]
+    assert summary["data"] == {"interval_s": 10.5, "suppressed": {"noisy": 30}}
+    assert msgs.index("log_suppressed") == len(msgs) - 2
@@ -0,0 +1,57 @@
+import asyncio, os, pstats, signal
+
+import pytest
+
+from steelcity_impact_bridge.profiling import Profiler, install_profile_signal
+
+
+def busy_work(n):
+    return sum(i * i for i in range(n))
+
+
+def test_profiler_samples_stacks_only_by_default(tmp_path):
+    prof = Profiler(str(tmp_path), interval_s=0.001)
+    prof.start()
+    for _ in range(40):
+        busy_work(20000)
+    prof.stop()
+    pstats_path, collapsed_path = prof.dump()
+    assert pstats_path is None and not list(tmp_path.glob("*.pstats"))
+    assert any("busy_work" in line for line in collapsed_path.read_text().splitlines())
+
+
+def test_profiler_writes_pstats_and_collapsed_stacks(tmp_path):
+    prof = Profiler(str(tmp_path), interval_s=0.001, cprofile=True)
+    prof.start()
+    for _ in range(40):
+        busy_work(20000)
+    prof.stop()
+    pstats_path, collapsed_path = prof.dump()
+    stats = pstats.Stats(str(pstats_path))
+    assert any(fn[2] == "busy_work" for fn in stats.stats)
+    lines = collapsed_path.read_text().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("busy_work" in line for line in lines)
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGUSR1"), reason="no SIGUSR1")
+@pytest.mark.parametrize("cprofile", [False, True])
+def test_sigusr1_profiles_running_loop(tmp_path, monkeypatch, cprofile):
+    records = []
+    monkeypatch.setenv("PROFILE_CPROFILE", "1" if cprofile else "0")
+
+    async def main():
+        assert install_profile_signal(str(tmp_path), 0.2, records.append)
+        os.kill(os.getpid(), signal.SIGUSR1)
+        for _ in range(30):
+            busy_work(5000)
+            await asyncio.sleep(0.02)
+            if any(r["msg"] == "profile_written" for r in records):
+                break
+        asyncio.get_running_loop().remove_signal_handler(signal.SIGUSR1)
+
+    asyncio.run(main())
+    msgs = [r["msg"] for r in records]
+    assert msgs[0] == "profile_started" and "profile_written" in msgs
+    assert len(list(tmp_path.glob("profile_*.pstats"))) == (1 if cprofile else 0)
+    assert len(list(tmp_path.glob("profile_*.collapsed"))) == 1
@@ -0,0 +1,133 @@
+import json
+import struct
+
+from steelcity_impact_bridge.bridge import Bridge
+from steelcity_impact_bridge.config import AppCfg, AmgCfg, DetectorCfg, LoggingCfg
+from steelcity_impact_bridge.replay import (RecordedTimes, VirtualClock, encode_frames, main, read_sessions,
+                                            replay_session, sample_period_ns)
+from steelcity_impact_bridge.ble.wtvb_parse import parse_5561_batch
+
+import numpy as np
+
+T0 = bytes([0x01, 0x05, 0x00, 0x00])
+
+
+def shot(n):
+    return bytes([0x01, 0x03, n, 0x00, 0x00, 0x00])
+
+
+def frame(vx):
+    return bytes([0x55, 0x61]) + struct.pack("<13h", vx, 0, 0, 0, 0, 0, 2500, 0, 0, 0, 0, 0, 0)
+
+
+def record_session(tmp_path):
+    """Run a short live-like session with a virtual clock and return its debug log."""
+    cfg = AppCfg(AmgCfg(), [], DetectorCfg(),
+                 LoggingCfg(dir=str(tmp_path / "logs"), dual_file=True, mode="verbose",
+                            raw_archive=True))
+    br = Bridge(cfg)
+    clock = VirtualClock(5_000_000_000)
+    br.clock = clock
+    br.detectors["P1"] = br._new_detector()
+
+    def amg(ts, raw, sig):
+        clock.now_ns = ts
+        if sig == "T0":
+            br._on_t0(ts, raw)
+        br._on_amg_signal(ts, sig, raw)
+
+    amg(5_000_000_000, T0, "T0")
+    spikes = {60: 80, 140: 60}
+    for k in range(200):
+        ts = 5_005_000_000 + k * 10_000_000
+        clock.now_ns = ts
+        br._on_bt50_packet("P1", ts, frame(spikes.get(k, 0)))
+        if k in (58, 138):
+            amg(ts + 1_000_000, shot(k), "SHOT_RAW")
+    br._emit_impacts(None)
+    br.captures.writer.flush()
+    (debug,) = [f for f in (tmp_path / "logs" / "debug").glob("*.ndjson") if f.stem.count("_") > 2]
+    return br, debug
+
+
+def events(path, key):
+    out = []
+    for f in path.glob("*.ndjson"):
+        if f.stem.rsplit("_", 1)[-1].isdigit() and len(f.stem.rsplit("_", 1)[-1]) == 8:
+            continue
+        for line in f.read_text(encoding="utf-8").splitlines():
+            rec = json.loads(line)
+            if rec.get("event_type") == key or rec.get("msg") == key:
+                out.append(rec)
+    return out
+
+
+def test_encode_frames_round_trips():
+    rows = np.array([[1, 3.0, -4.0, 12.0], [2, 0.0, 32767.0, -32768.0]])
+    dec = parse_5561_batch(encode_frames(rows))
+    assert dec[:, :3].tolist() == rows[:, 1:].tolist()
+
+
+def test_replay_reproduces_recorded_impacts(tmp_path):
+    br, debug = record_session(tmp_path)
+    original = events(tmp_path / "logs", "impact_detected")
+    assert len(original) == 2
+
+    (sid,) = read_sessions(debug).keys()
+    cfg = AppCfg(AmgCfg(), [], DetectorCfg(), LoggingCfg())
+    summary = replay_session(str(debug), sid, cfg, str(tmp_path / "out"))
+    # Only the capture windows around the two spikes were recorded: 200 ms before, 500 ms after
+    assert summary["samples"]["P1"] == 2 * (20 + 1 + 50)
+    assert summary["sample_source"] == {"P1": "captures"}
+    assert summary["counts"]["impact_detected"] == 2
+    replayed = events(tmp_path / "out" / sid, "impact_detected")
+    assert [r["t_rel_ms"] for r in replayed] == [r["t_rel_ms"] for r in original]
+    assert [r["raw_data"]["peak_timestamp"] for r in replayed] == \
+        [r["raw_data"]["peak_timestamp"] for r in original]
+    # Only the output log is written: no raw archive or capture files
+    assert [p.name for p in (tmp_path / "out" / sid).iterdir() if p.is_dir()] == []
+
+
+def test_replay_reads_the_raw_archive_when_it_covers_the_session(tmp_path):
+    br, debug = record_session(tmp_path)
+    br.logger.write({"type": "status", "msg": "alive", "data": {"raw_archive": br.raw_archive.stats()}})
+    br.raw_archive.close()
+    br.logger.stop()
+    original = events(tmp_path / "logs", "impact_detected")
+
+    (sid,) = read_sessions(debug).keys()
+    cfg = AppCfg(AmgCfg(), [], DetectorCfg(), LoggingCfg())
+    summary = replay_session(str(debug), sid, cfg, str(tmp_path / "out"))
+    # Every sample up to the last one, not just the two capture windows
+    assert summary["samples"]["P1"] > 2 * 71 and summary["sample_source"] == {"P1": "archive"}
+    replayed = events(tmp_path / "out" / sid, "impact_detected")
+    assert [r["raw_data"]["peak_timestamp"] for r in replayed] == \
+        [r["raw_data"]["peak_timestamp"] for r in original]
+
+
+def test_replay_keeps_every_record_whatever_the_logging_config(tmp_path):
+    _, debug = record_session(tmp_path)
+    (sid,) = read_sessions(debug).keys()
+    limits = {name: {"rate": 0.001, "burst": 1} for name in ("impact_detected", "bt50_buffer_status")}
+    cfg = AppCfg(AmgCfg(), [], DetectorCfg(), LoggingCfg(mode="regular", rate_limits=limits))
+    summary = replay_session(str(debug), sid, cfg, str(tmp_path / "out"))
+    assert summary["counts"]["impact_detected"] == 2
+    assert len(events(tmp_path / "out" / sid, "bt50_buffer_status")) > 1
+    assert events(tmp_path / "out" / sid, "log_suppressed") == []
+
+
+def test_recorded_times_use_the_recorded_spacing():
+    rows = np.array([[0, 0, 0, 0], [8_000_000, 0, 0, 0], [16_000_000, 0, 0, 0],
+                     [900_000_000, 0, 0, 0]], dtype=float)
+    assert sample_period_ns(rows, 10_000_000) == 8_000_000
+    assert sample_period_ns(rows[:1], 10_000_000) == 10_000_000
+    times = RecordedTimes(sample_period_ns(rows, 10_000_000))
+    assert times.update(4, 1_000_000_000) == 4
+    assert [times.time_of(k) for k in (3, 4)] == [992_000_000, 1_000_000_000]
+
+
+def test_replay_cli_runs_sessions_in_pool(tmp_path, capsys):
+    _, debug = record_session(tmp_path)
+    assert main([str(debug.parent), "-o", str(tmp_path / "out"), "-j", "2"]) == 0
+    (line,) = capsys.readouterr().out.splitlines()
+    assert json.loads(line)["counts"]["impact_detected"] == 2
@@ -0,0 +1,113 @@
+import gzip
+import json
+import os
+import time
+
+from steelcity_impact_bridge.logs import NdjsonLogger
+from steelcity_impact_bridge.replay import read_sessions
+from steelcity_impact_bridge.retention import LogRetention, compress_segment, read_from
+
+
+def test_size_rotation_keeps_every_record_and_moves_the_alias(tmp_path):
+    closed = []
+    log = NdjsonLogger(str(tmp_path), "bridge", dual_file=True, max_bytes=2000,
+                       on_segment_closed=closed.append)
+    log.mode = "verbose"
+    for i in range(100):
+        log.write({"type": "info", "msg": "tick", "data": {"i": i}})
+    segs = sorted(p for p in tmp_path.glob("bridge_*.ndjson") if p.stem.count("_") >= 2)
+    assert len(segs) > 3 and len(closed) == 2 * (len(segs) - 1)
+    assert all(p.stat().st_size < 2000 + 200 for p in segs)
+    seqs = [json.loads(l)["seq"] for p in segs for l in p.read_text().splitlines()]
+    assert sorted(seqs) == list(range(1, 101))
+    (alias,) = [p for p in tmp_path.glob("bridge_*.ndjson") if p.stem.count("_") == 1]
+    assert os.path.samefile(alias, log.active_paths()[0])
+
+
+def test_compressed_segment_reads_back_from_any_offset(tmp_path):
+    seg = tmp_path / "bridge_20250101_120000.ndjson"
+    lines = [json.dumps({"seq": i, "session_id": "s1", "hms": "12:00:00.000", "pad": "x" * (i % 40)})
+             for i in range(5000)]
+    raw = ("\n".join(lines) + "\n").encode()
+    seg.write_bytes(raw)
+    os.link(seg, tmp_path / "bridge_20250101.ndjson")  # the closed day's alias
+    n_in, n_out = compress_segment(str(seg), member_bytes=16 * 1024)
+    assert n_in == len(raw) and n_out < n_in // 4
+    gz = tmp_path / "bridge_20250101_120000.ndjson.gz"
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "bridge_20250101.ndjson.gz", gz.name, gz.name + ".idx"]
+    assert gzip.decompress(gz.read_bytes()) == raw
+    for off in (0, 16 * 1024 + 7, len(raw) // 2, len(raw) - 1):
+        assert b"".join(read_from(str(gz), off)) == raw[off:]
+    assert [r["seq"] for r in read_sessions(gz)["s1"]] == list(range(5000))
+
+
+def test_quota_deletes_oldest_files_but_not_active_ones(tmp_path):
+    now = time.time()
+    for k in range(6):
+        p = tmp_path / f"bridge_2025010{k}_000000.ndjson.gz"
+        p.write_bytes(b"x" * 1000)
+        os.utime(p, (now - 600 + k * 60, now - 600 + k * 60))
+    oldest = tmp_path / "bridge_20250100_000000.ndjson.gz"
+    os.link(oldest, tmp_path / "bridge_20250100.ndjson.gz")  # counted once, deleted with it
+    (tmp_path / "bridge_run.out").write_bytes(b"y" * 5000)  # not in the class
+    active = tmp_path / "bridge_20250101_000000.ndjson.gz"
+    ret = LogRetention({"main": (str(tmp_path), ["bridge_*.ndjson*"], 3500)},
+                       protect=lambda: [str(active)])
+    ret.start()
+    ret.enforce()
+    ret.flush()
+    ret.stop()
+    left = sorted(p.name for p in tmp_path.glob("bridge_*.ndjson*"))
+    assert left == ["bridge_20250101_000000.ndjson.gz", "bridge_20250104_000000.ndjson.gz",
+                    "bridge_20250105_000000.ndjson.gz"]
+    assert ret.deleted_files == 3 and (tmp_path / "bridge_run.out").exists()
+
+
+def test_quota_prunes_data_and_index_together_and_reports_first(tmp_path):
+    now = time.time()
+    for k, day in enumerate(("20250101", "20250102", "20250103")):
+        for name, size in ((f"capture_{day}.bin", 1000), (f"capture_{day}.idx.ndjson", 100),
+                           (f"P1_{day}.bt50raw", 1000), (f"P1_{day}.idx", 16)):
+            p = tmp_path / name
+            p.write_bytes(b"x" * size)
+            os.utime(p, (now - 600 + k * 60, now - 600 + k * 60))
+    seen = []
+
+    def on_prune(cls, paths, size):
+        assert all(os.path.exists(p) for p in paths)
+        seen.append((cls, sorted(os.path.basename(p) for p in paths), size))
+
+    ret = LogRetention({"sensorbuffer": (str(tmp_path), ["capture_*"], 1200),
+                        "raw": (str(tmp_path), ["*.bt50raw", "*.idx"], 0)}, on_prune=on_prune)
+    ret.start()
+    ret.enforce()
+    ret.flush()
+    ret.stop()
+    assert seen == [("sensorbuffer", ["capture_20250101.bin", "capture_20250101.idx.ndjson"], 1100),
+                    ("sensorbuffer", ["capture_20250102.bin", "capture_20250102.idx.ndjson"], 1100)]
+    left = sorted(p.name for p in tmp_path.iterdir())
+    assert [n for n in left if n.startswith("capture_")] == [
+        "capture_20250103.bin", "capture_20250103.idx.ndjson"]
+    assert len([n for n in left if n.startswith("P1_")]) == 6  # no raw quota: kept
+
+
+def test_bridge_deletes_nothing_without_a_quota(tmp_path):
+    from steelcity_impact_bridge.bridge import Bridge
+    from steelcity_impact_bridge.config import AppCfg, AmgCfg, DetectorCfg, LoggingCfg
+
+    old = tmp_path / "sensorbuffer" / "capture_20200101.bin"
+    old.parent.mkdir()
+    old.write_bytes(b"x" * 10_000)
+    for quota, kept in ((None, True), ({"sensorbuffer": 0.001}, False)):
+        br = Bridge(AppCfg(AmgCfg(), [], DetectorCfg(),
+                           LoggingCfg(dir=str(tmp_path), dual_file=False, quota_mb=quota)))
+        br.retention.enforce()
+        br.retention.start()
+        br.retention.flush()
+        br.retention.stop()
+        br.logger.stop()
+        assert old.exists() is kept
+    recs = [json.loads(l) for p in tmp_path.glob("bridge_*.ndjson") for l in p.read_text().splitlines()]
+    prunes = {r["seq"]: r["data"] for r in recs if r["msg"] == "retention_prune"}
+    assert list(prunes.values()) == [{"class": "sensorbuffer", "files": [str(old)], "bytes": 10_000}]
@@ -0,0 +1,39 @@
+import numpy as np
+
+from steelcity_impact_bridge.ringbuf import SampleRing, SAMPLE_DTYPE
+
+
+def fill(ring, n, start=0):
+    for k in range(start, start + n):
+        ring.append(k * 10, float(k), float(k), -float(k), 0.5)
+
+
+def test_window_views_are_contiguous_across_wrap():
+    ring = SampleRing(8)
+    fill(ring, 21)
+    assert ring.total == 21 and len(ring) == 8 and ring.oldest == 13
+    w = ring.view(15)
+    assert w.dtype == SAMPLE_DTYPE
+    assert w["ts_ns"].tolist() == [k * 10 for k in range(15, 21)]
+    assert w["vy"].tolist() == [-float(k) for k in range(15, 21)]
+    # A full-capacity window is still one slice of the backing array
+    full = ring.latest(8)
+    assert np.shares_memory(full, ring._buf)
+    assert full["amp"].tolist() == [float(k) for k in range(13, 21)]
+
+
+def test_view_clips_to_what_the_ring_still_holds():
+    ring = SampleRing(4)
+    fill(ring, 10)
+    assert ring.view(0)["ts_ns"].tolist() == [60, 70, 80, 90]
+    assert len(ring.view(10)) == 0
+    assert ring.view(7, 9)["ts_ns"].tolist() == [70, 80]
+
+
+def test_views_are_read_only_and_memory_is_bounded():
+    ring = SampleRing(16)
+    nbytes = ring._buf.nbytes
+    fill(ring, 1000)
+    assert ring._buf.nbytes == nbytes == 2 * 16 * SAMPLE_DTYPE.itemsize
+    w = ring.latest(4)
+    assert not w.flags.writeable
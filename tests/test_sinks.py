@@ -0,0 +1,142 @@
+import json, socket, sqlite3, threading, time
+
+import pytest
+
+from steelcity_impact_bridge.logs import NdjsonLogger
+from steelcity_impact_bridge.sinks import MemorySink, Sink, build_sink
+from tools.ingest_follow import ensure_db, ingest_line
+
+
+class _GatedSink(Sink):
+    """Blocks in emit() until the gate opens, like a consumer on a stalled disk."""
+
+    def __init__(self, gate, **kw):
+        self.gate = gate
+        self.seen = []
+        super().__init__(**kw)
+
+    def emit(self, batch):
+        self.gate.wait()
+        self.seen.extend(e[0] for e in batch)
+
+
+def test_logger_fans_out_to_sinks(tmp_path):
+    main = MemorySink(name="main")
+    debug = MemorySink(name="all", debug=True)
+    logger = NdjsonLogger(str(tmp_path), "t", sinks=[main, debug])
+    logger.mode = "regular"
+    logger.write({"type": "info", "msg": "hello", "data": {"n": 1}})
+    logger.write({"type": "debug", "msg": "noisy", "data": {}})  # filtered from the main file
+    logger.stop()
+    main.stop()
+    debug.stop()
+    lines = [json.loads(l) for l in (tmp_path / logger._path.name).read_text().splitlines()]
+    assert [r["msg"] for r in lines] == ["hello"]
+    recs = main.records()
+    assert [r["msg"] for r in recs] == ["hello"]
+    assert recs[0]["seq"] == lines[0]["seq"]
+    assert recs[0]["session_id"] == logger.session_id
+    assert abs(recs[0]["ts_ms"] - time.time() * 1000) < 60_000
+    assert [r["msg"] for r in debug.records()] == ["hello", "noisy"]
+    assert main.stats()["written"] == 1 and main.stats()["dropped"] == 0
+
+
+@pytest.mark.parametrize("policy,kept", [("drop_new", [1, 2, 3]), ("drop_oldest", [1, 9, 10])])
+def test_full_queue_drops_by_policy_without_blocking(policy, kept):
+    gate = threading.Event()
+    sink = _GatedSink(gate, queue_size=2, batch_size=1, policy=policy)
+    sink.offer((1, 0.0, "s", {}))
+    deadline = time.monotonic() + 2
+    while sink._q.qsize() and time.monotonic() < deadline:
+        time.sleep(0.001)  # the worker holds event 1 at the gate
+    t0 = time.monotonic()
+    for seq in range(2, 11):
+        sink.offer((seq, 0.0, "s", {}))
+    assert time.monotonic() - t0 < 0.5
+    assert sink.stats()["dropped"] == 7
+    gate.set()
+    sink.stop()
+    assert sink.seen == kept
+    assert sink.stats()["written"] == 3
+
+
+def test_failing_sink_counts_errors():
+    class Broken(Sink):
+        def emit(self, batch):
+            raise OSError("disk full")
+
+    sink = Broken(batch_interval_s=0.0)
+    for seq in range(3):
+        sink.offer((seq, 0.0, "s", {}))
+    sink.stop()
+    st = sink.stats()
+    assert st["failed"] == 3 and st["errors"] >= 1 and st["last_error"] == "disk full"
+
+
+def test_udp_sink_publishes_ndjson(tmp_path):
+    rx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    rx.bind(("127.0.0.1", 0))
+    rx.settimeout(2)
+    sink = build_sink({"kind": "udp", "address": f"127.0.0.1:{rx.getsockname()[1]}"})
+    logger = NdjsonLogger(str(tmp_path), "t", sinks=[sink])
+    for i in range(5):
+        logger.write({"type": "event", "msg": "Hit", "data": {"i": i}})
+    sink.stop()
+    got = []
+    while len(got) < 5:
+        got += [json.loads(l) for l in rx.recv(65536).splitlines()]
+    rx.close()
+    assert [r["data"]["i"] for r in got] == list(range(5))
+    assert [r["seq"] for r in got] == [1, 2, 3, 4, 5]
+    assert sink.stats()["unsent"] == 0
+
+
+def test_unix_sink_without_listener_loses_quietly(tmp_path):
+    sink = build_sink({"kind": "unix", "address": str(tmp_path / "nobody.sock")})
+    sink.offer((1, 0.0, "s", {"msg": "x"}))
+    sink.stop()
+    st = sink.stats()
+    assert st["unsent"] == 1 and st["errors"] == 0
+
+
+def test_build_sink_rejects_bad_specs():
+    with pytest.raises(ValueError):
+        build_sink({"kind": "carrier-pigeon"})
+    with pytest.raises(ValueError):
+        build_sink({"kind": "udp"})
+    with pytest.raises(ValueError):
+        build_sink({"kind": "sqlite"})
+    with pytest.raises(ValueError):
+        build_sink({"kind": "memory", "policy": "block"})
+
+
+def test_sqlite_sink_writes_events_in_grouped_transactions(tmp_path):
+    db = tmp_path / "db" / "bridge.db"
+    sink = build_sink({"kind": "sqlite", "path": str(db), "batch_interval_s": 0.2})
+    logger = NdjsonLogger(str(tmp_path), "t", sinks=[sink])
+    t0 = time.time() * 1000
+    for i in range(300):
+        logger.write({"type": "event", "msg": "Hit", "plate": "P1", "t_rel_ms": float(i),
+                      "data": {"i": i}})
+    logger.write({"type": "status", "msg": "alive", "data": {"sensors": ["P1"]}})
+    sink.stop()
+    st = sink.stats()
+    assert st["written"] == 301 and st["errors"] == 0
+    assert st["batches"] < 301  # grouped, not one commit per row
+    conn = sqlite3.connect(str(db))
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    rows = conn.execute("SELECT seq, ts_ms, type, msg, plate, t_rel_ms, session_id, pid, schema, "
+                        "data_json FROM events ORDER BY seq").fetchall()
+    assert len(rows) == 301
+    seq, ts_ms, typ, msg, plate, t_rel, sess, pid, schema, data = rows[7]
+    assert (seq, typ, msg, plate, t_rel) == (8, "event", "Hit", "P1", 7.0)
+    assert t0 - 1 <= ts_ms <= time.time() * 1000  # the event's wall time, not t_rel_ms
+    assert sess == logger.session_id and pid == logger.pid and schema == "v1"
+    assert json.loads(data) == {"i": 7}
+    # A follower ingesting the same records into the same database adds nothing
+    ensure_db(str(db)).close()
+    for line in logger._path.read_text().splitlines():
+        ingest_line(conn, json.loads(line))
+    conn.commit()
+    assert conn.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 301
+    conn.close()
@@ -0,0 +1,92 @@
+import numpy as np
+
+from steelcity_impact_bridge.detector import DetectorParams, HitDetector
+from steelcity_impact_bridge.sweep import expand_grid, load_session, run_grid, score, segments, sweep_traces
+
+
+def trace(n=6000, seed=5):
+    rng = np.random.default_rng(seed)
+    a = rng.normal(0.0, 0.6, n)
+    for s in rng.choice(n - 40, 25, replace=False):
+        a[s:s + 8] += rng.uniform(5, 60) * 0.6 ** np.arange(8)
+    return a
+
+
+def test_run_grid_matches_scalar_detector():
+    a = trace()
+    params = expand_grid({
+        "triggerHigh": [2.0, 8.0, 50.0],
+        "triggerLow": [0.5, 2.0],
+        "ring_min_ms": [10, 40],
+        "dead_time_ms": [0, 100, 300],
+        "warmup_ms": [0, 300],
+        "min_amp": [0.5, 1.0, 3.0],
+    })
+    combo, onset, close, _ = run_grid(a, 10.0, params)
+    for i in range(params["triggerHigh"].size):
+        det = HitDetector(DetectorParams(**{k: v[i].item() for k, v in params.items()}))
+        want = [k for k, x in enumerate(a.tolist()) if det.update(x, 10.0)]
+        got = close[combo == i].tolist()
+        assert got == want, i
+        # onset is the sample that opened the ring
+        assert all(o < c for o, c in zip(onset[combo == i].tolist(), got))
+
+
+def test_max_hits_caps_a_combination():
+    params = expand_grid({"triggerHigh": [1.01, 1e6], "min_amp": [0.1]})
+    combo, _, _, sat = run_grid(trace(), 10.0, params, max_hits=5)
+    assert np.bincount(combo, minlength=2)[0] == 5
+    assert sat.tolist() == [True, False]
+
+
+def test_score_precision_recall_latency():
+    params = expand_grid({"triggerHigh": [2.0, 8.0]})
+    ms = 1_000_000
+    shots = np.array([1000, 2000, 3000]) * ms
+    # combo 0: hits on shots 1 and 2, one repeat on shot 2, one false alarm
+    combo = np.array([0, 0, 0, 0, 1])
+    onset = np.array([1010, 2005, 2100, 2600, 3020]) * ms
+    close = onset + 40 * ms
+    res = score(params, combo, onset, close, shots)
+    assert res.hits.tolist() == [4, 1]
+    assert res.true_pos.tolist() == [2, 1]
+    assert res.precision.tolist() == [0.5, 1.0]
+    assert np.allclose(res.recall, [2 / 3, 1 / 3])
+    assert np.allclose(res.latency_ms, [(50 + 45) / 2, 60])
+    assert res.ranking()[0] == 0  # higher F1
+
+
+def test_sweep_runs_capture_windows_separately_and_scores_covered_shots():
+    ms = 1_000_000
+    a, b = trace(300, seed=1), trace(400, seed=2)
+    # Two capture windows 5 s apart, as separate pieces of one sensor's trace
+    ts = np.concatenate([np.arange(300) * 10 * ms, 8_000 * ms + np.arange(400) * 10 * ms])
+    amp = np.concatenate([a, b])
+    assert segments(ts, 100 * ms) == [(0, 300), (300, 700)]
+    params = expand_grid({"triggerHigh": [4.0, 16.0], "min_amp": [1.0]})
+    shots = np.array([500, 5_000, 9_000]) * ms  # the middle one fell between the windows
+    res = sweep_traces({"P1": (ts, amp)}, shots, params)
+    assert res.shots == 2
+    want = []
+    for lo, part in ((0, a), (300, b)):
+        c, s, j, _ = run_grid(part, 10.0, params)
+        want += list(zip(c.tolist(), ts[lo + s].tolist()))
+    assert res.hits.tolist() == np.bincount([c for c, _ in want], minlength=2).tolist()
+    expect = score(params, np.array([c for c, _ in want]), np.array([t for _, t in want]),
+                   np.array([t for _, t in want]), shots[[0, 2]])
+    assert res.true_pos.tolist() == expect.true_pos.tolist()
+    assert res.recall.tolist() == expect.recall.tolist()
+
+
+def test_load_session_prefers_the_raw_archive(tmp_path):
+    from test_replay import record_session
+    br, debug = record_session(tmp_path)
+    br.logger.write({"type": "status", "msg": "alive", "data": {"raw_archive": br.raw_archive.stats()}})
+    br.raw_archive.close()
+    br.logger.stop()
+    traces, shots = load_session(debug)
+    ts, _ = traces["P1"]
+    # Captures hold two 71-sample windows; the archive has every sample up to the last one
+    assert len(ts) > 2 * 71
+    assert segments(ts, 100_000_000) == [(0, len(ts))]
+    assert shots.tolist() == [5_586_000_000, 6_386_000_000]
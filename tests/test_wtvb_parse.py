@@ -1,4 +1,12 @@
-from steelcity_impact_bridge.ble.wtvb_parse import parse_5561
+import math
+import random
+import struct
+
+import numpy as np
+
+from steelcity_impact_bridge.ble.wtvb_parse import (
+    FIELDS, FrameAssembler, parse_5561, parse_5561_batch, parse_5561_record,
+)
 
 def le16(u):
     return bytes((u & 0xFF, (u >> 8) & 0xFF))
@@ -38,3 +46,67 @@ def test_parse_5561_valid_frame():
 def test_parse_5561_invalid_header():
     bad = bytes([0x00, 0x00]) + b"\x00"*26
     assert parse_5561(bad) is None
+
+
+def test_parse_5561_batch_matches_scalar():
+    rnd = random.Random(7)
+    frames = [bytes([0x55, 0x61]) + struct.pack('<13h', *(rnd.randint(-32768, 32767) for _ in range(13)))
+              for _ in range(200)]
+    frames[5] = b"\x00\x00" + frames[5][2:]
+    frames[9] = b"\x55\x62" + frames[9][2:]
+    buf = b"".join(frames) + b"\x55\x61\x01"  # trailing partial frame is ignored
+
+    arr = parse_5561_batch(buf)
+    want = [parse_5561(f) for f in frames]
+    want = [w for w in want if w is not None]
+    assert arr.shape == (len(want), len(FIELDS))
+    for row, w in zip(arr, want):
+        assert list(row) == [w[k] for k in FIELDS]
+
+    full = parse_5561_batch(bytearray(buf), drop_invalid=False)
+    assert full.shape == (200, len(FIELDS))
+    assert np.isnan(full[5]).all() and np.isnan(full[9]).all()
+    assert not math.isnan(full[6][0])
+    assert parse_5561_batch(b"").shape == (0, len(FIELDS))
+
+
+def test_parse_5561_record_matches_dict():
+    payload = bytes([0x55, 0x61]) + struct.pack('<13h', 100, -1, 0, 0, -32768, 16384, 2500,
+                                                100, -200, 300, 10, 20, 30) + b"\x00" * 4
+    rec = parse_5561_record(payload)
+    assert rec is not None
+    assert rec.VY == -1 and rec.ADY == -180.0 and rec.ADZ == 90.0 and rec.TEMP == 25.0
+    assert parse_5561(payload) == dict(zip(FIELDS, map(float, rec)))
+    assert parse_5561_record(payload[:27]) is None
+    assert parse_5561_record(b"\x55\x62" + payload[2:]) is None
+
+
+def _frames(n, start=0):
+    return [bytes([0x55, 0x61]) + struct.pack('<13h', start + k, 0, 0, 0, 0, 0, 2500, 0, 0, 0, 0, 0, 0)
+            for k in range(n)]
+
+
+def test_frame_assembler_splits_batched_notification():
+    fa = FrameAssembler()
+    out = fa.feed(b"".join(_frames(3)) + b"\x00" * 4)  # three frames plus padding
+    assert [f.VX for f in out] == [0, 1, 2]
+    assert fa.pending == 0 and fa.skipped == 4
+
+
+def test_frame_assembler_resyncs_and_carries_partials():
+    stream = b"\x01\x02\x03" + b"".join(_frames(5))
+    fa = FrameAssembler()
+    got = []
+    for cut in range(0, len(stream), 20):  # notifications start mid-frame
+        got += fa.feed(stream[cut:cut + 20])
+    assert [f.VX for f in got] == [0, 1, 2, 3, 4]
+    assert fa.skipped == 3 and fa.pending == 0
+    assert fa.feed(b"\x55") == [] and fa.pending == 1
+
+
+def test_frame_assembler_drops_partial_before_new_header():
+    f0, f1 = _frames(2)
+    fa = FrameAssembler()
+    assert fa.feed(f0[:10]) == [] and fa.pending == 10
+    assert [f.VX for f in fa.feed(f1)] == [1]
+    assert fa.skipped == 10 and fa.pending == 0